@@ -0,0 +1,411 @@
+# agents/analytics.py
+
+import asyncio
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from array import array
+from datetime import date
+
+import numpy as np
+
+from agents.intent_classifier import TAXONOMY
+
+# --- Columnar analytics over the report history ---
+# Every UserReport is appended as one row to a column store:
+#
+#   user   int32   dictionary code of user_id
+#   day    uint16  days since EPOCH
+#   cat    uint8   habit category code (CATEGORIES)
+#   flags  uint8   DONE | NEW_DAY (user's first report that day)
+#                        | NEW_WEEK (first report in that week of the user's life)
+#   goal   int32   dictionary code of the goal being reported on
+#
+# 12 bytes a row. Rows collect in small append buffers and are sealed into
+# immutable NumPy chunks of COACH_ANALYTICS_CHUNK_ROWS rows, written to
+# <COACH_DATA_DIR>/analytics/chunk-<n>.npz by a background task (flush
+# interval COACH_ANALYTICS_FLUSH_INTERVAL). The same task rewrites the open
+# buffer to tail.npz, so a crash loses at most one interval's rows. Per-user
+# columns (first/last day, latest streak) live next to them in users.npz;
+# user ids and goal texts are append-only dictionaries.
+#
+# Days are stored as uint16 offsets from EPOCH, so reports outside
+# [EPOCH, EPOCH + 65535] (2020-01-01 .. 2199-06-06) are rejected.
+#
+# Queries run chunk by chunk with np.bincount on small integer keys, so
+# temporaries stay chunk-sized and partial results just add up. Each chunk
+# keeps its min/max day (a zone map) to skip it in date-bounded queries. Distinct
+# counts (daily actives, retention) need no dedup pass: the NEW_DAY/NEW_WEEK
+# flags are decided once at ingest.
+
+logger = logging.getLogger("coach.analytics")
+
+EPOCH = date(2020, 1, 1).toordinal()
+MAX_OFFSET = (1 << 16) - 1
+CATEGORIES = ("other",) + tuple(TAXONOMY)
+CATEGORY_CODES = {name: code for code, name in enumerate(CATEGORIES)}
+
+DONE, NEW_DAY, NEW_WEEK = 1, 2, 4
+
+COLUMNS = {"user": np.int32, "day": np.uint16, "cat": np.uint8, "flags": np.uint8, "goal": np.int32}
+_TYPECODES = {"user": "i", "day": "H", "cat": "B", "flags": "B", "goal": "i"}
+USER_COLUMNS = ("first_day", "last_day", "last_week", "streak")
+
+
+class ReportAnalytics:
+    def __init__(self, directory: str = None, chunk_rows: int = None, enabled: bool = None):
+        if enabled is None:
+            enabled = os.getenv("COACH_ANALYTICS", "1") != "0"
+        self.enabled = enabled
+        self.directory = directory or os.path.join(os.getenv("COACH_DATA_DIR", "data"), "analytics")
+        self.chunk_rows = chunk_rows or int(os.getenv("COACH_ANALYTICS_CHUNK_ROWS", str(1 << 20)))
+        self.flush_interval = float(os.getenv("COACH_ANALYTICS_FLUSH_INTERVAL", "10"))
+        self._lock = threading.Lock()
+
+        self._buffer = {name: array(code) for name, code in _TYPECODES.items()}
+        self.chunks = []          # sealed chunks: dict of column -> ndarray
+        self.zones = []           # (min day, max day) per sealed chunk
+        self._written = 0         # chunks already on disk
+        self._persisted_rows = 0  # rows (chunks + tail) on disk
+
+        # Dictionaries (code = position)
+        self._user_codes, self.user_ids = {}, []
+        self._goal_codes, self.goals = {}, []
+        self._users_written = self._goals_written = 0
+
+        # Per-user columns, indexed by user code
+        self.first_day = array("H")
+        self.last_day = array("H")
+        self.last_week = array("H")   # last counted week of the user's life
+        self.streak = array("i")
+
+    # --- ingest (hot path: a handful of array appends) ---
+
+    def record(self, user_id: str, day: int, category: str, goal: str, completed: bool, streak: int) -> None:
+        if not self.enabled:
+            return
+        offset = day - EPOCH
+        if not 0 <= offset <= MAX_OFFSET:
+            # The uint16 day column would silently wrap
+            logger.warning(f"Dropping analytics row for {user_id}: day {date.fromordinal(day)} is out of range")
+            return
+        with self._lock:
+            user = self._user_codes.get(user_id)
+            flags = DONE if completed else 0
+            if user is None:
+                user = self._user_codes[user_id] = len(self.user_ids)
+                self.user_ids.append(user_id)
+                self.first_day.append(offset)
+                self.last_day.append(offset)
+                self.last_week.append(0)
+                self.streak.append(streak)
+                flags |= NEW_DAY | NEW_WEEK
+            else:
+                if offset > self.last_day[user]:
+                    self.last_day[user] = offset
+                    flags |= NEW_DAY
+                week = (offset - self.first_day[user]) // 7
+                if week > self.last_week[user]:
+                    self.last_week[user] = week
+                    flags |= NEW_WEEK
+                self.streak[user] = streak
+
+            goal_code = self._goal_codes.get(goal)
+            if goal_code is None:
+                goal_code = self._goal_codes[goal] = len(self.goals)
+                self.goals.append(goal)
+
+            buffer = self._buffer
+            buffer["user"].append(user)
+            buffer["day"].append(offset)
+            buffer["cat"].append(CATEGORY_CODES.get(category, 0))
+            buffer["flags"].append(flags)
+            buffer["goal"].append(goal_code)
+            if len(buffer["user"]) >= self.chunk_rows:
+                self._seal()
+
+    def _seal(self) -> None:
+        # Caller holds the lock
+        chunk = {name: np.array(self._buffer[name], dtype=COLUMNS[name]) for name in COLUMNS}
+        self.chunks.append(chunk)
+        self.zones.append(self._zone(chunk))
+        self._buffer = {name: array(code) for name, code in _TYPECODES.items()}
+
+    @staticmethod
+    def _zone(chunk) -> tuple:
+        day = chunk["day"]
+        return (int(day.min()), int(day.max())) if len(day) else (0, -1)
+
+    def _snapshot(self, start: int = None, end: int = None) -> list:
+        """
+        (chunk, (min day, max day)) for the chunks that may hold days in
+        [start, end] (day offsets; None = open), the open buffer copied in as
+        the last one. Safe to scan from another thread.
+        """
+        with self._lock:
+            chunks = [(chunk, zone) for chunk, zone in zip(self.chunks, self.zones)
+                      if (start is None or zone[1] >= start) and (end is None or zone[0] <= end)]
+            if len(self._buffer["user"]):
+                chunk = {name: np.array(self._buffer[name], dtype=COLUMNS[name]) for name in COLUMNS}
+                chunks.append((chunk, self._zone(chunk)))
+        return chunks
+
+    def _user_column(self, name: str) -> np.ndarray:
+        # Take it after _snapshot(): every user code in the chunks is then covered
+        with self._lock:
+            return np.array(getattr(self, name), dtype=np.int32)
+
+    def __len__(self) -> int:
+        return sum(len(chunk["user"]) for chunk in self.chunks) + len(self._buffer["user"])
+
+    # --- queries ---
+    # Each one is a single np.bincount per chunk over a composite key
+    # (e.g. category * 2 + done), so no per-row boolean selection is needed;
+    # reports arrive in day order, so the zone maps skip whole chunks for
+    # date-bounded queries.
+
+    def completion_by_category(self, start_day: int = None, end_day: int = None) -> dict:
+        """Reports and completion rate per habit category, for days in [start_day, end_day]."""
+        if start_day is not None and end_day is not None and start_day > end_day:
+            raise ValueError("start_day must not be after end_day")
+        start = start_day - EPOCH if start_day is not None else None
+        end = end_day - EPOCH if end_day is not None else None
+        size = 2 * len(CATEGORIES)
+        counts = np.zeros(size, dtype=np.int64)
+        for chunk, (lo, hi) in self._snapshot(start, end):
+            key = (chunk["cat"] << 1) | (chunk["flags"] & DONE)
+            if (start is not None and lo < start) or (end is not None and hi > end):
+                # Only the chunks straddling the range boundary need a row mask
+                day = chunk["day"]
+                key = key[(day >= (start or 0)) & (day <= (hi if end is None else end))]
+            counts += np.bincount(key, minlength=size)
+        result = {}
+        for code, name in enumerate(CATEGORIES):
+            missed, done = int(counts[2 * code]), int(counts[2 * code + 1])
+            if missed + done:
+                result[name] = {"reports": missed + done, "completed": done,
+                                "completion_rate": round(done / (missed + done), 4)}
+        return result
+
+    def streak_distribution(self, buckets=(0, 1, 3, 7, 14, 30, 60, 90, 180, 365)) -> dict:
+        """Users by their latest reported streak, in [bucket, next bucket) ranges."""
+        streaks = self._user_column("streak")
+        edges = np.asarray(buckets)
+        counts = np.bincount(np.searchsorted(edges, streaks, side="right") - 1, minlength=len(edges))
+        labels = [f"{lo}-{hi - 1}" for lo, hi in zip(buckets, buckets[1:])] + [f"{buckets[-1]}+"]
+        return {label: int(count) for label, count in zip(labels, counts)}
+
+    def daily_active_users(self, days: int = 30, end_day: int = None) -> dict:
+        """Distinct users reporting per day, for the `days` days up to end_day."""
+        _check_positive(days=days)
+        end = (end_day or date.today().toordinal()) - EPOCH
+        start = max(end - days + 1, 0)
+        counts = np.zeros(2 * (end + 1), dtype=np.int64)
+        for chunk, _ in self._snapshot(start, end):
+            # day * 2 + (first report of the user that day)
+            key = (chunk["day"].astype(np.int32) << 1) | ((chunk["flags"] & NEW_DAY) >> 1)
+            counts += np.bincount(key, minlength=len(counts))[:len(counts)]
+        active = counts[2 * start + 1::2]
+        return {date.fromordinal(EPOCH + start + i).isoformat(): int(n) for i, n in enumerate(active)}
+
+    def missed_goals(self, top: int = 10, min_reports: int = 1) -> list:
+        """The goals most often reported as not done, with their miss rate."""
+        _check_positive(top=top, min_reports=min_reports)
+        goal_count = len(self.goals)
+        counts = np.zeros(2 * goal_count, dtype=np.int64)
+        for chunk, _ in self._snapshot():
+            key = (chunk["goal"] << 1) | (chunk["flags"] & DONE)
+            counts += np.bincount(key, minlength=len(counts))[:len(counts)]
+        missed = counts[0::2]
+        total = missed + counts[1::2]
+        missed[total < min_reports] = 0
+        top = min(top, goal_count)
+        if not top:
+            return []
+        best = np.argpartition(-missed, top - 1)[:top]
+        best = best[np.argsort(-missed[best], kind="stable")]
+        return [
+            {"goal": self.goals[i], "missed": int(missed[i]), "reports": int(total[i]),
+             "miss_rate": round(int(missed[i]) / int(total[i]), 4)}
+            for i in best if missed[i]
+        ]
+
+    def cohort_retention(self, weeks: int = 8) -> dict:
+        """
+        Weekly cohorts by first report: cohort size and the share of the cohort
+        that reported again in each following week.
+        """
+        _check_positive(weeks=weeks)
+        chunks = self._snapshot()
+        first_day = self._user_column("first_day")
+        if not len(first_day):
+            return {}
+        cohorts = first_day // 7
+        base = int(cohorts.min())
+        span = int(cohorts.max()) - base + 1
+        active = np.zeros(span * weeks, dtype=np.int64)
+        for chunk, _ in chunks:
+            # NEW_WEEK rows are ~1 in 7: gather just those
+            rows = np.flatnonzero(chunk["flags"] & NEW_WEEK)
+            first = first_day.take(chunk["user"].take(rows))
+            age = (chunk["day"].take(rows).astype(np.int32) - first) // 7
+            keep = (age >= 0) & (age < weeks)
+            key = (first[keep] // 7 - base) * weeks + age[keep]
+            active += np.bincount(key, minlength=span * weeks)
+        active = active.reshape(span, weeks)
+        result = {}
+        for row in range(span):
+            size = int(active[row, 0])
+            if size:
+                start = date.fromordinal(EPOCH + (base + row) * 7).isoformat()
+                result[start] = {"users": size, "retention": [round(int(n) / size, 4) for n in active[row]]}
+        return result
+
+    # --- persistence ---
+
+    def load(self) -> dict:
+        if not self.enabled or not os.path.isdir(self.directory):
+            return {"rows": 0}
+        started = time.perf_counter()
+        for path in sorted(glob.glob(os.path.join(self.directory, "chunk-*.npz"))):
+            with np.load(path) as data:
+                chunk = {name: data[name] for name in COLUMNS}
+            self.chunks.append(chunk)
+            self.zones.append(self._zone(chunk))
+        self._written = len(self.chunks)
+        self.user_ids = self._read_lines("users.jsonl")
+        self.goals = self._read_lines("goals.jsonl")
+        self._user_codes = {user_id: code for code, user_id in enumerate(self.user_ids)}
+        self._goal_codes = {goal: code for code, goal in enumerate(self.goals)}
+        self._users_written, self._goals_written = len(self.user_ids), len(self.goals)
+        path = os.path.join(self.directory, "users.npz")
+        if os.path.exists(path):
+            with np.load(path) as data:
+                for name in USER_COLUMNS:
+                    column = getattr(self, name)
+                    column.frombytes(data[name].astype(column.typecode).tobytes())
+        path = os.path.join(self.directory, "tail.npz")
+        if os.path.exists(path):
+            with np.load(path) as data:
+                # Written after the chunks it follows; from an older flush it may repeat a sealed chunk
+                if int(data["after"]) == len(self.chunks):
+                    for name in COLUMNS:
+                        self._buffer[name].frombytes(data[name].astype(self._buffer[name].typecode).tobytes())
+        self._match_user_columns()
+        self._persisted_rows = len(self)
+        stats = {"rows": len(self), "users": len(self.user_ids), "seconds": round(time.perf_counter() - started, 3)}
+        logger.info(f"Loaded analytics: {stats}")
+        return stats
+
+    def _match_user_columns(self) -> None:
+        """
+        Makes the per-user columns as long as user_ids after a crash mid-persist().
+        users.npz is written before users.jsonl, so it may cover users whose
+        ids never made it to disk (dropped: no chunk references them yet).
+        Directories written with the opposite order may instead lack columns
+        for the newest users; those are rebuilt from the users' rows on disk.
+        """
+        users = len(self.user_ids)
+        known = len(self.streak)
+        if known > users:
+            for name in USER_COLUMNS:
+                del getattr(self, name)[users:]
+            return
+        if known == users:
+            return
+        logger.warning(f"Rebuilding per-user analytics columns for {users - known} users")
+        first = np.full(users - known, MAX_OFFSET, dtype=np.int64)
+        last = np.full(users - known, -1, dtype=np.int64)
+        for chunk, _ in self._snapshot():
+            newer = chunk["user"] >= known
+            user = chunk["user"][newer] - known
+            day = chunk["day"][newer].astype(np.int64)
+            np.minimum.at(first, user, day)
+            np.maximum.at(last, user, day)
+        # No rows left (they were in a lost tail): first day EPOCH, which keeps
+        # daily actives right but leaves the user out of retention cohorts
+        first = np.where(last < 0, 0, first)
+        last = np.maximum(last, 0)
+        self.first_day.extend(first.tolist())
+        self.last_day.extend(last.tolist())
+        self.last_week.extend(((last - first) // 7).tolist())
+        self.streak.extend([0] * (users - known))
+
+    def _read_lines(self, name: str) -> list:
+        path = os.path.join(self.directory, name)
+        if not os.path.exists(path):
+            return []
+        with open(path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def persist(self, seal: bool = False) -> None:
+        """
+        Writes sealed chunks that aren't on disk yet, new dictionary entries,
+        the per-user columns and the open buffer. seal=True seals the open
+        buffer first (shutdown). Blocking file I/O: call it from a worker thread.
+        """
+        if not self.enabled:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            if seal and len(self._buffer["user"]):
+                self._seal()
+            chunks = self.chunks[self._written:]
+            first_chunk = self._written
+            new_users = self.user_ids[self._users_written:]
+            new_goals = self.goals[self._goals_written:]
+            per_user = {name: np.array(getattr(self, name), dtype=np.uint16 if name != "streak" else np.int32)
+                        for name in USER_COLUMNS}
+            tail = {name: np.array(self._buffer[name], dtype=COLUMNS[name]) for name in COLUMNS}
+            tail["after"] = np.int64(len(self.chunks))
+            rows = len(self)
+
+        # Per-user columns, then dictionaries: a chunk on disk must never
+        # reference unknown codes, and load() drops columns past the last user id
+        self._atomic_save("users.npz", per_user)
+        self._append_lines("users.jsonl", new_users)
+        self._append_lines("goals.jsonl", new_goals)
+        for i, chunk in enumerate(chunks, start=first_chunk):
+            self._atomic_save(f"chunk-{i:06d}.npz", chunk)
+        self._atomic_save("tail.npz", tail)
+
+        with self._lock:
+            self._persisted_rows = rows
+            self._written = first_chunk + len(chunks)
+            self._users_written += len(new_users)
+            self._goals_written += len(new_goals)
+
+    def _append_lines(self, name: str, values: list) -> None:
+        if not values:
+            return
+        with open(os.path.join(self.directory, name), "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(value) + "\n" for value in values))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _atomic_save(self, name: str, arrays: dict) -> None:
+        path = os.path.join(self.directory, name)
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, **arrays)
+        os.replace(tmp, path)
+
+    async def run_flusher(self) -> None:
+        """Background task: write new rows, chunks and dictionaries every flush_interval seconds."""
+        if not self.enabled:
+            return
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self._persisted_rows < len(self) or self._users_written < len(self.user_ids):
+                try:
+                    await asyncio.to_thread(self.persist)
+                except OSError as e:
+                    logger.error(f"Analytics flush failed: {e}")
+
+
+def _check_positive(**values) -> None:
+    for name, value in values.items():
+        if value < 1:
+            raise ValueError(f"{name} must be at least 1, got {value}")
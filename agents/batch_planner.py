@@ -0,0 +1,92 @@
+# agents/batch_planner.py
+
+import json
+import re
+import time
+
+from agents.prompt_builder import compact_habit
+
+# --- Batched goal generation (nightly re-planning) ---
+# Instead of one Gemini call per HabitInput, several habits are packed into a
+# single numbered prompt and the model answers with a JSON array of goals in
+# the same order. If the answer can't be parsed back item-by-item, the caller
+# falls back to one normal call per habit.
+# The coach persona/rules come from the model's system instruction
+# (agents/prompt_builder.py); the prompt only adds the list and answer format.
+
+_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+
+def build_batch_prompt(entries) -> str:
+    """
+    entries: list of (habit, streak bucket label) tuples.
+    """
+    numbered = "\n".join(
+        f'{i}. Habit: "{compact_habit(habit)}" (green streak: {bucket})'
+        for i, (habit, bucket) in enumerate(entries, start=1)
+    )
+    return (
+        f"Give today's micro-goal for EACH numbered habit.\n{numbered}\n"
+        f"Reply with ONLY a JSON array of exactly {len(entries)} strings, one goal per habit, in the same order."
+    )
+
+
+def parse_batch_response(text: str, expected: int):
+    """
+    Returns a list of `expected` goal strings, or None if the model's answer
+    doesn't have that exact shape.
+    """
+    text = _FENCE.sub("", text.strip())
+    try:
+        goals = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(goals, list) or len(goals) != expected:
+        return None
+    if not all(isinstance(goal, str) and goal.strip() for goal in goals):
+        return None
+    return [goal.strip() for goal in goals]
+
+
+def token_usage(response, prompt: str, text: str = None):
+    """
+    (input tokens, output tokens) for one call: Gemini's usage metadata when
+    present, otherwise a rough 4-characters-per-token estimate.
+    `text` overrides the output text used for the estimate (e.g. a joined stream).
+    """
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(usage, "prompt_token_count", None)
+    output_tokens = getattr(usage, "candidates_token_count", None)
+    if not prompt_tokens:
+        prompt_tokens = len(prompt) // 4
+    if not output_tokens:
+        output_tokens = len(text if text is not None else getattr(response, "text", "")) // 4
+    return prompt_tokens, output_tokens
+
+
+def count_tokens(response, prompt: str) -> int:
+    """Total tokens for one call."""
+    return sum(token_usage(response, prompt))
+
+
+class BatchStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.goals = 0
+        self.cached = 0
+        self.llm_calls = 0
+        self.fallbacks = 0
+        self.tokens = 0
+
+    def report(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "goals": self.goals,
+            "cached": self.cached,
+            "llm_calls": self.llm_calls,
+            "fallbacks": self.fallbacks,
+            "tokens": self.tokens,
+            "seconds": round(elapsed, 3),
+            "goals_per_sec": round(self.goals / elapsed, 2) if elapsed else 0.0,
+            "goals_per_1k_tokens": round(1000 * self.goals / self.tokens, 2) if self.tokens else 0.0,
+        }
@@ -0,0 +1,376 @@
+# agents/bulk.py
+
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import os
+import sys
+import time
+from datetime import date
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import agents.tracker_agent as tracker
+from agents.chat_history import ChatHistory
+from agents.persistence import Journal
+from agents.state_store import StateStore, UserState
+
+# --- Bulk import / export / replay of user habit data ---
+# For moving users between instances or seeding load tests. NDJSON, one
+# record per line (a path ending in .gz is gzip-compressed):
+#
+#   {"type":"user","user_id":"...","streak":3,"carry":1,"current_goal":"...","habit":"...","planned_goal":""}
+#   {"type":"report","user_id":"...","day":"2026-10-18","completed":true}
+#
+# Export writes each user's record followed by their report days. Only
+# completed days (plus the last reported day) are listed: a day without a
+# completed report counts as missed either way, as in agents/tracker_agent.py.
+# "carry" is the streak the user already had going into their first listed
+# day (e.g. from before they were tracked by day). Records without it are
+# taken to predate their report days, so the stored streak carries into the
+# first one, as the engine does for imported users.
+# --chunk-records splits the output into numbered part files.
+#
+# Import streams lines through a generator, so memory stays flat whatever
+# the file size. User records are written in batches of COACH_BULK_BATCH,
+# one backend transaction each (StateStore.save_many). Every record is also
+# journaled like live traffic: reports with the streak as of their day, user
+# records once per batch after its reports. After each batch the journal is
+# fsynced and a checkpoint (<file>.ckpt: byte offset + counts) is written,
+# and an interrupted import picks up from there.
+#
+# Modes:
+#   import  user records are taken as they are; reports fill the calendar history
+#   replay  streaks are recomputed from the report days (consecutive completed
+#           days up to the last report, as the tracker counts them) plus any
+#           "carry", ignoring the streak in user records
+#
+# The CLI works on the state behind COACH_STATE_BACKEND / COACH_DATA_DIR, so
+# run it while the backend is stopped (or use /admin/bulk/* on a running one):
+#   python agents/bulk.py export users.ndjson.gz [--chunk-records 1000000]
+#   python agents/bulk.py import users-*.ndjson.gz
+#   python agents/bulk.py replay reports.ndjson
+
+logger = logging.getLogger("coach.bulk")
+
+MODES = ("import", "replay")
+BATCH_SIZE = int(os.getenv("COACH_BULK_BATCH", "5000"))
+
+
+class BulkError(ValueError):
+    """A record that can't be imported; `committed` bytes before it are safely in."""
+
+    def __init__(self, message: str, committed: int = 0):
+        super().__init__(message)
+        self.committed = committed
+
+
+def parse_day(value) -> int:
+    return value if isinstance(value, int) else date.fromisoformat(value).toordinal()
+
+
+class BulkImporter:
+    def __init__(self, state_store: StateStore, journal: Journal, mode: str = "import", batch_size: int = None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown bulk mode '{mode}' (expected one of {MODES})")
+        self.state_store = state_store
+        self.journal = journal
+        self.mode = mode
+        self.batch_size = batch_size or BATCH_SIZE
+        self._pending = {}  # user_id -> UserState, written by the next flush()
+        self._carries = {}  # user_id -> "carry" of a user record whose first report hasn't come yet
+        self._unflushed = 0
+        self.users = 0
+        self.reports = 0
+        self.started = time.perf_counter()
+
+    def add(self, record: dict) -> None:
+        user_id = record.get("user_id") if isinstance(record, dict) else None
+        if not isinstance(user_id, str) or not user_id:
+            raise ValueError("user_id is required")
+        kind = record.get("type")
+        self._unflushed += 1
+        try:
+            if kind == "user":
+                self._add_user(user_id, record)
+            elif kind == "report":
+                self._add_report(user_id, bool(record["completed"]), parse_day(record["day"]))
+            else:
+                raise ValueError(f"unknown record type {kind!r}")
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"bad {kind} record for {user_id}: {e!r}")
+
+    def _add_user(self, user_id: str, record: dict) -> None:
+        state = UserState(
+            int(record.get("streak", 0)),
+            str(record.get("current_goal", "")),
+            str(record.get("habit", "")),
+            str(record.get("planned_goal", "")),
+        )
+        carry = int(record.get("carry", 0))
+        if "carry" in record and user_id not in tracker.histories:
+            self._carries[user_id] = carry
+        if self.mode == "replay":
+            history = tracker.histories.get(user_id)
+            state.streak = history.streak if history is not None else carry
+        self._pending[user_id] = state
+        self.users += 1
+
+    def _add_report(self, user_id: str, completed: bool, day: int) -> None:
+        state = self._pending.get(user_id)
+        if state is None:
+            state = self._pending[user_id] = self.state_store.get(user_id)
+        carry = 0
+        if user_id not in tracker.histories:
+            # First tracked day: continue the streak the user already had
+            carry = self._carries.pop(user_id, state.streak if self.mode == "import" else 0)
+        tracker.log_habit(completed, user_id, day, carry)
+        # The day's own streak: recovery rebuilds the calendar from these, not the final one
+        streak = tracker.histories[user_id].streak
+        if self.mode == "replay":
+            state.streak = streak
+        self.journal.record_report(user_id, completed, streak, day, carry=carry)
+        self.reports += 1
+
+    @property
+    def full(self) -> bool:
+        return self._unflushed >= self.batch_size
+
+    def flush(self) -> None:
+        """Writes pending user records in one transaction and fsyncs the journal."""
+        if self._pending:
+            # Journaled after the batch's reports, so replaying those doesn't overwrite imported streaks
+            for user_id, state in self._pending.items():
+                self.journal.record_user(user_id, state)
+            self.state_store.save_many(list(self._pending.items()))
+            self._pending.clear()
+        self.journal.flush()
+        self._unflushed = 0
+
+    def stats(self) -> dict:
+        seconds = time.perf_counter() - self.started
+        return {
+            "mode": self.mode,
+            "users": self.users,
+            "reports": self.reports,
+            "seconds": round(seconds, 3),
+            "records_per_second": round((self.users + self.reports) / seconds) if seconds else None,
+        }
+
+
+# --- reading ---
+
+def _open(path: str, mode: str):
+    return gzip.open(path, mode) if path.endswith(".gz") else open(path, mode)
+
+
+def read_lines(path: str, offset: int = 0):
+    """Yields (byte offset just past the line, line) for every non-blank line from `offset` on."""
+    with _open(path, "rb") as f:
+        if offset:
+            f.seek(offset)
+        for line in f:
+            offset += len(line)
+            if line.strip():
+                yield offset, line
+
+
+def _checkpoint_path(path: str) -> str:
+    return path + ".ckpt"
+
+
+def _load_checkpoint(path: str) -> dict:
+    try:
+        with open(_checkpoint_path(path), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"offset": 0}
+
+
+def _save_checkpoint(path: str, checkpoint: dict) -> None:
+    tmp = _checkpoint_path(path) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp, _checkpoint_path(path))
+
+
+def import_file(path: str, importer: BulkImporter, resume: bool = True) -> dict:
+    checkpoint = _load_checkpoint(path) if resume else {"offset": 0}
+    if checkpoint.get("done"):
+        logger.info(f"{path} already imported, skipping")
+        return checkpoint
+    if checkpoint["offset"]:
+        logger.info(f"Resuming {path} at byte {checkpoint['offset']}")
+
+    # Counts in the checkpoint cover the whole file, across resumed runs
+    users = checkpoint.get("users", 0) - importer.users
+    reports = checkpoint.get("reports", 0) - importer.reports
+
+    def commit(offset, done=False):
+        importer.flush()
+        checkpoint.update(offset=offset, done=done, mode=importer.mode,
+                          users=users + importer.users, reports=reports + importer.reports)
+        _save_checkpoint(path, checkpoint)
+
+    good = checkpoint["offset"]  # end of the last record that went in
+    for offset, line in read_lines(path, good):
+        try:
+            importer.add(json.loads(line))
+        except ValueError as e:
+            # Keep what came before; a rerun stops at this line again until it's fixed
+            commit(good)
+            raise BulkError(f"{path}: {e} (line ending at byte {offset})", good)
+        good = offset
+        if importer.full:
+            commit(good)
+    commit(good, done=True)
+    return checkpoint
+
+
+async def import_stream(chunks, importer: BulkImporter) -> dict:
+    """
+    Imports NDJSON arriving as byte chunks (an HTTP request body). On a bad
+    record raises BulkError with how many bytes were committed before it,
+    so the client can resend the rest.
+    """
+    buffer = b""
+    consumed = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            _import_line(importer, line, consumed)
+            consumed += len(line) + 1
+            if importer.full:
+                importer.flush()
+                await asyncio.sleep(0)  # let live requests in between batches
+    _import_line(importer, buffer, consumed)
+    importer.flush()
+    return importer.stats()
+
+
+def _import_line(importer: BulkImporter, line: bytes, consumed: int) -> None:
+    if not line.strip():
+        return
+    try:
+        importer.add(json.loads(line))
+    except ValueError as e:
+        # Everything before this line goes in
+        importer.flush()
+        raise BulkError(f"{e} (line starting at byte {consumed})", consumed)
+
+
+# --- writing ---
+
+def export_records(state_store: StateStore):
+    """Yields every user's record, then their report days (see the header for the format)."""
+    histories = dict(tracker.histories)
+    for user_id, record in state_store.items():
+        streak, current_goal, habit, planned_goal = record
+        history = histories.pop(user_id, None)
+        yield {"type": "user", "user_id": user_id, "streak": streak,
+               "carry": _carry(history) if history is not None else 0,
+               "current_goal": current_goal, "habit": habit, "planned_goal": planned_goal}
+        if history is not None:
+            yield from _report_records(user_id, history)
+    # Reports from users without a stored record
+    for user_id, history in histories.items():
+        yield from _report_records(user_id, history)
+
+
+def _carry(history: tracker.HabitHistory) -> int:
+    # Only a streak longer than the tracked days can still include a carry; once
+    # the run has broken, whatever came before the first day no longer counts
+    return max(history.streak - (history.last_day - history.first_day + 1), 0)
+
+
+def _report_records(user_id: str, history: tracker.HabitHistory):
+    last = history.last_day - history.first_day
+    for byte_index, byte in enumerate(bytes(history.bits)):
+        while byte:
+            bit = byte & -byte
+            offset = byte_index * 8 + bit.bit_length() - 1
+            byte ^= bit
+            if offset <= last:
+                yield {"type": "report", "user_id": user_id,
+                       "day": date.fromordinal(history.first_day + offset).isoformat(), "completed": True}
+    if last >= 0 and not history.bits[last // 8] >> (last % 8) & 1:
+        yield {"type": "report", "user_id": user_id,
+               "day": date.fromordinal(history.last_day).isoformat(), "completed": False}
+
+
+def export_file(records, path: str, chunk_records: int = None) -> list:
+    """
+    Writes records as NDJSON. With chunk_records, into numbered parts
+    (users.ndjson.gz -> users-00000.ndjson.gz, ...). Returns the paths written.
+    """
+    base, ext = path, ""
+    for suffix in (".ndjson.gz", ".ndjson", ".jsonl.gz", ".jsonl", ".gz"):
+        if path.endswith(suffix):
+            base, ext = path[:-len(suffix)], suffix
+            break
+    paths, f, written = [], None, 0
+    try:
+        for record in records:
+            if f is None or (chunk_records and written >= chunk_records):
+                if f is not None:
+                    f.close()
+                paths.append(f"{base}-{len(paths):05d}{ext}" if chunk_records else path)
+                f = _open(paths[-1], "wt")
+                written = 0
+            f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+            written += 1
+    finally:
+        if f is not None:
+            f.close()
+    return paths
+
+
+# --- CLI ---
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import / export / replay of coach user data (NDJSON)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="write all users and report days")
+    export.add_argument("path")
+    export.add_argument("--chunk-records", type=int, default=0, help="split into part files of this many records")
+    for name in ("import", "replay"):
+        command = commands.add_parser(name, help=f"load NDJSON files ({name} mode)")
+        command.add_argument("paths", nargs="+")
+        command.add_argument("--batch", type=int, default=None, help=f"users per transaction (default {BATCH_SIZE})")
+        command.add_argument("--no-resume", action="store_true", help="ignore existing checkpoints")
+    return parser.parse_args(argv)
+
+
+def main_cli(argv=None) -> int:
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args(argv)
+    state_store = StateStore()
+    journal = Journal(state_store, history=ChatHistory())
+    journal.recover()
+    try:
+        if args.command == "export":
+            started = time.perf_counter()
+            paths = export_file(export_records(state_store), args.path, args.chunk_records or None)
+            logger.info(f"Exported {len(state_store)} users to {len(paths)} file(s) in {time.perf_counter() - started:.1f}s")
+            return 0
+
+        importer = BulkImporter(state_store, journal, args.command, args.batch)
+        for path in args.paths:
+            try:
+                import_file(path, importer, resume=not args.no_resume)
+            except BulkError as e:
+                logger.error(f"{e}; rerun to resume after the last checkpoint")
+                return 1
+        logger.info(f"Imported: {importer.stats()}")
+        # Fold the imported events into a snapshot so the next start doesn't replay them all
+        asyncio.run(journal.snapshot())
+        return 0
+    finally:
+        journal.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,72 @@
+# agents/chat_history.py
+
+import os
+from collections import deque
+
+# --- Per-user conversation history ---
+# The last COACH_HISTORY_PER_USER goal/report entries for each user, so a
+# client can show older messages without keeping them all itself
+# (GET /v1/history pages through them, newest first).
+#
+# Entries are built from the journal's own events (see agents/persistence.py):
+# live as they're recorded and again on replay, and the snapshot carries
+# them, so history survives restarts with no extra log writes. Each entry
+# has a per-user id that only grows; pages are cut by id ("before"), so a
+# page stays stable while new messages arrive.
+#
+#   {"id": 7, "kind": "goal",   "habit": "...", "goal": "..."}
+#   {"id": 8, "kind": "report", "completed": true, "streak": 3, "day": <ordinal>}
+#   {"id": 9, "kind": "report", ..., "expired": true}   day passed with no report (agents/timers.py)
+#   {"id": 10, "kind": "reminder", "text": "..."}
+
+
+class ChatHistory:
+    def __init__(self, per_user: int = None):
+        self.per_user = per_user or int(os.getenv("COACH_HISTORY_PER_USER", "50"))
+        self._entries = {}  # user_id -> deque of entries, oldest first
+
+    def _append(self, user_id: str, entry: dict) -> None:
+        entries = self._entries.get(user_id)
+        if entries is None:
+            entries = self._entries[user_id] = deque(maxlen=self.per_user)
+        entry["id"] = entries[-1]["id"] + 1 if entries else 1
+        entries.append(entry)
+
+    def add_goal(self, user_id: str, habit: str, goal: str) -> None:
+        self._append(user_id, {"kind": "goal", "habit": habit, "goal": goal})
+
+    def add_report(self, user_id: str, completed: bool, streak: int, day: int, expired: bool = False) -> None:
+        entry = {"kind": "report", "completed": completed, "streak": streak, "day": day}
+        if expired:
+            entry["expired"] = True
+        self._append(user_id, entry)
+
+    def add_reminder(self, user_id: str, text: str) -> None:
+        self._append(user_id, {"kind": "reminder", "text": text})
+
+    def page(self, user_id: str, before: int = None, limit: int = 20) -> dict:
+        """
+        Up to `limit` entries older than id `before` (None = the newest ones),
+        oldest first, plus whether anything older is left.
+        """
+        entries = self._entries.get(user_id, ())
+        # Ids are consecutive, so `before` maps straight to a position
+        end = len(entries)
+        if before is not None and entries:
+            end = max(0, min(end, before - entries[0]["id"]))
+        start = max(0, end - limit)
+        return {
+            "messages": [entries[i] for i in range(start, end)],
+            "has_more": start > 0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # --- snapshots ---
+
+    def dump(self) -> list:
+        return [[user_id, list(entries)] for user_id, entries in list(self._entries.items())]
+
+    def load(self, dumped) -> None:
+        self._entries = {user_id: deque(entries, maxlen=self.per_user) for user_id, entries in dumped}
@@ -1,26 +1,15 @@
 import random
 
-SUGGESTED_HABITS = [
-    "I drive to nearby places",
-    "I use plastic bags regularly",
-    "I leave lights on unnecessarily",
-    "I buy bottled water daily",
-    "I take long showers",
-]
+from agents.intent_classifier import SUGGESTED_HABITS, classify, templated_reply
 
 def suggest_goal(habit: str) -> str:
-    habit = habit.strip().lower()
-
-    if not habit or "start" in habit or "journey" in habit or len(habit.split()) < 3:
-        suggested_list = "\n".join([f"- {h}" for h in SUGGESTED_HABITS])
-        return (
-            "👋 Welcome! I'm your Sustainability Coach 🤖\n\n"
-            "To begin your journey, tell me one habit you'd like to change.\n"
-            "Here are some ideas you can type:\n\n"
-            f"{suggested_list}\n\n"
-            "Once you enter a habit, I'll suggest a personal micro-goal. 🌱"
-        )
+    # Greetings, direct prompts and known habit categories come straight from templates
+    intent = classify(habit)
+    reply = templated_reply(intent)
+    if reply is not None:
+        return reply
 
+    habit = intent.text
     responses = [
         f"💡 Try replacing '{habit}' with walking, biking, or public transport — small step, big impact!",
         f"🌿 Let's improve '{habit}' — switch to reusable or energy-efficient options.",
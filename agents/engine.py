@@ -0,0 +1,284 @@
+# agents/engine.py
+
+import asyncio
+import logging
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import agents.tracker_agent as tracker
+from agents.coach_agent import suggest_goal
+from agents.intent_classifier import classify, templated_reply
+from agents.llm_pool import PoolBusy
+from agents.planner import same_habit
+from agents.scheduler import Shed
+from agents.state_store import StateStore
+
+# --- The coaching engine ---
+# One async core behind every front door: the uAgents protocol handlers in
+# agents/coach_agent_os.py, the synchronous MasterAgent in
+# agents/master_agent.py, and anything that embeds the coach in-process.
+#
+#   engine = CoachEngine(state_store, TemplateGoals())
+#   session = engine.session("alice")
+#   reply = await session.suggest("I drive to work")   # Reply(text, streak, source)
+#   reply = await session.report(True)
+#
+# Calling a session directly skips everything a uAgents message pays for:
+# JSON encoding of the model, the signed envelope, signature checks and
+# parsing on the other side (benchmarks/engine_bench.py shows the gap).
+#
+# - Goal generators are pluggable: anything with
+#   `async generate(user_id, habit, streak, send=None) -> goal text`.
+#   TemplateGoals answers offline; coach_agent_os.LLMGoals asks Gemini
+#   (cache, rate limit, fair scheduling, provider routing). With `send`,
+#   a generator may stream pieces through `await send(text)` first.
+# - Rule-based fast path (agents/intent_classifier.py): greetings, direct
+#   prompts and known habit categories never reach the generator.
+#   COACH_FAST_PATH=0 turns it off.
+# - Streaks come from one place, the calendar-day tracker
+#   (agents/tracker_agent.py): one report per day counts, a missed day
+#   breaks the streak. The stored UserState.streak follows it.
+# - Deadlines (agents/timers.py): every report re-arms the user's streak
+#   expiry and reminder; expire() and remind() are what those timers call.
+# - Journal, planner, analytics, scheduler and timers are optional, so an
+#   embedded engine can be as small as a StateStore and a generator.
+
+logger = logging.getLogger("coach.engine")
+
+ERROR_REPLY = "I'm sorry, I couldn't generate a goal right now. My AI brain might be busy. Please try again in a moment!"
+BUSY_REPLY = "I'm helping a lot of people right now! Please try again in a few seconds. 🌱"
+RATE_LIMITED_REPLY = "You're moving fast! 🌱 Give me a few seconds to catch up, then try again."
+
+
+class RateLimited(Exception):
+    """The user is over their generation rate limit."""
+
+
+def report_feedback(completed: bool, streak: int, habit: str = "") -> str:
+    if completed:
+        return f"Fantastic job! You've successfully completed your goal. Your green streak is now **{streak} days**! Keep up the amazing work! 🌱"
+    return "It's okay, not every day is perfect! The important thing is to keep trying. Let's aim for a better tomorrow. Your streak has been reset, but a new one starts now!"
+
+
+def reminder_text(goal: str, streak: int) -> str:
+    if streak > 0:
+        return f"⏰ Quick check-in: how did today's goal go? Report it to keep your **{streak}-day streak** alive! 🌱"
+    if goal:
+        return f"⏰ Quick check-in: did you get to today's goal? \"{goal}\" 🌱"
+    return "⏰ Quick check-in: tell me about one habit you'd like to change today. 🌱"
+
+
+class Reply:
+    # source: how the text came about ("fast_path", "planned", "generated",
+    # "report", "expired", "reminder", "rate_limited", "busy", "error")
+    __slots__ = ("text", "streak", "source")
+
+    def __init__(self, text: str, streak: int, source: str):
+        self.text = text
+        self.streak = streak
+        self.source = source
+
+    def __repr__(self):
+        return f"Reply(text={self.text!r}, streak={self.streak}, source={self.source!r})"
+
+
+class TemplateGoals:
+    """Offline goals from agents/coach_agent.py."""
+
+    async def generate(self, user_id: str, habit: str, streak: int, send=None) -> str:
+        return suggest_goal(habit)
+
+
+class CoachSession:
+    """One user's conversation with an engine."""
+
+    __slots__ = ("engine", "user_id")
+
+    def __init__(self, engine: "CoachEngine", user_id: str):
+        self.engine = engine
+        self.user_id = user_id
+
+    async def suggest(self, habit: str, send=None) -> Reply:
+        return await self.engine.suggest(self.user_id, habit, send)
+
+    async def report(self, completed: bool, habit: str = "", goal_id: str = "") -> Reply:
+        return await self.engine.report(self.user_id, completed, habit, goal_id)
+
+    @property
+    def streak(self) -> int:
+        return self.engine.streak(self.user_id)
+
+    @property
+    def current_goal(self) -> str:
+        return self.engine.state_store.get(self.user_id).current_goal
+
+
+class CoachEngine:
+    def __init__(self, state_store: StateStore, goals, journal=None, planner=None, analytics=None,
+                 scheduler=None, timers=None, fast_path: bool = None, feedback=report_feedback):
+        """
+        goals: goal generator (see the header)
+        journal/planner/analytics/scheduler: optional agents/persistence.Journal,
+        agents/planner.GoalPlanner, agents/analytics.ReportAnalytics and
+        agents/scheduler.Scheduler (only its report rate limit is used here)
+        timers: optional agents/timers.Deadlines, re-armed on every report
+        feedback: (completed, streak, habit) -> text for reports
+        """
+        self.state_store = state_store
+        self.goals = goals
+        self.journal = journal
+        self.planner = planner
+        self.analytics = analytics
+        self.scheduler = scheduler
+        self.timers = timers
+        self.fast_path = fast_path if fast_path is not None else os.getenv("COACH_FAST_PATH", "1") != "0"
+        self.feedback = feedback
+
+        # Counters (read by metrics)
+        self.fast_path_hits = {}  # intent kind -> count
+
+    def session(self, user_id: str) -> CoachSession:
+        return CoachSession(self, user_id)
+
+    def streak(self, user_id: str, state=None) -> int:
+        """The user's current streak: 0 once a day has gone by without a report."""
+        history = tracker.histories.get(user_id)
+        if history is None:
+            # Imported or migrated users have a stored streak but no calendar yet
+            return (state or self.state_store.get(user_id)).streak
+        return history.current_streak(tracker.today())
+
+    def count_fast_path(self, kind: str) -> None:
+        self.fast_path_hits[kind] = self.fast_path_hits.get(kind, 0) + 1
+
+    # --- goals ---
+
+    async def suggest(self, user_id: str, habit: str, send=None) -> Reply:
+        """A micro-goal for `habit`. Never raises: failures come back as apology replies."""
+        # Greetings, direct prompts and known habits are answered from templates
+        if self.fast_path:
+            intent = classify(habit)
+            fast_reply = templated_reply(intent)
+            if fast_reply is not None:
+                self.count_fast_path(intent.kind)
+                if intent.kind == "habit":
+                    return Reply(fast_reply, await self.store_goal(user_id, fast_reply, habit), "fast_path")
+                # Not a goal: just answer, leave the user's current goal alone
+                return Reply(fast_reply, self.streak(user_id), "fast_path")
+
+        # Returning user, same habit: their next goal was planned in the background
+        planned = await self._take_planned_goal(user_id, habit)
+        if planned is not None:
+            return planned
+
+        # Only the streak is needed for the prompt; no lock while the generator runs
+        streak = self.streak(user_id)
+        try:
+            goal = await self.goals.generate(user_id, habit, streak, send)
+        except RateLimited:
+            logger.warning(f"Rate limited goal request from {user_id}")
+            return Reply(RATE_LIMITED_REPLY, streak, "rate_limited")
+        except (Shed, PoolBusy):
+            # Queue is full: answer right away instead of piling up more waiters
+            logger.warning(f"Generation queue full, turning away {user_id}")
+            return Reply(BUSY_REPLY, streak, "busy")
+        except asyncio.TimeoutError:
+            logger.error(f"Goal generation timed out for user {user_id}")
+            return Reply(ERROR_REPLY, streak, "error")
+        except Exception as e:
+            logger.error(f"Error generating a goal for user {user_id}: {e!r}")
+            return Reply(ERROR_REPLY, streak, "error")
+        return Reply(goal, await self.store_goal(user_id, goal, habit), "generated")
+
+    async def store_goal(self, user_id: str, goal: str, habit: str) -> int:
+        """Makes `goal` the user's current goal; returns their streak."""
+        async with self.state_store.lock_for(user_id):
+            state = self.state_store.get(user_id)
+            if state.habit != habit:
+                # New habit: a goal planned for the old one is no use any more
+                state.habit, state.planned_goal = habit, ""
+            state.current_goal = goal
+            self.state_store.save(user_id, state)
+            if self.journal is not None:
+                self.journal.record_goal(user_id, goal, habit)
+            return self.streak(user_id, state)
+
+    async def _take_planned_goal(self, user_id: str, habit: str):
+        if self.planner is None:
+            return None
+        async with self.state_store.lock_for(user_id):
+            state = self.state_store.get(user_id)
+            if not state.planned_goal or not same_habit(state.habit, habit):
+                return None
+            goal, state.planned_goal = state.planned_goal, ""
+            state.current_goal = goal
+            self.state_store.save(user_id, state)
+            if self.journal is not None:
+                self.journal.record_goal(user_id, goal, state.habit)
+            streak = self.streak(user_id, state)
+
+        self.planner.served += 1
+        self.planner.refresh(user_id)  # plan the one after that, off the request path
+        return Reply(goal, streak, "planned")
+
+    # --- reports ---
+
+    async def report(self, user_id: str, completed: bool, habit: str = "", goal_id: str = "",
+                     day: int = None) -> Reply:
+        """Logs today's (or `day`'s) result and returns feedback with the new streak."""
+        if self.scheduler is not None and not self.scheduler.allow("report", user_id):
+            logger.warning(f"Rate limited report from {user_id}")
+            return Reply(RATE_LIMITED_REPLY, self.streak(user_id), "rate_limited")
+
+        streak, habit = await self._log_report(user_id, completed, habit, goal_id,
+                                               tracker.today() if day is None else day)
+        return Reply(self.feedback(completed, streak, habit), streak, "report")
+
+    async def expire(self, user_id: str, day: int):
+        """
+        Logs a miss for `day` if the user let it pass without reporting (a
+        streak-expiry timer fired). Returns None if they reported after all.
+        """
+        logged = await self._log_report(user_id, False, "", "", day, expired=True)
+        if logged is None:
+            return None
+        return Reply(self.feedback(False, logged[0], logged[1]), logged[0], "expired")
+
+    async def remind(self, user_id: str):
+        """A nudge for a user who hasn't reported today; None if they already have."""
+        history = tracker.histories.get(user_id)
+        if history is not None and history.last_day >= tracker.today():
+            return None
+        state = self.state_store.get(user_id)
+        streak = self.streak(user_id, state)
+        text = reminder_text(state.current_goal, streak)
+        if self.journal is not None:
+            self.journal.record_reminder(user_id, text)
+        return Reply(text, streak, "reminder")
+
+    async def _log_report(self, user_id: str, completed: bool, habit: str, goal_id: str, day: int,
+                          expired: bool = False):
+        """(new streak, habit), or None for an expiry of a day that was reported meanwhile."""
+        async with self.state_store.lock_for(user_id):
+            history = tracker.histories.get(user_id)
+            if expired and history is not None and history.last_day >= day:
+                return None
+            state = self.state_store.get(user_id)
+            # A stored streak without a calendar (imported users) carries on from where it was
+            carry = state.streak if history is None else 0
+            tracker.log_habit(completed, user_id, day, carry=carry)
+            history = tracker.histories[user_id]
+            state.streak = streak = history.streak
+            self.state_store.save(user_id, state)
+            if self.journal is not None:
+                self.journal.record_report(user_id, completed, streak, day, expired, carry)
+            habit = habit or state.habit
+            # An expiry is a day nobody reported: it isn't activity, so analytics never sees it
+            if self.analytics is not None and not expired:
+                self.analytics.record(user_id, day, classify(habit).category if habit else "",
+                                      goal_id or state.current_goal, completed, streak)
+        if self.timers is not None:
+            self.timers.on_report(user_id, history.last_day, history.streak)
+        return streak, habit
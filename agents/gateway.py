@@ -0,0 +1,129 @@
+# agents/gateway.py
+
+import asyncio
+import itertools
+import logging
+import os
+
+# --- In-process request/response gateway ---
+# The coach handlers answer with `await ctx.send(sender, CoachReply(...))`,
+# which on its own has no link back to an HTTP request. The gateway calls
+# the protocol handlers directly (no network hop, no envelope) with a
+# stand-in Context whose send() resolves a per-request future.
+# Each request gets a unique fake sender address ("gateway:<n>"), so replies
+# are matched to waiting requests with a dict lookup, no polling.
+#
+# Streaming: stream() registers the sender for partial output. Handlers that
+# see ctx.wants_chunks(sender) push text pieces with ctx.send_chunk() before
+# their final ctx.send().
+
+
+class GatewayTimeout(Exception):
+    """The handler didn't reply before the deadline."""
+
+
+class GatewayContext:
+    """
+    Just enough of uagents' Context for the coach handlers: a logger and send().
+    """
+
+    def __init__(self, gateway: "Gateway"):
+        self._gateway = gateway
+        self.logger = logging.getLogger("coach.gateway")
+
+    async def send(self, destination: str, message) -> None:
+        self._gateway.resolve(destination, message)
+
+    def wants_chunks(self, destination: str) -> bool:
+        return destination in self._gateway._streams
+
+    async def send_chunk(self, destination: str, text: str) -> None:
+        queue = self._gateway._streams.get(destination)
+        if queue is not None:
+            queue.put_nowait(("chunk", text))
+
+
+class Gateway:
+    def __init__(self, timeout: float = None):
+        self.timeout = timeout or float(os.getenv("COACH_GATEWAY_TIMEOUT", "30"))
+        self.ctx = GatewayContext(self)
+        self._pending = {}  # sender address -> Future waiting for the reply
+        self._streams = {}  # sender address -> Queue of ("chunk" | "reply" | "error", payload)
+        self._ids = itertools.count(1)
+
+    async def request(self, handler, msg, timeout: float = None):
+        """
+        Runs handler(ctx, sender, msg) and returns the first message it sends back.
+        Raises GatewayTimeout if nothing arrives in time; exceptions raised by
+        the handler before replying are re-raised here.
+        """
+        sender = f"gateway:{next(self._ids)}"
+        reply = asyncio.get_running_loop().create_future()
+        self._pending[sender] = reply
+
+        task = asyncio.ensure_future(handler(self.ctx, sender, msg))
+        task.add_done_callback(lambda t: self._handler_done(sender, t))
+        try:
+            return await asyncio.wait_for(reply, timeout or self.timeout)
+        except asyncio.TimeoutError:
+            # The handler keeps running (it may still be updating state);
+            # only this caller stops waiting.
+            raise GatewayTimeout(f"No reply from {handler.__name__} within {timeout or self.timeout}s")
+        finally:
+            self._pending.pop(sender, None)
+
+    async def stream(self, handler, msg, timeout: float = None):
+        """
+        Like request(), but an async generator of ("chunk", text) items
+        followed by one ("reply", message). `timeout` is the longest allowed
+        gap between two items.
+        """
+        sender = f"gateway:{next(self._ids)}"
+        events = asyncio.Queue()
+        self._streams[sender] = events
+
+        task = asyncio.ensure_future(handler(self.ctx, sender, msg))
+        task.add_done_callback(lambda t: self._handler_done(sender, t))
+        try:
+            while True:
+                try:
+                    kind, payload = await asyncio.wait_for(events.get(), timeout or self.timeout)
+                except asyncio.TimeoutError:
+                    raise GatewayTimeout(f"No output from {handler.__name__} within {timeout or self.timeout}s")
+                if kind == "error":
+                    raise payload
+                yield kind, payload
+                if kind == "reply":
+                    return
+        finally:
+            self._streams.pop(sender, None)
+
+    def resolve(self, destination: str, message) -> None:
+        events = self._streams.get(destination)
+        if events is not None:
+            events.put_nowait(("reply", message))
+            return
+        reply = self._pending.get(destination)
+        if reply is not None and not reply.done():
+            reply.set_result(message)
+
+    def _handler_done(self, sender: str, task) -> None:
+        reply = self._pending.get(sender)
+        if task.cancelled():
+            return
+        error = task.exception()
+        events = self._streams.get(sender)
+        if events is not None:
+            # Only read if the handler never sent its final reply
+            events.put_nowait(("error", error or RuntimeError("Handler finished without sending a reply")))
+            return
+        if reply is None or reply.done():
+            return
+        if error is not None:
+            reply.set_exception(error)
+        else:
+            reply.set_exception(RuntimeError("Handler finished without sending a reply"))
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending) + len(self._streams)
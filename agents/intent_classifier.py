@@ -0,0 +1,196 @@
+# agents/intent_classifier.py
+
+import random
+import re
+from collections import deque
+
+# --- Rule-based fast path ---
+# Shared by the rule-based coach (coach_agent.suggest_goal) and the Gemini
+# coach (coach_agent_os). Input is classified as one of:
+#   "direct"   - a canned question like "eco tip" or "inspire me"
+#   "greeting" - empty/short input, "hi", "start my journey", ...
+#   "habit"    - mentions a known habit category (transport, plastics, energy, water)
+#   "novel"    - anything else; only this needs the LLM
+# Keyword stems are compiled once, at import, into an Aho-Corasick automaton,
+# so classification is a single pass over the text no matter how many
+# keywords the taxonomy has.
+
+SUGGESTED_HABITS = [
+    "I drive to nearby places",
+    "I use plastic bags regularly",
+    "I leave lights on unnecessarily",
+    "I buy bottled water daily",
+    "I take long showers",
+]
+
+ONBOARDING_MESSAGE = (
+    "👋 Welcome! I'm your Sustainability Coach 🤖\n\n"
+    "To begin your journey, tell me one habit you'd like to change.\n"
+    "Here are some ideas you can type:\n\n"
+    + "\n".join(f"- {h}" for h in SUGGESTED_HABITS)
+    + "\n\nOnce you enter a habit, I'll suggest a personal micro-goal. 🌱"
+)
+
+DIRECT_PROMPTS = {
+    "tell me a green fact": "Did you know that recycling one aluminum can saves enough energy to power a TV for three hours? Every little bit helps! 🌱",
+    "what can i recycle today": "For today, focus on recycling all clean paper, cardboard, plastic bottles (with caps), and aluminum cans. Check local guidelines for more specifics! ♻️",
+    "eco tip": "Here's a quick eco tip: Unplug electronics when not in use. They can still draw 'phantom' power even when turned off! 💡",
+    "why is climate change bad": "Climate change is leading to more extreme weather, rising sea levels, and impacts on ecosystems, threatening human health and natural habitats globally. 🌍",
+    "inspire me": "Remember, every small action you take for sustainability creates a ripple effect. Your effort matters, and together, we can build a greener future! ✨",
+}
+
+# Trailing space = whole word only ("hi " shouldn't fire on "hike")
+GREETING_STEMS = ["hi ", "hello", "hey ", "start", "journey", "begin", "help "]
+
+# category -> (keyword stems, goal templates). Stems match at the start of a word:
+# "driv" matches "drive", "driving", "driver". A stem that is also the start
+# of unrelated words is listed as whole words instead ("bag ", "bags" rather
+# than "bag", which would match "bagel").
+TAXONOMY = {
+    "transport": (
+        ["driv", "car ", "cars", "uber", "taxi ", "taxis", "commut", "fly ", "flying", "flies", "flight",
+         "motorbike", "scooter"],
+        [
+            "Today, pick one short trip you'd usually drive and walk, bike, or take public transport instead. 🚲",
+            "Micro-goal: combine two errands into one trip today, or skip one car ride entirely. 🚶",
+            "Try a car-free hour today: any trip under 2 km happens on foot or by bike. 🌿",
+        ],
+    ),
+    "plastics": (
+        ["plastic", "bag ", "bags", "straw ", "straws", "packag", "wrapper", "takeaway", "disposable",
+         "single use", "single-use"],
+        [
+            "Today, keep one reusable bag with you and say no to every plastic bag offered. 🛍️",
+            "Micro-goal: skip one single-use plastic item today (straw, cup, or wrapper). ♻️",
+            "Pick one product you buy often and find a version without plastic packaging today. 🌿",
+        ],
+    ),
+    "energy": (
+        ["light ", "lights", "lighting", "lamp", "electric", "charger", "unplug", "heater", "heating",
+         "air condition", "ac ", "standby", "tv ", "tvs", "energy"],
+        [
+            "Today, switch off the lights every time you leave a room, no exceptions. 💡",
+            "Micro-goal: unplug two chargers or devices on standby before bed tonight. 🔌",
+            "Turn your heating or AC one degree closer to the outside temperature today. 🌡️",
+        ],
+    ),
+    "water": (
+        ["shower", "bath ", "baths", "bathtub", "water ", "watering", "tap ", "taps", "faucet", "bottle ",
+         "bottles", "bottled", "sprinkler", "dishwash"],
+        [
+            "Today, keep your shower under 5 minutes; one favourite song is a good timer. 🚿",
+            "Micro-goal: fill a reusable bottle this morning and skip bottled water all day. 💧",
+            "Turn the tap off while brushing your teeth or washing dishes today. 🌊",
+        ],
+    ),
+}
+
+_NON_WORD = re.compile(r"[^a-z0-9 \-]+")
+_SPACES = re.compile(r"\s+")
+
+
+class Intent:
+    __slots__ = ("kind", "category", "text")
+
+    def __init__(self, kind: str, category: str = "", text: str = ""):
+        self.kind = kind
+        self.category = category
+        self.text = text
+
+    def __repr__(self):
+        return f"Intent(kind={self.kind!r}, category={self.category!r})"
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over keyword stems. Each stem maps to a label;
+    matches only count when the stem starts at a word boundary.
+    """
+
+    def __init__(self, keywords):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]  # node -> [(stem length, label)]
+        for stem, label in keywords:
+            self._add(stem, label)
+        self._build()
+
+    def _add(self, stem: str, label: str) -> None:
+        node = 0
+        for char in stem:
+            nxt = self._goto[node].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((len(stem), label))
+
+    def _build(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[nxt] = self._goto[fallback].get(char, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def labels(self, text: str) -> dict:
+        """label -> number of keyword hits in text (text should be normalized)."""
+        hits = {}
+        node = 0
+        for end, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for length, label in self._out[node]:
+                start = end - length + 1
+                if start == 0 or text[start - 1] == " ":
+                    hits[label] = hits.get(label, 0) + 1
+        return hits
+
+
+def normalize(text: str) -> str:
+    text = _NON_WORD.sub(" ", text.lower())
+    return _SPACES.sub(" ", text).strip()
+
+
+_MATCHER = KeywordMatcher(
+    [(stem, category) for category, (stems, _) in TAXONOMY.items() for stem in stems]
+    + [(stem, "greeting") for stem in GREETING_STEMS]
+)
+
+
+def classify(text: str) -> Intent:
+    norm = normalize(text)
+    if norm in DIRECT_PROMPTS:
+        return Intent("direct", text=norm)
+
+    # Trailing space lets stems like "car " / "ac " match at the very end too
+    hits = _MATCHER.labels(norm + " ")
+    greeting = hits.pop("greeting", 0)
+    if hits:
+        category = max(hits, key=hits.get)
+        return Intent("habit", category=category, text=norm)
+    if not norm or greeting or len(norm.split()) < 3:
+        return Intent("greeting", text=norm)
+    return Intent("novel", text=norm)
+
+
+def templated_reply(intent: Intent):
+    """
+    Instant answer for direct prompts, greetings and known habit categories;
+    None for novel input (that's the LLM's job).
+    """
+    if intent.kind == "direct":
+        return DIRECT_PROMPTS[intent.text]
+    if intent.kind == "greeting":
+        return ONBOARDING_MESSAGE
+    if intent.kind == "habit":
+        return random.choice(TAXONOMY[intent.category][1])
+    return None
@@ -0,0 +1,146 @@
+# agents/llm_pool.py
+
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# --- Async execution layer for blocking LLM calls ---
+# The Gemini SDK's generate_content() is synchronous. Calling it straight from
+# an async uAgents handler blocks the whole event loop (which main.py shares
+# with FastAPI), so one slow generation stalls every other message and /health.
+#
+# LLMPool runs those calls on a dedicated thread pool and adds:
+# - a concurrency limit (COACH_LLM_CONCURRENCY, default 8)
+# - a bounded wait queue (COACH_LLM_MAX_QUEUE, default 64); when it's full,
+#   run() raises PoolBusy right away so the handler can send a fast "busy" reply
+# - a per-call deadline covering queue wait + generation (COACH_LLM_TIMEOUT seconds)
+# - cancellation: a cancelled/timed-out caller stops waiting immediately.
+#   The thread itself can't be interrupted, so its slot is only handed back
+#   once the underlying call really finishes. That keeps the concurrency limit honest.
+#   Streaming calls (stream()) do stop early: the worker checks between chunks.
+
+_END = object()
+
+
+class PoolBusy(Exception):
+    """Raised when the wait queue is full and the call was rejected without running."""
+
+
+class LLMPool:
+    def __init__(self, max_concurrency: int = None, max_queue: int = None, timeout: float = None):
+        self.max_concurrency = max_concurrency or int(os.getenv("COACH_LLM_CONCURRENCY", "8"))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv("COACH_LLM_MAX_QUEUE", "64"))
+        self.timeout = timeout or float(os.getenv("COACH_LLM_TIMEOUT", "20"))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="llm")
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+
+        # Counters (read by logs / metrics)
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    async def run(self, fn, *args, timeout: float = None, **kwargs):
+        """
+        Run fn(*args, **kwargs) on the LLM thread pool and await its result.
+        Raises PoolBusy if the queue is full and asyncio.TimeoutError if the
+        deadline passes (either while queued or while generating).
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or self.timeout)
+        await self._acquire(loop, deadline)
+
+        self.in_flight += 1
+        future = loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+        future.add_done_callback(self._release)
+
+        try:
+            # shield() so a timeout/cancel here doesn't cancel the executor future:
+            # the done callback above must still run to give the slot back.
+            return await asyncio.wait_for(asyncio.shield(future), max(deadline - loop.time(), 0))
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise
+
+    async def stream(self, fn, *args, timeout: float = None, **kwargs):
+        """
+        Async generator over the items of the (blocking) iterable returned by
+        fn(*args, **kwargs), e.g. generate_content(prompt, stream=True).
+        Same admission, queue and deadline rules as run(). If the consumer
+        stops early, the worker stops pulling chunks and frees its slot.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or self.timeout)
+        await self._acquire(loop, deadline)
+
+        chunks = asyncio.Queue()
+        stop = threading.Event()
+
+        def produce():
+            error = None
+            try:
+                for item in fn(*args, **kwargs):
+                    if stop.is_set():
+                        break
+                    loop.call_soon_threadsafe(chunks.put_nowait, (item, None))
+            except Exception as e:
+                error = e
+            loop.call_soon_threadsafe(chunks.put_nowait, (_END, error))
+
+        self.in_flight += 1
+        future = loop.run_in_executor(self._executor, produce)
+        future.add_done_callback(self._release)
+
+        try:
+            while True:
+                item, error = await asyncio.wait_for(chunks.get(), max(deadline - loop.time(), 0))
+                if item is _END:
+                    if error is not None:
+                        raise error
+                    return
+                yield item
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise
+        finally:
+            stop.set()
+
+    async def _acquire(self, loop, deadline: float) -> None:
+        if self.in_flight + self.waiting >= self.max_concurrency + self.max_queue:
+            self.rejected += 1
+            raise PoolBusy(f"LLM queue full ({self.waiting} waiting)")
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), max(deadline - loop.time(), 0))
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise
+        finally:
+            self.waiting -= 1
+
+    def _release(self, future) -> None:
+        self.in_flight -= 1
+        self.completed += 1
+        self._slots.release()
+        # Mark the exception as retrieved if nobody is awaiting any more
+        # (caller timed out or was cancelled), to avoid noisy warnings.
+        if not future.cancelled():
+            future.exception()
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,19 +1,54 @@
 # agents/master_agent.py
 
-from agents.coach_agent import suggest_goal, adjust_feedback
-from agents.tracker_agent import log_habit, get_streak
+import asyncio
+
+from agents.coach_agent import adjust_feedback
+from agents.engine import CoachEngine, TemplateGoals
+from agents.state_store import StateStore
+from utils.db import MemoryBackend
+
+# Synchronous, in-process front door to the coaching engine (agents/engine.py).
+# By default every MasterAgent shares one offline engine: template goals,
+# in-memory state, the same streak tracker as the uAgents coach. Pass
+# engine=coach_agent_os.engine to get Gemini goals and durable state instead
+# (only from code that isn't already running an event loop).
+
+_default_engine = None
+_loop = None
+
+
+def default_engine() -> CoachEngine:
+    global _default_engine
+    if _default_engine is None:
+        _default_engine = CoachEngine(StateStore(MemoryBackend()), TemplateGoals(), feedback=adjust_feedback)
+    return _default_engine
+
+
+def _run(coro):
+    # One private loop for all sync callers; engine calls without I/O finish in a single step
+    global _loop
+    if _loop is None:
+        _loop = asyncio.new_event_loop()
+    return _loop.run_until_complete(coro)
+
 
 class MasterAgent:
-    def __init__(self):
-        self.current_goal = None
+    def __init__(self, user_id: str = "default", engine: CoachEngine = None):
+        self.session = (engine or default_engine()).session(user_id)
+
+    @property
+    def user_id(self) -> str:
+        return self.session.user_id
+
+    @property
+    def current_goal(self):
+        return self.session.current_goal or None
 
     def handle_input(self, user_input: str):
         # Step 1: Get or suggest a micro-goal
-        self.current_goal = suggest_goal(user_input)
-        return self.current_goal
+        return _run(self.session.suggest(user_input)).text
 
     def handle_response(self, completed: bool, habit: str):
-        # Step 2: Log it and get streak
-        log_habit(completed)
-        streak = get_streak()
-        return adjust_feedback(completed, streak, habit), streak
+        # Step 2: Log today's result and get this user's streak
+        reply = _run(self.session.report(completed, habit))
+        return reply.text, reply.streak
@@ -0,0 +1,203 @@
+# agents/persistence.py
+
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import agents.tracker_agent as tracker
+from agents.chat_history import ChatHistory
+from agents.state_store import StateStore, UserState
+from utils.db import EventLog
+
+# --- Durable coach progress ---
+# Every goal handed out and every report is appended to the event log in
+# utils/db.py, and the full state (per-user streak/goal + tracker histories)
+# is snapshotted periodically. On startup, recover() loads the newest
+# snapshot and replays the log tail, so a --reload or crash no longer wipes
+# everyone's streak.
+#
+# Events are tiny and carry absolute values:
+#   {"t":"g","u":user_id,"g":goal,"h":habit}                goal handed out (+ the habit it's for)
+#   {"t":"r","u":user_id,"c":1,"s":streak,"d":day ordinal}  report + resulting streak ("x":1 = expired, no report;
+#                                                           "p":n = streak carried into the user's first tracked day)
+#   {"t":"m","u":user_id,"m":text}                          reminder sent (history only)
+#   {"t":"u","u":user_id,"r":[streak, goal, habit, planned]} whole record (bulk imports)
+#
+# Config:
+#   COACH_EVENT_LOG=0               disable persistence entirely
+#   COACH_DATA_DIR                  where logs/snapshots live (default: data)
+#   COACH_SNAPSHOT_INTERVAL         seconds between snapshots (default: 300)
+#   COACH_SNAPSHOT_EVERY_EVENTS     ...or sooner once this many events piled up (default: 100000)
+#
+# The same events feed the per-user ChatHistory (agents/chat_history.py),
+# live and on replay; snapshots carry it too.
+#
+# With a persistent state backend (SQLite) the per-user records are already
+# durable - and may be shared with other worker processes - so recovery only
+# rebuilds the tracker histories and never writes old streaks/goals back.
+
+logger = logging.getLogger("coach.persistence")
+
+
+class Journal:
+    def __init__(self, state_store: StateStore, directory: str = None, enabled: bool = None,
+                 history: ChatHistory = None):
+        self.state_store = state_store
+        self.history = history
+        if enabled is None:
+            enabled = os.getenv("COACH_EVENT_LOG", "1") != "0"
+        self.log = EventLog(directory or os.getenv("COACH_DATA_DIR", "data")) if enabled else None
+        self.snapshot_interval = float(os.getenv("COACH_SNAPSHOT_INTERVAL", "300"))
+        self.snapshot_every = int(os.getenv("COACH_SNAPSHOT_EVERY_EVENTS", "100000"))
+        self._snapshot_lock = asyncio.Lock()
+
+    # --- writing (hot path: one buffered line, no I/O wait) ---
+
+    def record_goal(self, user_id: str, goal: str, habit: str = "") -> None:
+        if self.history is not None:
+            self.history.add_goal(user_id, habit, goal)
+        if self.log is not None:
+            self.log.append({"t": "g", "u": user_id, "g": goal, "h": habit})
+
+    def record_report(self, user_id: str, completed: bool, streak: int, day: int, expired: bool = False,
+                      carry: int = 0) -> None:
+        if self.history is not None:
+            self.history.add_report(user_id, completed, streak, day, expired)
+        if self.log is not None:
+            event = {"t": "r", "u": user_id, "c": int(completed), "s": streak, "d": day}
+            if expired:
+                event["x"] = 1
+            if carry:
+                event["p"] = carry
+            self.log.append(event)
+
+    def record_reminder(self, user_id: str, text: str) -> None:
+        if self.history is not None:
+            self.history.add_reminder(user_id, text)
+        if self.log is not None:
+            self.log.append({"t": "m", "u": user_id, "m": text})
+
+    def record_user(self, user_id: str, state: UserState) -> None:
+        if self.log is not None:
+            self.log.append({"t": "u", "u": user_id, "r": list(state.to_record())})
+
+    def flush(self) -> None:
+        """Makes everything recorded so far durable now (bulk import checkpoints)."""
+        if self.log is not None:
+            self.log.flush()
+
+    # --- recovery ---
+
+    def recover(self) -> dict:
+        """
+        Rebuilds state from the newest snapshot + log tail. Call once at
+        startup, before any handler runs.
+        """
+        if self.log is None:
+            return {"enabled": False}
+        started = time.perf_counter()
+
+        seq, state = self.log.load_snapshot()
+        if state:
+            if self._owns_user_state:
+                # [user_id, *record]; older snapshots only have streak + goal
+                for user_id, *record in state.get("users", ()):
+                    self.state_store.save(user_id, UserState.from_record(record))
+            for user_id, dumped in state.get("histories", ()):
+                tracker.histories[user_id] = tracker.HabitHistory.load(dumped)
+            if self.history is not None:
+                self.history.load(state.get("chat", ()))
+
+        replayed = 0
+        for event in self.log.replay(after_seq=seq):
+            self.apply(event)
+            replayed += 1
+
+        stats = {
+            "enabled": True,
+            "snapshot_seq": seq,
+            "replayed_events": replayed,
+            "users": len(self.state_store),
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        logger.info(f"Recovered coach state: {stats}")
+        return stats
+
+    @property
+    def _owns_user_state(self) -> bool:
+        # In-memory backend: the journal is the only durable copy of users' records
+        return not self.state_store.backend.persistent
+
+    def apply(self, event: dict) -> None:
+        user_id = event["u"]
+        if event["t"] == "g":
+            if self._owns_user_state:
+                user_state = self.state_store.get(user_id)
+                user_state.current_goal = event["g"]
+                if event.get("h"):
+                    user_state.habit = event["h"]
+                self.state_store.save(user_id, user_state)
+            if self.history is not None:
+                self.history.add_goal(user_id, event.get("h", ""), event["g"])
+        elif event["t"] == "r":
+            if self._owns_user_state:
+                user_state = self.state_store.get(user_id)
+                user_state.streak = event["s"]
+                self.state_store.save(user_id, user_state)
+            # A user's first tracked day may continue an older streak. Logs from before "p"
+            # existed only have the resulting streak, so a completed day stands for it
+            carry = event.get("p", max(event["s"] - 1, 0))
+            tracker.log_habit(bool(event["c"]), user_id, event["d"], carry=carry)
+            if self.history is not None:
+                self.history.add_report(user_id, bool(event["c"]), event["s"], event["d"], bool(event.get("x")))
+        elif event["t"] == "m":
+            if self.history is not None:
+                self.history.add_reminder(user_id, event["m"])
+        elif event["t"] == "u":
+            if self._owns_user_state:
+                self.state_store.save(user_id, UserState.from_record(event["r"]))
+
+    # --- snapshots ---
+
+    async def snapshot(self) -> None:
+        if self.log is None:
+            return
+        async with self._snapshot_lock:
+            # Seal the segment on the loop thread (appends happen here too),
+            # then copy + serialize + fsync on a worker thread.
+            covered = self.log.start_snapshot()
+            started = time.perf_counter()
+            path = await asyncio.to_thread(self._write_snapshot, covered)
+            logger.info(f"Wrote snapshot {path} in {time.perf_counter() - started:.2f}s")
+
+    def _write_snapshot(self, covered: int) -> str:
+        state = {
+            "users": [[user_id, *record] for user_id, record in self.state_store.items()]
+            if self._owns_user_state else [],
+            "histories": [[user_id, history.dump()] for user_id, history in list(tracker.histories.items())],
+            "chat": self.history.dump() if self.history is not None else [],
+        }
+        return self.log.write_snapshot(covered, state)
+
+    async def run_snapshots(self) -> None:
+        """Background task: snapshot on a timer, or early when the log grows fast."""
+        if self.log is None:
+            return
+        last = time.monotonic()
+        while True:
+            await asyncio.sleep(1)
+            due = time.monotonic() - last >= self.snapshot_interval
+            if (due or self.log.appended_since_snapshot >= self.snapshot_every) and self.log.appended_since_snapshot:
+                try:
+                    await self.snapshot()
+                except OSError as e:
+                    logger.error(f"Snapshot failed: {e}")
+                last = time.monotonic()
+
+    def close(self) -> None:
+        if self.log is not None:
+            self.log.close()
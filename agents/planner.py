@@ -0,0 +1,163 @@
+# agents/planner.py
+
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import agents.tracker_agent as tracker
+from agents.intent_classifier import classify
+from agents.response_cache import normalize_habit
+from agents.state_store import StateStore, UserState
+
+# --- Background goal planner ---
+# A returning user who asks about the same habit again is predictable, so
+# their next micro-goal is generated ahead of time and kept in their
+# UserState.planned_goal. The engine (agents/engine.py) serves it instantly and asks
+# for a fresh one (refresh()) for next time.
+#
+# The planner only runs off-peak: inside COACH_PLANNER_HOURS (local hours,
+# e.g. "1-6"; empty = any time) and only while live load (generation slots
+# in use + queued) is below COACH_PLANNER_MAX_LOAD. It uses at most
+# COACH_PLANNER_CONCURRENCY Gemini calls at once.
+#
+# Only users who need the LLM are planned: habits the rule-based fast path
+# answers are skipped, and so are users with no report in the last
+# COACH_PLANNER_ACTIVE_DAYS days. COACH_PLANNER=0 turns it off.
+
+logger = logging.getLogger("coach.planner")
+
+
+def same_habit(a: str, b: str) -> bool:
+    return bool(a) and normalize_habit(a) == normalize_habit(b)
+
+
+class GoalPlanner:
+    def __init__(self, state_store: StateStore, generate, load=None, enabled: bool = None):
+        """
+        generate: async (habit, streak) -> goal text
+        load: () -> current interactive load, compared with max_load
+        """
+        self.state_store = state_store
+        self.generate = generate
+        self.load = load or (lambda: 0)
+        self.enabled = enabled if enabled is not None else os.getenv("COACH_PLANNER", "1") != "0"
+        self.interval = float(os.getenv("COACH_PLANNER_INTERVAL", "300"))
+        self.max_load = int(os.getenv("COACH_PLANNER_MAX_LOAD", "2"))
+        self.active_days = int(os.getenv("COACH_PLANNER_ACTIVE_DAYS", "7"))
+        self.hours = self._parse_hours(os.getenv("COACH_PLANNER_HOURS", ""))
+        self._slots = asyncio.Semaphore(int(os.getenv("COACH_PLANNER_CONCURRENCY", "2")))
+        self._tasks = set()
+
+        # Counters (read by metrics)
+        self.planned = 0
+        self.served = 0
+        self.failed = 0
+
+    @staticmethod
+    def _parse_hours(spec: str):
+        if not spec.strip():
+            return None
+        start, end = (int(part) for part in spec.split("-"))
+        return start, end
+
+    def off_peak(self) -> bool:
+        if self.hours is not None:
+            start, end = self.hours
+            hour = time.localtime().tm_hour
+            inside = start <= hour < end if start <= end else (hour >= start or hour < end)
+            if not inside:
+                return False
+        return self.load() < self.max_load
+
+    def wants_plan(self, user_id: str, state: UserState) -> bool:
+        if not state.habit or state.planned_goal:
+            return False
+        if classify(state.habit).kind != "novel":
+            return False  # answered from templates anyway
+        history = tracker.histories.get(user_id)
+        return history is None or tracker.today() - history.last_day <= self.active_days
+
+    # --- background loop ---
+
+    async def run(self, owns=None) -> None:
+        """
+        Background task (started from main.py). owns(user_id) limits planning
+        to this worker's users when several workers share one state DB.
+        """
+        if not self.enabled:
+            return
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self.off_peak():
+                continue
+            try:
+                await self.plan_all(owns)
+            except Exception as e:
+                logger.error(f"Planning pass failed: {e}")
+
+    async def plan_all(self, owns=None) -> int:
+        started = time.perf_counter()
+        planned_before = self.planned
+        tasks = []
+        for user_id, record in self.state_store.items():
+            if owns is not None and not owns(user_id):
+                continue
+            if not self.wants_plan(user_id, UserState.from_record(record)):
+                continue
+            await self._slots.acquire()
+            if not self.off_peak():
+                self._slots.release()
+                logger.info("Traffic picked up, pausing the planning pass")
+                break
+            tasks.append(asyncio.create_task(self._plan_holding_slot(user_id)))
+        await asyncio.gather(*tasks)
+        planned = self.planned - planned_before
+        if tasks:
+            logger.info(f"Planned {planned} goals in {time.perf_counter() - started:.1f}s")
+        return planned
+
+    async def _plan_holding_slot(self, user_id: str) -> None:
+        try:
+            await self.plan_user(user_id)
+        finally:
+            self._slots.release()
+
+    # --- single user ---
+
+    async def plan_user(self, user_id: str) -> None:
+        state = self.state_store.get(user_id)
+        if not self.wants_plan(user_id, state):
+            return
+        habit = state.habit
+        try:
+            goal = await self.generate(habit, state.streak)
+        except Exception as e:
+            self.failed += 1
+            logger.warning(f"Could not plan a goal for {user_id}: {e}")
+            return
+        async with self.state_store.lock_for(user_id):
+            state = self.state_store.get(user_id)
+            # The user may have switched habits while Gemini was busy
+            if state.habit == habit and not state.planned_goal:
+                state.planned_goal = goal
+                self.state_store.save(user_id, state)
+                self.planned += 1
+
+    def refresh(self, user_id: str) -> None:
+        """
+        Plan this user's next goal in the background (after one was served),
+        unless we're busy right now; the next planning pass picks it up then.
+        """
+        if not self.enabled or self.load() >= self.max_load:
+            return
+        task = asyncio.create_task(self._refresh(user_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh(self, user_id: str) -> None:
+        async with self._slots:
+            await self.plan_user(user_id)
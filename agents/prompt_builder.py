@@ -0,0 +1,62 @@
+# agents/prompt_builder.py
+
+import os
+import re
+
+# --- Prompt building with a token budget ---
+# The coach persona and answer rules never change, so they live in one
+# SYSTEM_INSTRUCTION handed to the model once (GenerativeModel(...,
+# system_instruction=...)) instead of being pasted into every prompt.
+# Per-request prompts only carry what varies: the habit and the streak bucket.
+#
+# - User text is normalized (control characters, runs of whitespace, quotes)
+#   and cut to COACH_HABIT_MAX_TOKENS, so a pasted essay costs the same as
+#   a sentence.
+# - Output is capped with max_output_tokens (COACH_MAX_OUTPUT_TOKENS per
+#   goal; batch calls get that per item).
+# Token counts use the same rough 4-characters-per-token rule as the rest
+# of the code when Gemini doesn't report usage.
+
+CHARS_PER_TOKEN = 4
+
+HABIT_MAX_TOKENS = int(os.getenv("COACH_HABIT_MAX_TOKENS", "60"))
+MAX_OUTPUT_TOKENS = int(os.getenv("COACH_MAX_OUTPUT_TOKENS", "80"))
+
+SYSTEM_INSTRUCTION = (
+    "You are 'Coach AI', a friendly, encouraging and highly practical sustainability coach. "
+    "You help users adopt eco-friendly habits through small daily micro-goals. "
+    "A micro-goal is one specific, easy-to-start action for TODAY that directly addresses the user's habit, "
+    "in under 25 words. Address the user directly, start with the micro-goal, then add a short encouragement; "
+    "mention the green streak if it's high. "
+    "Example for \"I drive to nearby places\": \"Today, choose one short trip and walk or cycle instead of driving.\""
+)
+
+_CONTROL = re.compile(r"[\x00-\x1f\x7f]+")
+_SPACES = re.compile(r"\s+")
+
+
+def compact_habit(habit: str, max_tokens: int = None) -> str:
+    """
+    One tidy line of at most max_tokens (estimated) tokens, cut at a word
+    boundary with an ellipsis when it had to be shortened.
+    """
+    text = _SPACES.sub(" ", _CONTROL.sub(" ", habit)).strip().replace('"', "'")
+    limit = (max_tokens or HABIT_MAX_TOKENS) * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    space = cut.rfind(" ")
+    if space > limit // 2:
+        cut = cut[:space]
+    return cut.rstrip(" ,.;:-") + "…"
+
+
+def goal_prompt(habit: str, streak_label: str) -> str:
+    return f'Habit: "{compact_habit(habit)}"\nGreen streak: {streak_label}\nGive today\'s micro-goal.'
+
+
+def generation_config(items: int = 1) -> dict:
+    """Output cap for a call producing `items` goals (batch calls add room for the JSON)."""
+    if items == 1:
+        return {"max_output_tokens": MAX_OUTPUT_TOKENS}
+    return {"max_output_tokens": MAX_OUTPUT_TOKENS * items + 16}
@@ -0,0 +1,296 @@
+# agents/providers.py
+
+import abc
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+
+from agents.coach_agent import suggest_goal
+from agents.llm_pool import PoolBusy
+from agents.prompt_builder import generation_config
+
+# --- Goal providers: hedging, failover and a local fallback ---
+# LLMGoals (agents/coach_agent_os.py) asks a ProviderRouter for a goal
+# instead of calling Gemini directly. Providers are tried in the order of
+# COACH_LLM_PROVIDERS (default "gemini,local"):
+#   gemini            Gemini (COACH_GEMINI_MODEL) through the shared LLMPool
+#   gemini:<model>    another Gemini model, e.g. a smaller/faster one as backup
+#   local             offline templates (agents/coach_agent.suggest_goal):
+#                     never fails, answers in microseconds, last resort only
+#
+# - Latency tracking: every provider keeps its last COACH_LLM_LATENCY_WINDOW
+#   successful call times and reports their p95.
+# - Hedging: when the provider asked first hasn't answered by its p95
+#   (clamped to COACH_LLM_HEDGE_MIN..COACH_LLM_HEDGE_MAX seconds), the next
+#   remote provider is asked too. The first answer wins and the other call
+#   is cancelled.
+# - Failover: an error moves on to the next provider at once. After
+#   COACH_LLM_FAILURES errors in a row a provider is skipped for
+#   COACH_LLM_COOLDOWN seconds, then gets one trial call.
+# - Budget: after COACH_LLM_BUDGET seconds (or once every remote provider
+#   has failed) the local provider answers, so a degraded primary costs a
+#   user at most the budget instead of a long wait for an apology.
+# Local answers are generic, so callers shouldn't cache them (Provider.remote).
+
+logger = logging.getLogger("coach.providers")
+
+
+class Provider(abc.ABC):
+    remote = True
+
+    def __init__(self, name: str, window: int = None, failures: int = None, cooldown: float = None):
+        self.name = name
+        self.latencies = deque(maxlen=window or int(os.getenv("COACH_LLM_LATENCY_WINDOW", "200")))
+        self.failure_threshold = failures or int(os.getenv("COACH_LLM_FAILURES", "3"))
+        self.cooldown = cooldown or float(os.getenv("COACH_LLM_COOLDOWN", "30"))
+        self._failures = 0
+        self._opened_at = None
+
+        # Counters (read by metrics)
+        self.calls = 0
+        self.errors = 0
+
+    @abc.abstractmethod
+    async def generate(self, habit: str, streak: int, prompt: str):
+        """Returns (goal text, raw response or None)."""
+
+    # --- health ---
+
+    def available(self) -> bool:
+        if self._opened_at is None:
+            return True
+        # Half-open: after the cool-down, let a trial call through
+        return time.monotonic() - self._opened_at >= self.cooldown
+
+    def record_success(self, seconds: float) -> None:
+        self.calls += 1
+        self.latencies.append(seconds)
+        if self._opened_at is not None:
+            logger.info(f"Provider {self.name} is back")
+        self._failures = 0
+        self._opened_at = None
+
+    def record_failure(self) -> None:
+        self.calls += 1
+        self.errors += 1
+        self._failures += 1
+        if self._failures >= self.failure_threshold:
+            if self._opened_at is None:
+                logger.warning(f"Provider {self.name} failed {self._failures} times in a row, skipping it for {self.cooldown}s")
+            self._opened_at = time.monotonic()
+
+    def p95(self):
+        if len(self.latencies) < 20:
+            return None  # not enough samples to trust
+        ordered = sorted(self.latencies)
+        return ordered[int(len(ordered) * 0.95)]
+
+    def stats(self) -> dict:
+        p95 = self.p95()
+        return {
+            "available": self.available(),
+            "calls": self.calls,
+            "errors": self.errors,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+
+class GeminiProvider(Provider):
+    def __init__(self, name: str, model, pool, **kwargs):
+        """model: () -> GenerativeModel (built lazily); pool: the shared LLMPool."""
+        super().__init__(name, **kwargs)
+        self.model = model
+        self.pool = pool
+
+    async def generate(self, habit: str, streak: int, prompt: str):
+        response = await self.pool.run(self.model().generate_content, prompt, generation_config=generation_config())
+        return response.text.strip(), response
+
+    async def stream(self, prompt: str):
+        """Yields the response chunks as Gemini produces them."""
+        async for chunk in self.pool.stream(self.model().generate_content, prompt, stream=True,
+                                            generation_config=generation_config()):
+            yield chunk
+
+
+class LocalProvider(Provider):
+    remote = False
+
+    async def generate(self, habit: str, streak: int, prompt: str):
+        return suggest_goal(habit), None
+
+
+def make_providers(spec: str, get_model, pool) -> list:
+    """
+    Providers from a comma-separated spec like "gemini,gemini:gemini-1.5-flash-8b,local".
+    get_model(name or None) returns the GenerativeModel for a model name.
+    """
+    providers = []
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        kind, _, model_name = entry.partition(":")
+        if kind == "gemini":
+            providers.append(GeminiProvider(entry, lambda name=model_name or None: get_model(name), pool))
+        elif kind == "local":
+            providers.append(LocalProvider(entry))
+        else:
+            raise ValueError(f"Unknown LLM provider '{entry}' (expected 'gemini[:<model>]' or 'local')")
+    if not providers:
+        raise ValueError("COACH_LLM_PROVIDERS lists no providers")
+    return providers
+
+
+class ProviderRouter:
+    def __init__(self, providers: list, budget: float = None, hedge_min: float = None, hedge_max: float = None,
+                 hedge: bool = None):
+        self.providers = providers
+        self.budget = budget or float(os.getenv("COACH_LLM_BUDGET", "8"))
+        self.hedge_min = hedge_min or float(os.getenv("COACH_LLM_HEDGE_MIN", "0.5"))
+        self.hedge_max = hedge_max or float(os.getenv("COACH_LLM_HEDGE_MAX", "4"))
+        self.hedge = hedge if hedge is not None else os.getenv("COACH_LLM_HEDGE", "1") != "0"
+
+        # Counters (read by metrics)
+        self.hedged = 0       # backup requests fired
+        self.hedge_wins = 0   # ...that answered first
+        self.failovers = 0    # moved on after an error
+        self.fallbacks = 0    # answered by a local provider
+
+    @classmethod
+    def from_env(cls, get_model, pool) -> "ProviderRouter":
+        return cls(make_providers(os.getenv("COACH_LLM_PROVIDERS", "gemini,local"), get_model, pool))
+
+    def hedge_delay(self, provider: Provider) -> float:
+        p95 = provider.p95()
+        return self.hedge_max if p95 is None else min(max(p95, self.hedge_min), self.hedge_max)
+
+    async def generate(self, habit: str, streak: int, prompt: str, exclude=()):
+        """
+        Returns (goal text, provider that answered, raw response or None).
+        Raises the last error if every provider failed and there's no local one.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.budget
+        remote = [p for p in self.providers if p.remote and p.available() and p not in exclude]
+        running = {}  # task -> (provider, started)
+        first = None  # the provider asked first; anyone else answering is a hedge win
+        last_error = None
+
+        def start(provider):
+            nonlocal first
+            task = asyncio.ensure_future(provider.generate(habit, streak, prompt))
+            running[task] = (provider, loop.time())
+            first = first or provider
+
+        try:
+            while True:
+                if not running:
+                    if not remote:
+                        break
+                    start(remote.pop(0))
+                # Wake up for the answer, the hedge point or the budget, whichever comes first
+                wake = deadline
+                if self.hedge and remote:
+                    provider, started = max(running.values(), key=lambda item: item[1])
+                    wake = min(wake, started + self.hedge_delay(provider))
+                done, _ = await asyncio.wait(running, timeout=max(wake - loop.time(), 0),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    provider, started = running.pop(task)
+                    try:
+                        text, response = task.result()
+                    except PoolBusy as e:
+                        # Our own queue is full, not the provider's fault
+                        last_error = e
+                        self.failovers += 1
+                        continue
+                    except Exception as e:
+                        provider.record_failure()
+                        logger.warning(f"Provider {provider.name} failed: {e!r}")
+                        last_error = e
+                        self.failovers += 1
+                        continue
+                    provider.record_success(loop.time() - started)
+                    if provider is not first and any(p is first for p, _ in running.values()):
+                        self.hedge_wins += 1
+                    return text, provider, response
+                if done:
+                    continue
+                if loop.time() >= deadline:
+                    # Out of budget: whatever is still running counts as a failure
+                    for provider, _ in running.values():
+                        provider.record_failure()
+                    last_error = asyncio.TimeoutError(f"no answer within {self.budget}s")
+                    break
+                if remote:
+                    self.hedged += 1
+                    start(remote.pop(0))
+        finally:
+            for task in running:
+                task.cancel()
+
+        for provider in self.providers:
+            if not provider.remote and provider not in exclude:
+                started = loop.time()
+                text, response = await provider.generate(habit, streak, prompt)
+                provider.record_success(loop.time() - started)
+                self.fallbacks += 1
+                return text, provider, response
+        raise last_error or RuntimeError("no LLM provider available")
+
+    async def stream(self, habit: str, streak: int, prompt: str, send):
+        """
+        Streams from the first available provider that can stream, calling
+        `await send(text)` per chunk. If it fails (or stays silent past the
+        budget) before the first chunk, falls back to generate() on the
+        others and sends that answer as one chunk.
+        Returns (goal text, provider, last raw chunk or None).
+        """
+        provider = next((p for p in self.providers if hasattr(p, "stream") and p.available()), None)
+        if provider is None:
+            text, provider, response = await self.generate(habit, streak, prompt)
+            await send(text)
+            return text, provider, response
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        chunks = provider.stream(prompt)
+        try:
+            chunk = await asyncio.wait_for(anext(chunks), self.budget)
+        except StopAsyncIteration:
+            chunk = None
+        except Exception as e:
+            await chunks.aclose()
+            if not isinstance(e, PoolBusy):
+                provider.record_failure()
+                logger.warning(f"Provider {provider.name} failed before streaming anything: {e!r}")
+            self.failovers += 1
+            text, answered, response = await self.generate(habit, streak, prompt, exclude=(provider,))
+            await send(text)
+            return text, answered, response
+
+        # Already talking to the user: from here on, errors are the caller's
+        parts = []
+        try:
+            if chunk is not None:
+                parts.append(chunk.text)
+                await send(chunk.text)
+                async for chunk in chunks:
+                    parts.append(chunk.text)
+                    await send(chunk.text)
+        except Exception:
+            provider.record_failure()
+            raise
+        finally:
+            await chunks.aclose()
+        provider.record_success(loop.time() - started)
+        return "".join(parts).strip(), provider, chunk
+
+    def stats(self) -> dict:
+        return {
+            "providers": {p.name: p.stats() for p in self.providers},
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "failovers": self.failovers,
+            "fallbacks": self.fallbacks,
+        }
@@ -0,0 +1,183 @@
+# agents/response_cache.py
+
+import os
+import random
+import re
+import time
+from collections import OrderedDict
+
+# --- Response cache for generated micro-goals ---
+# Most traffic is the same handful of habits (SUGGESTED_HABITS / the frontend
+# selectbox), so we keep Gemini's answers around instead of paying a full
+# round-trip every time.
+#
+# - Key: normalized habit text + streak bucket (new, 1-2, 3-6, 7-29, 30+ days).
+#   The prompt only mentions the bucket, so a cached goal never quotes the wrong streak.
+# - Near-duplicates ("I drive to nearby places" vs "i drive to nearby place")
+#   are matched with character-trigram Jaccard similarity through an inverted index.
+# - Several variants per key, picked at random, so replies don't feel canned.
+#   Until a key has COACH_CACHE_VARIANTS answers, some hits are turned into
+#   misses on purpose so the caller generates (and stores) another variant.
+# - TTL + LRU eviction, hit/miss counters for hit-rate reporting.
+
+_NON_WORD = re.compile(r"[^a-z0-9 ]+")
+_SPACES = re.compile(r"\s+")
+
+# (lower bound in days, label used in the key and in the prompt)
+STREAK_BUCKETS = [
+    (30, "30+ days"),
+    (7, "7-29 days"),
+    (3, "3-6 days"),
+    (1, "1-2 days"),
+    (0, "0 days (just starting)"),
+]
+
+
+def normalize_habit(habit: str) -> str:
+    habit = _NON_WORD.sub(" ", habit.lower())
+    return _SPACES.sub(" ", habit).strip()
+
+
+def streak_bucket(streak: int) -> str:
+    for lower, label in STREAK_BUCKETS:
+        if streak >= lower:
+            return label
+    return STREAK_BUCKETS[-1][1]
+
+
+def _trigrams(text: str) -> frozenset:
+    padded = f" {text} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class _Entry:
+    __slots__ = ("variants", "grams", "expires_at")
+
+    def __init__(self, grams: frozenset, expires_at: float):
+        self.variants = []
+        self.grams = grams
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        max_entries: int = None,
+        ttl: float = None,
+        max_variants: int = None,
+        similarity: float = None,
+        variant_fill_rate: float = 0.25,
+    ):
+        self.max_entries = max_entries or int(os.getenv("COACH_CACHE_SIZE", "10000"))
+        self.ttl = ttl or float(os.getenv("COACH_CACHE_TTL", str(6 * 3600)))
+        self.max_variants = max_variants or int(os.getenv("COACH_CACHE_VARIANTS", "3"))
+        # 0 disables near-duplicate matching (exact keys only)
+        self.similarity = similarity if similarity is not None else float(os.getenv("COACH_CACHE_SIMILARITY", "0.8"))
+        self.variant_fill_rate = variant_fill_rate
+
+        self._entries = OrderedDict()  # (bucket, normalized habit) -> _Entry, LRU order
+        self._index = {}  # (bucket, trigram) -> set of normalized habits
+
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    # --- public API ---
+
+    def get(self, habit: str, streak: int):
+        """
+        Returns a cached goal for this habit/streak bucket, or None on a miss.
+        """
+        bucket = streak_bucket(streak)
+        norm = normalize_habit(habit)
+        key = (bucket, norm)
+
+        entry = self._live_entry(key)
+        near = False
+        if entry is None and self.similarity > 0:
+            key = self._nearest(bucket, norm)
+            entry = self._live_entry(key) if key else None
+            near = entry is not None
+
+        if entry is None or not entry.variants:
+            self.misses += 1
+            return None
+
+        # Still collecting variants for this key: let some requests through to the model
+        if len(entry.variants) < self.max_variants and random.random() < self.variant_fill_rate:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        if near:
+            self.near_hits += 1
+        return random.choice(entry.variants)
+
+    def put(self, habit: str, streak: int, text: str) -> None:
+        bucket = streak_bucket(streak)
+        norm = normalize_habit(habit)
+        key = (bucket, norm)
+
+        entry = self._live_entry(key)
+        if entry is None:
+            entry = _Entry(_trigrams(norm), time.monotonic() + self.ttl)
+            self._entries[key] = entry
+            for gram in entry.grams:
+                self._index.setdefault((bucket, gram), set()).add(norm)
+            while len(self._entries) > self.max_entries:
+                self._evict(next(iter(self._entries)))
+        else:
+            self._entries.move_to_end(key)
+
+        if text not in entry.variants and len(entry.variants) < self.max_variants:
+            entry.variants.append(text)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # --- internals ---
+
+    def _live_entry(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= time.monotonic():
+            self._evict(key)
+            return None
+        return entry
+
+    def _nearest(self, bucket: str, norm: str):
+        grams = _trigrams(norm)
+        overlap = {}
+        for gram in grams:
+            for candidate in self._index.get((bucket, gram), ()):
+                overlap[candidate] = overlap.get(candidate, 0) + 1
+
+        best_key, best_score = None, self.similarity
+        for candidate, shared in overlap.items():
+            other = self._entries[(bucket, candidate)].grams
+            score = shared / (len(grams) + len(other) - shared)
+            if score >= best_score:
+                best_key, best_score = (bucket, candidate), score
+        return best_key
+
+    def _evict(self, key) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        bucket, norm = key
+        for gram in entry.grams:
+            holders = self._index.get((bucket, gram))
+            if holders is not None:
+                holders.discard(norm)
+                if not holders:
+                    del self._index[(bucket, gram)]
@@ -0,0 +1,169 @@
+# agents/scheduler.py
+
+import asyncio
+import contextlib
+import os
+import time
+from collections import OrderedDict, deque
+
+# --- Scheduling in front of the coach handlers ---
+# Two lanes:
+#   "report"   - UserReport: a streak update, microseconds of work. Never
+#                queues behind anything; only rate limited.
+#   "generate" - HabitInput that needs Gemini. Rate limited per user, then
+#                admitted through a fixed number of generation slots.
+#
+# - Rate limiting: one token bucket per (lane, user_id). A user hammering
+#   "Get Today's Goal" runs out of tokens and gets a friendly reply instead
+#   of more Gemini calls.
+# - Fair queuing: when every generation slot is busy, waiters queue per user
+#   and freed slots go round-robin across users, so one user with many
+#   requests waits behind their own requests, not in front of everyone else's.
+# - Load shedding: past COACH_SCHED_MAX_PENDING waiters in total (or
+#   COACH_SCHED_MAX_PENDING_PER_USER for one user) acquire() raises Shed
+#   right away, so the engine can answer with BUSY_REPLY.
+#
+# Config (per second / bucket size):
+#   COACH_RATE_GENERATE, COACH_BURST_GENERATE   default 0.2/s, burst 5
+#   COACH_RATE_REPORT, COACH_BURST_REPORT       default 2/s, burst 10
+#   COACH_SCHED_SLOTS                           default COACH_LLM_CONCURRENCY (8)
+
+LANES = ("report", "generate")
+
+
+class Shed(Exception):
+    """Raised when the generation queue is full; the request was not queued."""
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.updated = now
+
+    def take(self, now: float, rate: float, burst: float) -> bool:
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+class Scheduler:
+    def __init__(self, slots: int = None, max_pending: int = None, max_pending_per_user: int = None,
+                 limits: dict = None, max_buckets: int = 100_000):
+        self.slots = slots or int(os.getenv("COACH_SCHED_SLOTS", os.getenv("COACH_LLM_CONCURRENCY", "8")))
+        self.max_pending = max_pending if max_pending is not None else int(os.getenv("COACH_SCHED_MAX_PENDING", "256"))
+        self.max_pending_per_user = max_pending_per_user or int(os.getenv("COACH_SCHED_MAX_PENDING_PER_USER", "2"))
+        # lane -> (tokens per second, bucket size)
+        self.limits = limits or {
+            "generate": (float(os.getenv("COACH_RATE_GENERATE", "0.2")), float(os.getenv("COACH_BURST_GENERATE", "5"))),
+            "report": (float(os.getenv("COACH_RATE_REPORT", "2")), float(os.getenv("COACH_BURST_REPORT", "10"))),
+        }
+        self.max_buckets = max_buckets
+        self._buckets = {lane: {} for lane in LANES}
+
+        self.running = 0
+        self.pending = 0
+        self._queues = OrderedDict()  # user_id -> deque of waiter futures, in round-robin order
+
+        # Counters (read by metrics)
+        self.admitted = 0
+        self.shed = 0
+        self.rate_limited = {lane: 0 for lane in LANES}
+
+    # --- rate limiting ---
+
+    def allow(self, lane: str, user_id: str) -> bool:
+        """Takes one token from the user's bucket for this lane; False when empty."""
+        rate, burst = self.limits[lane]
+        now = time.monotonic()
+        buckets = self._buckets[lane]
+        bucket = buckets.get(user_id)
+        if bucket is None:
+            if len(buckets) >= self.max_buckets:
+                self._prune(buckets, now, rate, burst)
+            bucket = buckets[user_id] = TokenBucket(burst, now)
+        if bucket.take(now, rate, burst):
+            return True
+        self.rate_limited[lane] += 1
+        return False
+
+    @staticmethod
+    def _prune(buckets: dict, now: float, rate: float, burst: float) -> None:
+        # A bucket that has refilled completely is the same as no bucket at all
+        for user_id in [u for u, b in buckets.items() if b.tokens + (now - b.updated) * rate >= burst]:
+            del buckets[user_id]
+
+    # --- generation slots ---
+
+    @contextlib.asynccontextmanager
+    async def generation(self, user_id: str, timeout: float = None):
+        """
+        async with scheduler.generation(user_id): ...  holds one generation slot.
+        Raises Shed when the queue is full and asyncio.TimeoutError if no slot
+        frees up within timeout seconds.
+        """
+        await self.acquire(user_id, timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, user_id: str, timeout: float = None) -> None:
+        if self.running < self.slots and not self.pending:
+            self.running += 1
+            self.admitted += 1
+            return
+
+        queue = self._queues.get(user_id)
+        if self.pending >= self.max_pending or (queue is not None and len(queue) >= self.max_pending_per_user):
+            self.shed += 1
+            raise Shed(f"generation queue full ({self.pending} waiting)")
+
+        if queue is None:
+            queue = self._queues[user_id] = deque()
+        waiter = asyncio.get_running_loop().create_future()
+        queue.append(waiter)
+        self.pending += 1
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up: pass it on
+                self.release()
+            elif waiter in queue:
+                queue.remove(waiter)
+                self.pending -= 1
+                if not queue and self._queues.get(user_id) is queue:
+                    del self._queues[user_id]
+            raise
+        self.admitted += 1
+
+    def release(self) -> None:
+        # Hand the slot straight to the next user in round-robin order
+        while self._queues:
+            user_id, queue = next(iter(self._queues.items()))
+            waiter = queue.popleft()
+            self.pending -= 1
+            if queue:
+                self._queues.move_to_end(user_id)
+            else:
+                del self._queues[user_id]
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.running -= 1
+
+    def stats(self) -> dict:
+        return {
+            "slots": self.slots,
+            "running": self.running,
+            "pending": self.pending,
+            "waiting_users": len(self._queues),
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "rate_limited": dict(self.rate_limited),
+        }
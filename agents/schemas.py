@@ -1,3 +1,5 @@
+from typing import List
+
 from uagents import Model
 
 # Define the message model for when the user inputs a habit
@@ -15,4 +17,27 @@ class UserReport(Model):
     user_id: str
     completed: bool
     habit: str # The habit related to the goal being reported
-    goal_id: str # The specific goal that was completed or missed (can be the text of the goal for simplicity)
\ No newline at end of file
+    goal_id: str # The specific goal that was completed or missed (can be the text of the goal for simplicity)
+
+# Batch mode (e.g. nightly re-planning): many habits in, one goal per user out
+class HabitInputBatch(Model):
+    items: List[HabitInput]
+
+# One user's goal inside a CoachReplyBatch (CoachReply has no user_id)
+class CoachBatchItem(Model):
+    user_id: str
+    text: str
+    streak: int
+
+class CoachReplyBatch(Model):
+    replies: List[CoachBatchItem]
+
+# Timer-driven messages (agents/timers.py), answered with a CoachReplyBatch.
+# Users who let `day` (an ordinal) pass without a report; every item is completed=False
+class StreakExpiryBatch(Model):
+    day: int
+    items: List[UserReport]
+
+# Users who haven't reported yet today and are due a nudge
+class ReminderBatch(Model):
+    user_ids: List[str]
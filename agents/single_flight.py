@@ -0,0 +1,60 @@
+# agents/single_flight.py
+
+import asyncio
+
+# --- Request coalescing ("single-flight") ---
+# When a cohort picks the same suggested habit at the same moment, every
+# handler would otherwise fire its own identical Gemini call.
+# SingleFlight runs one call per key; everybody else asking for the same key
+# while it's in flight awaits that same result. Each caller still does its
+# own ctx.send with it.
+#
+# The shared call runs as its own task, so one waiter being cancelled
+# (e.g. its HTTP client went away) doesn't cancel it for the others.
+
+
+class SingleFlight:
+    def __init__(self):
+        self._in_flight = {}  # key -> asyncio.Task
+        self.issued = 0
+        self.coalesced = 0
+
+    async def do(self, key, fn):
+        """
+        Await fn() (a zero-argument coroutine function) once per key.
+        Concurrent callers with the same key share the result or exception.
+        """
+        joined = self.join(key)
+        if joined is not None:
+            return await joined
+        self.issued += 1
+        task = asyncio.ensure_future(fn())
+        self._in_flight[key] = task
+        task.add_done_callback(lambda t: self._done(key, t))
+        return await asyncio.shield(task)
+
+    def join(self, key):
+        """
+        The call in flight for key as an awaitable, or None if there is none.
+        Lets a caller share a running call before queueing for the right to
+        start a new one.
+        """
+        task = self._in_flight.get(key)
+        if task is None:
+            return None
+        self.coalesced += 1
+        return asyncio.shield(task)
+
+    def _done(self, key, task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # All waiters may have been cancelled; don't warn about an unretrieved exception
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._in_flight),
+            "issued": self.issued,
+            "coalesced": self.coalesced,
+        }
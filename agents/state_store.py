@@ -0,0 +1,95 @@
+# agents/state_store.py
+
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.db import make_backend
+
+# --- Per-user state for the coach ---
+# Replaces the old process-wide agent_state dict, where every user overwrote
+# everyone else's streak and goal.
+#
+# - One compact UserState record per user_id (__slots__, no per-object dict).
+# - Lock striping: a fixed pool of asyncio locks, picked by hash(user_id).
+#   Two users only wait on each other if they land on the same stripe,
+#   and memory for locks stays constant no matter how many users we have.
+# - The backend is pluggable (see utils/db.py): in-memory dict or SQLite.
+
+DEFAULT_STRIPES = int(os.getenv("COACH_STATE_STRIPES", "256"))
+
+
+class UserState:
+    # habit: the habit the user last asked about
+    # planned_goal: their next goal, pre-generated in the background (agents/planner.py)
+    __slots__ = ("streak", "current_goal", "habit", "planned_goal")
+
+    def __init__(self, streak: int = 0, current_goal: str = "", habit: str = "", planned_goal: str = ""):
+        self.streak = streak
+        self.current_goal = current_goal
+        self.habit = habit
+        self.planned_goal = planned_goal
+
+    def to_record(self):
+        return (self.streak, self.current_goal, self.habit, self.planned_goal)
+
+    @classmethod
+    def from_record(cls, record):
+        return cls(*record)
+
+    def __repr__(self):
+        return (f"UserState(streak={self.streak}, current_goal={self.current_goal!r}, "
+                f"habit={self.habit!r}, planned_goal={self.planned_goal!r})")
+
+
+class StateStore:
+    def __init__(self, backend=None, stripes: int = DEFAULT_STRIPES):
+        self.backend = backend if backend is not None else make_backend()
+        self._locks = [asyncio.Lock() for _ in range(stripes)]
+
+    def lock_for(self, user_id: str) -> asyncio.Lock:
+        """
+        Lock guarding read-modify-write of this user's record.
+        Hold it only around the update itself, never across an LLM call.
+        """
+        return self._locks[hash(user_id) % len(self._locks)]
+
+    def get(self, user_id: str) -> UserState:
+        """
+        Returns the user's state, or a fresh default one for unseen users.
+        New users are not stored until save() is called.
+        """
+        record = self.backend.get(user_id)
+        if record is None:
+            return UserState()
+        if isinstance(record, UserState):
+            return record
+        return UserState.from_record(record)
+
+    def save(self, user_id: str, state: UserState) -> None:
+        if self.backend.persistent:
+            self.backend.put(user_id, state.to_record())
+        else:
+            self.backend.put(user_id, state)
+
+    def save_many(self, items) -> None:
+        """(user_id, UserState) pairs in one backend write (a single transaction for SQLite)."""
+        if self.backend.persistent:
+            self.backend.put_many([(user_id, state.to_record()) for user_id, state in items])
+        else:
+            self.backend.put_many(items)
+
+    def items(self):
+        """
+        Point-in-time list of (user_id, UserState record tuple) for snapshots
+        and background scans.
+        """
+        return [
+            (user_id, record.to_record() if isinstance(record, UserState) else record)
+            for user_id, record in self.backend.items()
+        ]
+
+    def __len__(self) -> int:
+        return len(self.backend)
@@ -0,0 +1,225 @@
+# agents/timers.py
+
+import asyncio
+import logging
+import os
+import time
+from datetime import date, datetime, time as day_time
+
+import agents.tracker_agent as tracker
+from agents.schemas import ReminderBatch, StreakExpiryBatch, UserReport
+
+# --- Reminders and streak expiry ---
+# Streaks used to change only when a user reported, so someone who simply
+# stopped coming kept their streak forever, and nobody was nudged. Every
+# report now (re)arms two per-user deadlines:
+#
+#   expire  end of the next day: if that day passes without a report, a
+#           UserReport(completed=False) for it goes into the coach protocol
+#           and the streak resets. Only armed while the streak is > 0.
+#   remind  COACH_REMINDER_HOUR on the next day: if the user hasn't reported
+#           by then, they get a nudge (it shows up in GET /v1/history).
+#           Re-armed daily while their last report is at most
+#           COACH_REMINDER_ACTIVE_DAYS old. An empty COACH_REMINDER_HOUR turns
+#           reminders off.
+#
+# Days are the server's local calendar days, like agents/tracker_agent.py.
+#
+# Deadlines live in a hierarchical timer wheel: COACH_TIMER_LEVELS wheels of
+# 256 slots, one tick (COACH_TIMER_TICK seconds) per slot on the first wheel
+# and 256x coarser on each next one. Arming, re-arming and cancelling are
+# O(1) dict operations. A tick looks at one slot, and now and then moves a
+# coarser slot's timers down a level, so a tick costs the same with ten
+# timers or ten million. Fired deadlines go out in batches of
+# COACH_TIMER_BATCH (StreakExpiryBatch / ReminderBatch) through `deliver`,
+# which main.py points at the protocol handlers via the gateway.
+# COACH_TIMERS=0 turns the whole thing off.
+
+logger = logging.getLogger("coach.timers")
+
+
+class TimerWheel:
+    def __init__(self, now: int, slot_bits: int = 8, levels: int = None):
+        """now: the current tick; timers are scheduled in absolute ticks."""
+        self.now = now
+        self.bits = slot_bits
+        self.mask = (1 << slot_bits) - 1
+        self.levels = levels or int(os.getenv("COACH_TIMER_LEVELS", "4"))
+        self.span = 1 << (slot_bits * self.levels)  # furthest a timer can be placed (~136 years of 1s ticks)
+        self._wheels = [[{} for _ in range(1 << slot_bits)] for _ in range(self.levels)]
+        self._where = {}  # key -> the slot dict holding it
+
+    def schedule(self, key, due: int, value=None) -> None:
+        """Arms (or re-arms) timer `key` for tick `due`; overdue timers fire on the next tick."""
+        self.cancel(key)
+        self._place(key, max(due, self.now + 1), value)
+
+    def cancel(self, key) -> bool:
+        slot = self._where.pop(key, None)
+        if slot is None:
+            return False
+        del slot[key]
+        return True
+
+    def __contains__(self, key) -> bool:
+        return key in self._where
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def advance(self, to: int) -> list:
+        """Moves the wheel to tick `to`; returns the (key, value) of every timer that came due."""
+        fired = []
+        while self.now < to:
+            self.now += 1
+            # Crossing a boundary on a coarser wheel: spread its slot over the finer ones,
+            # coarsest first, since it may refill the slot the next level down is about to empty
+            level = 0
+            while level + 1 < self.levels and not self.now & ((1 << (self.bits * (level + 1))) - 1):
+                level += 1
+            for cascade in range(level, 0, -1):
+                slot = self._wheels[cascade][(self.now >> (self.bits * cascade)) & self.mask]
+                if slot:
+                    entries = list(slot.items())
+                    slot.clear()
+                    for key, (due, value) in entries:
+                        self._place(key, due, value)
+            slot = self._wheels[0][self.now & self.mask]
+            if slot:
+                for key, (due, value) in slot.items():
+                    del self._where[key]
+                    fired.append((key, value))
+                slot.clear()
+        return fired
+
+    def _place(self, key, due: int, value) -> None:
+        delta = due - self.now
+        level = (max(delta, 1).bit_length() - 1) // self.bits
+        at = due
+        if level >= self.levels:
+            # Beyond the coarsest wheel: park it at the far edge, it gets re-placed on the way down
+            level, at = self.levels - 1, self.now + self.span - 1
+        slot = self._wheels[level][(at >> (self.bits * level)) & self.mask]
+        slot[key] = (due, value)
+        self._where[key] = slot
+
+
+class Deadlines:
+    def __init__(self, tick: float = None, reminder_hour: str = None, active_days: int = None,
+                 batch_size: int = None, enabled: bool = None):
+        self.enabled = enabled if enabled is not None else os.getenv("COACH_TIMERS", "1") != "0"
+        self.tick = tick or float(os.getenv("COACH_TIMER_TICK", "1"))
+        hour = reminder_hour if reminder_hour is not None else os.getenv("COACH_REMINDER_HOUR", "18")
+        self.reminder_hour = float(hour) if hour else None  # local hour of day, fractions allowed
+        self.active_days = active_days or int(os.getenv("COACH_REMINDER_ACTIVE_DAYS", "7"))
+        self.batch_size = batch_size or int(os.getenv("COACH_TIMER_BATCH", "500"))
+        self.wheel = TimerWheel(self._tick_at(time.time()))
+
+        # Counters (read by metrics)
+        self.expired = 0
+        self.reminded = 0
+        self.batches = 0
+
+    def _tick_at(self, timestamp: float) -> int:
+        return int(timestamp // self.tick)
+
+    def _due(self, day: int, hour: float = 0) -> int:
+        # The tick that starts `hour` (local time) on calendar day `day`
+        midnight = datetime.combine(date.fromordinal(day), day_time())
+        return self._tick_at(midnight.timestamp() + hour * 3600)
+
+    # --- arming ---
+
+    def on_report(self, user_id: str, day: int, streak: int) -> None:
+        """Re-arms the user's deadlines after a report for `day` that left them at `streak`."""
+        if not self.enabled:
+            return
+        if streak > 0:
+            # They have all of tomorrow to report; the deadline is the midnight after
+            self.wheel.schedule(("expire", user_id), self._due(day + 2), day + 1)
+        else:
+            self.wheel.cancel(("expire", user_id))
+        self._arm_reminder(user_id, day + 1, day)
+
+    def _arm_reminder(self, user_id: str, day: int, last_day: int) -> None:
+        if self.reminder_hour is None:
+            return
+        # Never nudge about a day whose reminder time is already gone
+        day = max(day, tracker.today())
+        if self._due(day, self.reminder_hour) <= self.wheel.now:
+            day += 1
+        if day - last_day > self.active_days:
+            self.wheel.cancel(("remind", user_id))
+            return
+        self.wheel.schedule(("remind", user_id), self._due(day, self.reminder_hour), day)
+
+    def load(self, histories: dict, owns=None) -> int:
+        """Arms deadlines for every tracked user (after recovery or a bulk import)."""
+        if not self.enabled:
+            return 0
+        started = time.perf_counter()
+        armed = 0
+        for user_id, history in list(histories.items()):
+            if owns is not None and not owns(user_id):
+                continue
+            if history.last_day >= history.first_day:
+                self.on_report(user_id, history.last_day, history.streak)
+                armed += 1
+        logger.info(f"Armed deadlines for {armed} users ({len(self.wheel)} timers) "
+                    f"in {time.perf_counter() - started:.2f}s")
+        return armed
+
+    # --- firing ---
+
+    def due_batches(self, now: float = None) -> list:
+        """Advances the wheel to `now` and returns the messages for everything that fired."""
+        fired = self.wheel.advance(self._tick_at(time.time() if now is None else now))
+        expired = {}   # missed day -> user_ids
+        reminders = []
+        for (kind, user_id), day in fired:
+            if kind == "expire":
+                expired.setdefault(day, []).append(user_id)
+            else:
+                reminders.append(user_id)
+                # Tomorrow's nudge, as long as they're still around
+                history = tracker.histories.get(user_id)
+                if history is not None:
+                    self._arm_reminder(user_id, day + 1, history.last_day)
+
+        batches = []
+        for day, user_ids in expired.items():
+            for start in range(0, len(user_ids), self.batch_size):
+                batches.append(StreakExpiryBatch(day=day, items=[
+                    UserReport(user_id=user_id, completed=False, habit="", goal_id="")
+                    for user_id in user_ids[start:start + self.batch_size]
+                ]))
+        for start in range(0, len(reminders), self.batch_size):
+            batches.append(ReminderBatch(user_ids=reminders[start:start + self.batch_size]))
+        return batches
+
+    async def run(self, deliver) -> None:
+        """Background task: tick the wheel and hand fired batches to `await deliver(batch)`."""
+        if not self.enabled:
+            return
+        while True:
+            await asyncio.sleep(self.tick)
+            for batch in self.due_batches():
+                try:
+                    await deliver(batch)
+                except Exception as e:
+                    logger.error(f"Delivering {type(batch).__name__} failed: {e!r}")
+                    continue
+                self.batches += 1
+                if isinstance(batch, StreakExpiryBatch):
+                    self.expired += len(batch.items)
+                else:
+                    self.reminded += len(batch.user_ids)
+                await asyncio.sleep(0)  # let live requests in between batches
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self.wheel),
+            "expired": self.expired,
+            "reminded": self.reminded,
+            "batches": self.batches,
+        }
@@ -1,15 +1,146 @@
-# Simulate memory (for now - can use file/db later)
-user_logs = []
+# agents/tracker_agent.py
 
-def log_habit(done: bool):
-    user_logs.append(done)
-    return done
+from array import array
+from datetime import date
+
+# --- Habit tracking ---
+# Per-user, calendar-day history kept in compact array-backed form:
+# - one bit per day (bit set = goal completed that day), packed into a bytearray
+# - a running completion count at the start of every 32-day block, so
+#   "completions between day A and day B" is two lookups + a popcount
+# - current and best streak updated in O(1) on every log_habit()
+#
+# Day semantics: one report per calendar day (a second report the same day
+# replaces the first), and a day without any report breaks the streak.
+
+BLOCK_DAYS = 32
+
+
+def today() -> int:
+    return date.today().toordinal()
+
+
+class HabitHistory:
+    __slots__ = (
+        "first_day", "last_day", "bits", "block_counts",
+        "streak", "best_streak", "_streak_before_last", "_best_before_last",
+    )
+
+    def __init__(self, first_day: int, streak: int = 0):
+        # streak: completed days right before first_day that we only know the count of
+        self.first_day = first_day
+        self.last_day = first_day - 1
+        self.bits = bytearray()
+        self.block_counts = array("I", [0])  # completions before each block
+        self.streak = streak
+        self.best_streak = streak
+        # Streaks as they were before last_day's report, so a same-day
+        # correction can be applied in O(1)
+        self._streak_before_last = 0
+        self._best_before_last = 0
+
+    def log(self, done: bool, day: int) -> bool:
+        """
+        Records the report for `day`. Reports for days before the latest
+        reported day are ignored (returns False).
+        """
+        if day < self.last_day:
+            return False
+
+        if day > self.last_day:
+            consecutive = day == self.last_day + 1
+            self._streak_before_last = self.streak if consecutive else 0
+            self._best_before_last = self.best_streak
+            self.last_day = day
+
+        self.streak = self._streak_before_last + 1 if done else 0
+        self.best_streak = max(self._best_before_last, self.streak)
+        self._set_bit(day - self.first_day, done)
+        return True
+
+    def current_streak(self, day: int) -> int:
+        # No report yesterday or today means the streak is already broken
+        return self.streak if day - self.last_day <= 1 else 0
+
+    def completions_between(self, start_day: int, end_day: int) -> int:
+        """Completed days in [start_day, end_day], both inclusive."""
+        return self._count_before(end_day + 1) - self._count_before(start_day)
+
+    def dump(self) -> list:
+        # Compact, JSON-friendly form for snapshots
+        return [
+            self.first_day, self.last_day, self.bits.hex(), list(self.block_counts),
+            self.streak, self.best_streak, self._streak_before_last, self._best_before_last,
+        ]
+
+    @classmethod
+    def load(cls, data: list) -> "HabitHistory":
+        history = cls(data[0])
+        history.last_day = data[1]
+        history.bits = bytearray.fromhex(data[2])
+        history.block_counts = array("I", data[3])
+        history.streak, history.best_streak, history._streak_before_last, history._best_before_last = data[4:8]
+        return history
 
-def get_streak() -> int:
-    streak = 0
-    for result in reversed(user_logs):
-        if result:
-            streak += 1
+    # --- internals ---
+
+    def _count_before(self, day: int) -> int:
+        offset = min(max(day - self.first_day, 0), len(self.bits) * 8)
+        block, within = divmod(offset, BLOCK_DAYS)
+        if block >= len(self.block_counts):
+            return self.block_counts[-1] + self._block_popcount(len(self.block_counts) - 1, BLOCK_DAYS)
+        return self.block_counts[block] + self._block_popcount(block, within)
+
+    def _block_popcount(self, block: int, upto: int) -> int:
+        start = block * (BLOCK_DAYS // 8)
+        chunk = int.from_bytes(self.bits[start:start + BLOCK_DAYS // 8], "little")
+        return (chunk & ((1 << upto) - 1)).bit_count()
+
+    def _set_bit(self, offset: int, done: bool) -> None:
+        byte, bit = divmod(offset, 8)
+        if byte >= len(self.bits):
+            self.bits.extend(bytes(byte + 1 - len(self.bits)))
+        # Open block counters for every block we've moved into (only happens on gaps/new blocks)
+        block = offset // BLOCK_DAYS
+        while len(self.block_counts) <= block:
+            previous = len(self.block_counts) - 1
+            self.block_counts.append(self.block_counts[previous] + self._block_popcount(previous, BLOCK_DAYS))
+        if done:
+            self.bits[byte] |= 1 << bit
         else:
-            break
-    return streak
+            self.bits[byte] &= ~(1 << bit) & 0xFF
+
+
+# user_id -> HabitHistory
+histories = {}
+
+
+def log_habit(done: bool, user_id: str = "default", day: int = None, carry: int = 0):
+    """carry: streak the user already had elsewhere, continued if this is their first tracked day."""
+    day = today() if day is None else day
+    history = histories.get(user_id)
+    if history is None:
+        history = histories[user_id] = HabitHistory(day, carry)
+    history.log(done, day)
+    return done
+
+
+def get_streak(user_id: str = "default", day: int = None) -> int:
+    history = histories.get(user_id)
+    if history is None:
+        return 0
+    return history.current_streak(today() if day is None else day)
+
+
+def get_best_streak(user_id: str = "default") -> int:
+    history = histories.get(user_id)
+    return history.best_streak if history is not None else 0
+
+
+def completions_in_last(days: int, user_id: str = "default", day: int = None) -> int:
+    """How many of the last `days` calendar days (including today) were completed."""
+    history = histories.get(user_id)
+    if history is None:
+        return 0
+    day = today() if day is None else day
+    return history.completions_between(day - days + 1, day)
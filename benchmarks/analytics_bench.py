@@ -0,0 +1,103 @@
+# benchmarks/analytics_bench.py
+#
+# Query timings for agents/analytics.py on a synthetic report history.
+#
+#   python benchmarks/analytics_bench.py --rows 100000000 --users 2000000
+#   python benchmarks/analytics_bench.py --rows 10000000 --ingest 200000
+#
+# Chunks are generated straight into ReportAnalytics (no disk, no record()
+# calls) with a year of days, a skewed user/goal mix and realistic flag
+# rates, then every admin query is run --repeat times. --ingest also times
+# that many record() calls, the per-report cost on the hot path.
+# Needs about 13 bytes of RAM per row (1.3 GB for 100M rows).
+
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.analytics import CATEGORIES, COLUMNS, DONE, EPOCH, NEW_DAY, NEW_WEEK, ReportAnalytics
+
+
+def synthetic(args) -> ReportAnalytics:
+    rng = np.random.default_rng(42)
+    analytics = ReportAnalytics(enabled=True, chunk_rows=args.chunk_rows)
+    end = date.today().toordinal() - EPOCH
+    first_day = rng.integers(end - 365, end, args.users).astype(np.uint16)
+    analytics.user_ids = [f"user-{i}" for i in range(args.users)]
+    analytics.goals = [f"goal-{i}" for i in range(args.goals)]
+    analytics.first_day.frombytes(first_day.tobytes())
+    analytics.streak.frombytes(rng.geometric(0.15, args.users).astype(np.int32).tobytes())
+
+    done = 0
+    while done < args.rows:
+        n = min(args.chunk_rows, args.rows - done)
+        user = (rng.pareto(1.2, n) * args.users / 20).astype(np.int64) % args.users
+        # Reports arrive in day order: chunk k covers the k-th slice of the year
+        day = (end - 365 + 365 * (done + np.sort(rng.integers(0, n, n))) // args.rows).astype(np.uint16)
+        flags = (rng.random(n) < 0.7) * DONE | (rng.random(n) < 0.9) * NEW_DAY | (rng.random(n) < 0.15) * NEW_WEEK
+        chunk = {
+            "user": user.astype(COLUMNS["user"]),
+            "day": day,
+            "cat": rng.integers(0, len(CATEGORIES), n).astype(COLUMNS["cat"]),
+            "flags": flags.astype(COLUMNS["flags"]),
+            "goal": (rng.zipf(1.3, n) % args.goals).astype(COLUMNS["goal"]),
+        }
+        analytics.chunks.append(chunk)
+        analytics.zones.append(analytics._zone(chunk))
+        done += n
+    return analytics
+
+
+QUERIES = {
+    "completion": lambda a: a.completion_by_category(),
+    "completion_30d": lambda a: a.completion_by_category(start_day=date.today().toordinal() - 29),
+    "streaks": lambda a: a.streak_distribution(),
+    "dau_30": lambda a: a.daily_active_users(30),
+    "missed_goals": lambda a: a.missed_goals(10),
+    "retention_8w": lambda a: a.cohort_retention(8),
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Time the analytics queries on synthetic report history")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--users", type=int, default=500_000)
+    parser.add_argument("--goals", type=int, default=50_000)
+    parser.add_argument("--chunk-rows", type=int, default=1 << 20)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--ingest", type=int, default=0, help="also time this many record() calls")
+    return parser.parse_args(argv)
+
+
+def main_cli(argv=None) -> int:
+    args = parse_args(argv)
+    started = time.perf_counter()
+    analytics = synthetic(args)
+    print(f"Generated {len(analytics):,} rows / {args.users:,} users in {time.perf_counter() - started:.1f}s")
+
+    for name, query in QUERIES.items():
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            query(analytics)
+            timings.append(time.perf_counter() - started)
+        print(f"{name:>16}: best {min(timings) * 1000:8.1f} ms   worst {max(timings) * 1000:8.1f} ms")
+
+    if args.ingest:
+        today = date.today().toordinal()
+        started = time.perf_counter()
+        for i in range(args.ingest):
+            analytics.record(f"user-{i % args.users}", today, "transport", "goal-1", i % 3 != 0, i % 30)
+        elapsed = time.perf_counter() - started
+        print(f"{'record()':>16}: {elapsed / args.ingest * 1e6:.2f} µs per report")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
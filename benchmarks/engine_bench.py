@@ -0,0 +1,128 @@
+# benchmarks/engine_bench.py
+#
+# Per-call overhead of the three ways into the coaching engine:
+#
+#   uagents   what a uAgents message pays on top of the handler: the model
+#             is JSON-encoded into a signed envelope, the receiver parses
+#             the envelope, checks the signature and parses the model, and
+#             the reply makes the same trip back (HTTP transport excluded)
+#   gateway   main.py's in-process gateway: the protocol handler is called
+#             directly with pydantic models and a stand-in Context
+#   engine    agents/engine.py direct calls: engine.session(user).report(...)
+#
+#   python benchmarks/engine_bench.py --calls 20000
+#
+# Workloads never reach an LLM: "report" logs a daily result, "fast_path"
+# asks about a habit the rule-based classifier answers from templates.
+# Users rotate so no call hits a rate limit or waits on a lock.
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# No event log / snapshots, no per-user rate limits: we're measuring call overhead
+os.environ.setdefault("COACH_EVENT_LOG", "0")
+os.environ.setdefault("COACH_ANALYTICS", "0")
+os.environ.setdefault("COACH_RATE_REPORT", "1000000")
+os.environ.setdefault("COACH_BURST_REPORT", "1000000")
+
+from uagents.crypto import Identity
+from uagents.envelope import Envelope
+from uagents.models import Model
+
+import agents.coach_agent_os as coach
+from agents.gateway import Gateway
+from agents.schemas import CoachReply, HabitInput, UserReport
+
+WORKLOADS = {
+    "report": (
+        coach.handle_user_report,
+        lambda user: UserReport(user_id=user, completed=True, habit="I drive to work", goal_id=""),
+        lambda session: session.report(True, "I drive to work"),
+    ),
+    "fast_path": (
+        coach.handle_habit_input,
+        lambda user: HabitInput(user_id=user, habit="I use plastic bags regularly"),
+        lambda session: session.suggest("I use plastic bags regularly"),
+    ),
+}
+
+
+class EnvelopeTransport:
+    """Both ends of a uAgents message exchange, minus the network."""
+
+    def __init__(self, gateway: Gateway):
+        self.gateway = gateway
+        self.client = Identity.generate()
+        self.agent = Identity.generate()
+
+    def seal(self, sender: Identity, target: str, message: Model, session) -> str:
+        env = Envelope(version=1, sender=sender.address, target=target, session=session,
+                       schema_digest=Model.build_schema_digest(message))
+        env.encode_payload(message.model_dump_json())
+        env.sign(sender.sign_digest)
+        return env.model_dump_json()
+
+    def open(self, raw: str, model):
+        env = Envelope.model_validate_json(raw)
+        if not env.verify():
+            raise ValueError("bad envelope signature")
+        return env, model.parse_raw(env.decode_payload())
+
+    async def request(self, handler, message: Model, model):
+        raw = self.seal(self.client, self.agent.address, message, uuid.uuid4())
+        env, received = self.open(raw, model)
+        reply = await self.gateway.request(handler, received)
+        raw = self.seal(self.agent, env.sender, reply, env.session)
+        return self.open(raw, CoachReply)[1]
+
+
+async def run_path(path: str, workload: str, calls: int, users: int) -> float:
+    handler, make_message, call_engine = WORKLOADS[workload]
+    model = type(make_message("warmup"))
+    gateway = Gateway()
+    transport = EnvelopeTransport(gateway)
+    sessions = [coach.engine.session(f"{path}-{workload}-{i}") for i in range(users)]
+
+    async def one(i):
+        session = sessions[i % users]
+        if path == "engine":
+            return await call_engine(session)
+        message = make_message(session.user_id)
+        if path == "gateway":
+            return await gateway.request(handler, message)
+        return await transport.request(handler, message, model)
+
+    for i in range(min(calls, 200)):  # warm-up
+        await one(i)
+    started = time.perf_counter()
+    for i in range(calls):
+        await one(i)
+    return (time.perf_counter() - started) / calls
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Direct engine calls vs. gateway vs. uAgents envelopes")
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=1000)
+    return parser.parse_args()
+
+
+async def main():
+    args = parse_args()
+    print(f"{'workload':<10} {'path':<8} {'us/call':>9} {'calls/s':>9} {'vs engine':>10}")
+    for workload in WORKLOADS:
+        results = {path: await run_path(path, workload, args.calls, args.users)
+                   for path in ("engine", "gateway", "uagents")}
+        for path, seconds in results.items():
+            print(f"{workload:<10} {path:<8} {seconds * 1e6:>9.1f} {1 / seconds:>9.0f} "
+                  f"{seconds / results['engine']:>9.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
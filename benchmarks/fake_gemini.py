@@ -0,0 +1,99 @@
+# benchmarks/fake_gemini.py
+
+import hashlib
+import json
+import re
+import time
+
+# --- Deterministic local stand-in for genai.GenerativeModel ---
+# Same call shape as the Gemini SDK (generate_content(prompt, stream=...),
+# .text, .usage_metadata), but answers come from a hash of the prompt and
+# timing is simulated: a fixed time-to-first-token plus a steady token rate.
+# Numbered multi-habit prompts (batch mode) get a JSON array back.
+# generation_config={"max_output_tokens": N} cuts the answer like Gemini would.
+#
+# Blocking sleeps on purpose: the real SDK blocks the calling thread too.
+
+_NUMBERED_HABIT = re.compile(r"^\s*\d+\.\s+Habit:", re.MULTILINE)
+
+GOALS = [
+    "Today, pick one short trip and walk or cycle instead.",
+    "Carry a reusable bag in your backpack today and skip single-use plastic.",
+    "Switch off every light as you leave a room today.",
+    "Fill a reusable bottle this morning and skip bottled water today.",
+    "Keep today's shower under five minutes; a song is a good timer.",
+    "Unplug one device you aren't using before bed tonight.",
+]
+
+
+class FakeUsage:
+    def __init__(self, prompt_tokens: int, output_tokens: int):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+        self.total_token_count = prompt_tokens + output_tokens
+
+
+class FakeResponse:
+    def __init__(self, text: str, usage: FakeUsage):
+        self.text = text
+        self.usage_metadata = usage
+
+
+class FakeGenerativeModel:
+    # Class-level knobs so the benchmark can tune every instance at once
+    first_token_latency = 0.4   # seconds
+    tokens_per_second = 80.0
+    calls = 0
+    prompt_tokens = 0
+    output_tokens = 0
+
+    def __init__(self, model_name: str = "fake-gemini", **kwargs):
+        self.model_name = model_name
+        self.system_instruction = kwargs.get("system_instruction")
+
+    def generate_content(self, prompt, stream: bool = False, generation_config=None, **kwargs):
+        prompt = prompt if isinstance(prompt, str) else str(prompt)
+        text = self._answer(prompt)
+        max_output = (generation_config or {}).get("max_output_tokens")
+        if max_output and _tokens(text) > max_output:
+            text = text[:max_output * 4]
+        words = text.split(" ")
+        prompt_tokens = _tokens(prompt) + _tokens(self.system_instruction or "")
+        output_tokens = _tokens(text)
+
+        cls = type(self)
+        cls.calls += 1
+        cls.prompt_tokens += prompt_tokens
+        cls.output_tokens += output_tokens
+
+        if stream:
+            return self._stream(words, FakeUsage(prompt_tokens, output_tokens))
+        time.sleep(self.first_token_latency + output_tokens / self.tokens_per_second)
+        return FakeResponse(text, FakeUsage(prompt_tokens, output_tokens))
+
+    def _stream(self, words, usage):
+        time.sleep(self.first_token_latency)
+        for i, word in enumerate(words):
+            piece = word if i == 0 else " " + word
+            time.sleep(_tokens(piece) / self.tokens_per_second)
+            yield FakeResponse(piece, usage)
+
+    def _answer(self, prompt: str) -> str:
+        items = len(_NUMBERED_HABIT.findall(prompt))
+        if items:
+            return json.dumps([self._goal(f"{prompt}#{i}") for i in range(items)])
+        return self._goal(prompt)
+
+    @staticmethod
+    def _goal(seed: str) -> str:
+        digest = int(hashlib.sha1(seed.encode("utf-8")).hexdigest(), 16)
+        return GOALS[digest % len(GOALS)] + " You've got this! 🌱"
+
+    @classmethod
+    def reset_counters(cls) -> None:
+        cls.calls = cls.prompt_tokens = cls.output_tokens = 0
+
+
+def _tokens(text: str) -> int:
+    # Same rough 4-characters-per-token rule we use elsewhere
+    return max(1, len(text) // 4)
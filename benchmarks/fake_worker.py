@@ -0,0 +1,19 @@
+# benchmarks/fake_worker.py
+#
+# main:app with the fake Gemini model patched in, for multi-process runs:
+#   python cluster.py --workers 4 --app benchmarks.fake_worker:app
+# FAKE_GEMINI_LATENCY / FAKE_GEMINI_TOKEN_RATE set the fake model's timing.
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import google.generativeai as genai
+from benchmarks.fake_gemini import FakeGenerativeModel
+
+FakeGenerativeModel.first_token_latency = float(os.getenv("FAKE_GEMINI_LATENCY", FakeGenerativeModel.first_token_latency))
+FakeGenerativeModel.tokens_per_second = float(os.getenv("FAKE_GEMINI_TOKEN_RATE", FakeGenerativeModel.tokens_per_second))
+genai.GenerativeModel = FakeGenerativeModel
+
+from main import app  # noqa: E402
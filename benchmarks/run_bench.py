@@ -0,0 +1,343 @@
+# benchmarks/run_bench.py
+#
+# Load test for the coach backend with a local Gemini stand-in.
+#
+#   python benchmarks/run_bench.py --profile closed --concurrency 64 --requests 5000
+#   python benchmarks/run_bench.py --profile open --rate 200 --duration 30
+#   python benchmarks/run_bench.py ... --compare benchmarks/results/<older run>.json
+#   python benchmarks/run_bench.py --workers 4 ...   (multi-process, over HTTP)
+#
+# Requests go through main.py's in-process gateway into handle_habit_input /
+# handle_user_report, with main.py's startup (Bureau included) running in the
+# same event loop, exactly like under uvicorn. genai.GenerativeModel is
+# replaced by benchmarks/fake_gemini.py before anything imports it.
+# With --workers N the bench starts cluster.py (N fake-Gemini workers behind
+# the user_id router, shared SQLite state in a temp dir) and sends real HTTP
+# requests to it instead; compare runs with different N to see scaling.
+# Results (p50/p95/p99 latency, requests/sec, event-loop lag, LLM/cache
+# counters) are written as JSON to benchmarks/results/.
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# No event log / snapshots unless asked for: we're measuring the request path
+os.environ.setdefault("COACH_EVENT_LOG", "0")
+
+import google.generativeai as genai
+from benchmarks.fake_gemini import FakeGenerativeModel
+
+genai.GenerativeModel = FakeGenerativeModel
+
+import main
+import agents.coach_agent_os as coach
+from agents.coach_agent import SUGGESTED_HABITS
+from agents.schemas import HabitInput, UserReport
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+# --- measurement helpers ---
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, elapsed: float) -> dict:
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(1000 * percentile(values, 50), 2),
+        "p95_ms": round(1000 * percentile(values, 95), 2),
+        "p99_ms": round(1000 * percentile(values, 99), 2),
+        "max_ms": round(1000 * values[-1], 2) if values else 0.0,
+    }
+
+
+class LoopLagMonitor:
+    """Schedules a short sleep over and over and records how late it wakes up."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - started - self.interval))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> dict:
+        self._task.cancel()
+        values = sorted(self.samples)
+        return {
+            "p50_ms": round(1000 * percentile(values, 50), 2),
+            "p99_ms": round(1000 * percentile(values, 99), 2),
+            "max_ms": round(1000 * values[-1], 2) if values else 0.0,
+        }
+
+
+# --- workload ---
+
+class Workload:
+    def __init__(self, args, session=None, base_url: str = None):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.latencies = {"habit": [], "report": []}
+        self.errors = 0
+        # Set for --workers runs: requests go over HTTP to cluster.py
+        self.session = session
+        self.base_url = base_url
+
+    def next_message(self):
+        user_id = f"user{self.rng.randrange(self.args.users)}"
+        if self.rng.random() < self.args.report_ratio:
+            return "report", UserReport(
+                user_id=user_id,
+                completed=self.rng.random() < 0.8,
+                habit="",
+                goal_id="",
+            )
+        if self.rng.random() < self.args.common_ratio:
+            habit = self.rng.choice(SUGGESTED_HABITS)
+        elif self.rng.random() < self.args.long_ratio:
+            # Someone pasting a whole essay into the habit box
+            habit = " ".join(f"I keep doing thing {self.rng.randrange(1_000_000)} every single day." for _ in range(60))
+        else:
+            habit = f"I have a unique habit number {self.rng.randrange(1_000_000)} to fix"
+        return "habit", HabitInput(user_id=user_id, habit=habit)
+
+    async def issue(self, kind, msg):
+        started = time.perf_counter()
+        try:
+            if self.session is not None:
+                path = "/v1/habit" if kind == "habit" else "/v1/report"
+                async with self.session.post(f"{self.base_url}{path}", json=msg.dict()) as resp:
+                    await resp.read()
+                    if resp.status != 200:
+                        self.errors += 1
+                        return
+            else:
+                handler = main.handle_habit_input if kind == "habit" else main.handle_user_report
+                await main.gateway.request(handler, msg)
+        except Exception:
+            self.errors += 1
+            return
+        self.latencies[kind].append(time.perf_counter() - started)
+
+
+async def run_closed(workload: Workload, args):
+    # N virtual users, each sends its next request as soon as the last one returns
+    deadline = time.perf_counter() + args.duration if args.duration else None
+    remaining = [args.requests]
+
+    async def virtual_user():
+        while remaining[0] > 0 and (deadline is None or time.perf_counter() < deadline):
+            remaining[0] -= 1
+            await workload.issue(*workload.next_message())
+
+    await asyncio.gather(*(virtual_user() for _ in range(args.concurrency)))
+
+
+async def run_open(workload: Workload, args):
+    # Poisson arrivals at a fixed rate, no matter how slow responses get
+    duration = args.duration or args.requests / args.rate
+    loop = asyncio.get_running_loop()
+    end = loop.time() + duration
+    in_flight = set()
+    while loop.time() < end:
+        task = asyncio.create_task(workload.issue(*workload.next_message()))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+        await asyncio.sleep(workload.rng.expovariate(args.rate))
+    await asyncio.gather(*in_flight)
+
+
+# --- reporting ---
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current: dict, baseline_path: str, tolerance: float) -> bool:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    ok = True
+    print(f"\nCompared with {baseline_path} (commit {baseline.get('commit')}):")
+    for kind in ("habit", "report", "all"):
+        old, new = baseline["results"].get(kind), current["results"].get(kind)
+        if not old or not new or not old["count"]:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "rps"):
+            before, after = old[metric], new[metric]
+            change = (after - before) / before * 100 if before else 0.0
+            worse = change > tolerance if metric != "rps" else change < -tolerance
+            ok = ok and not worse
+            print(f"  {kind:<6} {metric:<7} {before:>10} -> {after:>10} ({change:+.1f}%){'  REGRESSION' if worse else ''}")
+    return ok
+
+
+def start_cluster(args, workdir: str):
+    env = dict(os.environ)
+    env.update({
+        "FAKE_GEMINI_LATENCY": str(args.llm_latency),
+        "FAKE_GEMINI_TOKEN_RATE": str(args.token_rate),
+        "COACH_STATE_BACKEND": "sqlite",
+        "COACH_DB_PATH": os.path.join(workdir, "bench.db"),
+        "COACH_DATA_DIR": os.path.join(workdir, "data"),
+    })
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    return subprocess.Popen(
+        [sys.executable, "cluster.py", "--workers", str(args.workers), "--port", str(args.port),
+         "--host", "127.0.0.1", "--app", "benchmarks.fake_worker:app", "--no-bureau"],
+        cwd=root, env=env,
+    )
+
+
+async def wait_for_cluster(session, base_url: str, process, timeout: float = 120.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"cluster.py exited with code {process.returncode}")
+        try:
+            async with session.get(f"{base_url}/health") as resp:
+                if resp.status == 200 and (await resp.json())["status"] == "ok":
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"cluster.py not ready after {timeout}s")
+
+
+async def bench(args) -> dict:
+    if args.workers:
+        with tempfile.TemporaryDirectory() as workdir:
+            process = start_cluster(args, workdir)
+            try:
+                async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session:
+                    base_url = f"http://127.0.0.1:{args.port}"
+                    await wait_for_cluster(session, base_url, process)
+                    return await run_workload(args, Workload(args, session, base_url))
+            finally:
+                process.terminate()
+                process.wait()
+
+    FakeGenerativeModel.first_token_latency = args.llm_latency
+    FakeGenerativeModel.tokens_per_second = args.token_rate
+    FakeGenerativeModel.reset_counters()
+    return await run_workload(args, Workload(args))
+
+
+async def run_workload(args, workload: Workload) -> dict:
+    bureau_running = False
+    # --workers runs: every worker already ran main.py's startup under uvicorn
+    if workload.session is None and args.bureau:
+        await main.startup_event()
+        bureau_running = main.RUN_BUREAU
+
+    lag = LoopLagMonitor()
+    lag.start()
+    started = time.perf_counter()
+    if args.profile == "closed":
+        await run_closed(workload, args)
+    else:
+        await run_open(workload, args)
+    elapsed = time.perf_counter() - started
+    loop_lag = lag.stop()
+
+    all_latencies = workload.latencies["habit"] + workload.latencies["report"]
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "bureau_running": bureau_running,
+        "seconds": round(elapsed, 3),
+        "errors": workload.errors,
+        "results": {
+            "habit": summarize(workload.latencies["habit"], elapsed),
+            "report": summarize(workload.latencies["report"], elapsed),
+            "all": summarize(all_latencies, elapsed),
+        },
+        "loop_lag_ms": loop_lag,
+        "workers": args.workers,
+        # LLM/cache counters live in the worker processes for --workers runs; see their /metrics
+        "llm": None if workload.session is not None else {
+            "calls": FakeGenerativeModel.calls,
+            "prompt_tokens": FakeGenerativeModel.prompt_tokens,
+            "output_tokens": FakeGenerativeModel.output_tokens,
+            "avg_tokens_per_call": round((FakeGenerativeModel.prompt_tokens + FakeGenerativeModel.output_tokens)
+                                         / FakeGenerativeModel.calls, 1) if FakeGenerativeModel.calls else 0.0,
+            "pool": coach.llm_pool.stats(),
+            "single_flight": coach.llm_flight.stats(),
+            "cache": coach.goal_cache.stats(),
+        },
+        "users_with_state": None if workload.session is not None else len(coach.state_store),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the coach backend with a fake Gemini model")
+    parser.add_argument("--profile", choices=["closed", "open"], default="closed")
+    parser.add_argument("--requests", type=int, default=2000, help="total requests (closed) / used with --rate when no --duration (open)")
+    parser.add_argument("--duration", type=float, default=0, help="seconds to run instead of a fixed request count")
+    parser.add_argument("--concurrency", type=int, default=32, help="virtual users for the closed-loop profile")
+    parser.add_argument("--rate", type=float, default=100, help="arrivals per second for the open-loop profile")
+    parser.add_argument("--users", type=int, default=10000, help="distinct simulated user_ids")
+    parser.add_argument("--report-ratio", type=float, default=0.5, help="share of UserReport messages")
+    parser.add_argument("--common-ratio", type=float, default=0.8, help="share of habits taken from SUGGESTED_HABITS")
+    parser.add_argument("--long-ratio", type=float, default=0.0, help="share of the other habits that are very long pasted text")
+    parser.add_argument("--llm-latency", type=float, default=0.4, help="fake time to first token, seconds")
+    parser.add_argument("--token-rate", type=float, default=80, help="fake output tokens per second")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=0, help="run cluster.py with N worker processes and test it over HTTP")
+    parser.add_argument("--port", type=int, default=3100, help="router port for --workers runs (workers use the next N ports)")
+    parser.add_argument("--no-bureau", dest="bureau", action="store_false", help="don't run main.py's startup (Bureau) during the test")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/<timestamp>-<commit>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    parser.add_argument("--tolerance", type=float, default=10.0, help="allowed regression in percent for --compare")
+    return parser.parse_args(argv)
+
+
+def main_cli(argv=None) -> int:
+    args = parse_args(argv)
+    result = asyncio.run(bench(args))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{result['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+
+    print(json.dumps({"results": result["results"], "loop_lag_ms": result["loop_lag_ms"], "llm": result["llm"]}, indent=2))
+    print(f"\nSaved to {output}")
+
+    if args.compare and not compare(result, args.compare, args.tolerance):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
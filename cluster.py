@@ -0,0 +1,286 @@
+# cluster.py
+#
+# Multi-process deployment of the coach backend:
+#
+#   python cluster.py --workers 4 --port 3000
+#
+# - Starts N copies of main.py (`uvicorn main:app`) on ports port+1 ... port+N.
+# - Serves the same HTTP API as main.py on --port and forwards each request
+#   to the worker that owns its user_id on a consistent-hash ring
+#   (utils/hash_ring.py). One user's habit inputs and reports therefore
+#   always land in the same process, in order, where the per-user striped
+#   locks keep streak updates serialized.
+# - Workers share one SQLite (WAL) state DB (COACH_DB_PATH) and each keeps its
+#   own event log under <COACH_DATA_DIR>/worker-<n> for tracker histories.
+# - The uAgents Bureau is off by default. With --bureau, worker 0 runs it on
+#   COACH_BUREAU_PORT (8000); a second Bureau would fight over the same
+#   agent seed and port.
+# - /metrics, /admin/* and /ready are not routed: they describe a single
+#   process, so ask each worker on its own port.
+# - A worker that exits is restarted on the same port.
+#
+# The frontend keeps talking to http://localhost:3000 as before.
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+
+import aiohttp
+import uvicorn
+from fastapi import FastAPI, Body, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+
+from utils.hash_ring import HashRing
+
+logger = logging.getLogger("coach.cluster")
+
+AUTH_HEADERS = ("x-user-token", "x-admin-token")
+BATCH_MAX_ITEMS = int(os.getenv("COACH_BATCH_MAX_ITEMS", "500"))
+
+
+class Worker:
+    def __init__(self, index: int, port: int, app: str, env: dict):
+        self.index = index
+        self.name = f"worker-{index}"
+        self.port = port
+        self.url = f"http://127.0.0.1:{port}"
+        self.app = app
+        self.env = env
+        self.process = None
+        self.restarts = 0
+
+    def start(self) -> None:
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", self.app, "--host", "127.0.0.1",
+             "--port", str(self.port), "--log-level", "warning"],
+            env=self.env,
+        )
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self) -> None:
+        if self.alive:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+
+
+class Cluster:
+    def __init__(self, workers: int, port: int, app: str = "main:app", bureau: bool = False):
+        data_dir = os.getenv("COACH_DATA_DIR", "data")
+        self.workers = {}
+        for i in range(workers):
+            env = dict(os.environ)
+            env.setdefault("COACH_STATE_BACKEND", "sqlite")
+            env["COACH_WORKER_ID"] = str(i)
+            env["COACH_WORKER_COUNT"] = str(workers)
+            env["COACH_DATA_DIR"] = os.path.join(data_dir, f"worker-{i}")
+            env["COACH_RUN_BUREAU"] = "1" if bureau and i == 0 else "0"
+            worker = Worker(i, port + 1 + i, app, env)
+            self.workers[worker.name] = worker
+        self.ring = HashRing(self.workers)
+        self.session = None
+
+    def worker_for(self, user_id: str) -> Worker:
+        return self.workers[self.ring.node_for(user_id)]
+
+    async def start(self, ready_timeout: float = 60.0) -> None:
+        # Keep-alive connections to every worker, no per-host cap
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=0, limit_per_host=0),
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=5),
+        )
+        try:
+            for worker in self.workers.values():
+                worker.start()
+            await self._wait_ready(ready_timeout)
+        except BaseException:
+            # Don't leave the workers that did start running without a router
+            await self.stop()
+            raise
+        logger.info(f"Cluster ready: {len(self.workers)} workers")
+
+    async def _wait_ready(self, ready_timeout: float) -> None:
+        deadline = time.monotonic() + ready_timeout
+        for worker in self.workers.values():
+            while not await self._healthy(worker, "/ready"):
+                if not worker.alive:
+                    raise RuntimeError(f"{worker.name} exited during startup (code {worker.process.returncode})")
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"{worker.name} not ready after {ready_timeout}s")
+                await asyncio.sleep(0.2)
+
+    async def _healthy(self, worker: Worker, path: str = "/health") -> bool:
+        try:
+            async with self.session.get(f"{worker.url}{path}", timeout=aiohttp.ClientTimeout(total=2)) as resp:
+                return resp.status == 200
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return False
+
+    async def supervise(self, interval: float = 1.0) -> None:
+        """Background task: restart any worker that has exited."""
+        while True:
+            await asyncio.sleep(interval)
+            for worker in self.workers.values():
+                if not worker.alive:
+                    logger.warning(f"{worker.name} exited (code {worker.process.returncode}), restarting")
+                    worker.restarts += 1
+                    worker.start()
+
+    async def forward(self, user_id: str, path: str, payload=None, params: dict = None,
+                      headers: dict = None) -> Response:
+        """POSTs payload (or GETs, with no payload) to the worker that owns user_id."""
+        worker = self.worker_for(user_id)
+        method = "GET" if payload is None else "POST"
+        try:
+            async with self.session.request(method, f"{worker.url}{path}", json=payload, params=params,
+                                            headers=headers) as resp:
+                content = await resp.read()
+                return Response(content, status_code=resp.status, media_type=resp.headers.get("Content-Type"))
+        except aiohttp.ClientError as e:
+            raise HTTPException(status_code=502, detail=f"{worker.name} unavailable: {e}")
+
+    async def stop(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        for worker in self.workers.values():
+            worker.stop()
+
+
+def _user_id(body: dict) -> str:
+    user_id = body.get("user_id") if isinstance(body, dict) else None
+    if not isinstance(user_id, str):
+        raise HTTPException(status_code=422, detail="user_id is required")
+    return user_id
+
+
+def _auth(request: Request) -> dict:
+    # The workers check these (see main.py); the router only passes them on
+    return {name: request.headers[name] for name in AUTH_HEADERS if name in request.headers}
+
+
+def create_app(cluster: Cluster) -> FastAPI:
+    app = FastAPI()
+
+    @app.on_event("startup")
+    async def startup_event():
+        await cluster.start()
+        asyncio.create_task(cluster.supervise())
+
+    @app.on_event("shutdown")
+    async def shutdown_event():
+        await cluster.stop()
+
+    @app.get("/health")
+    async def health():
+        """
+        Router health plus every worker's: {"status": "ok"|"degraded", "workers": {...}}
+        """
+        checks = await asyncio.gather(*(cluster._healthy(w) for w in cluster.workers.values()))
+        workers = {
+            worker.name: {"port": worker.port, "healthy": ok, "restarts": worker.restarts}
+            for worker, ok in zip(cluster.workers.values(), checks)
+        }
+        return {"status": "ok" if all(checks) else "degraded", "workers": workers}
+
+    @app.post("/v1/habit")
+    async def submit_habit(request: Request, body: dict = Body(...)):
+        return await cluster.forward(_user_id(body), "/v1/habit", body, headers=_auth(request))
+
+    @app.post("/v1/report")
+    async def submit_report(request: Request, body: dict = Body(...)):
+        return await cluster.forward(_user_id(body), "/v1/report", body, headers=_auth(request))
+
+    @app.get("/v1/history")
+    async def history(request: Request, user_id: str):
+        return await cluster.forward(user_id, "/v1/history", params=dict(request.query_params),
+                                     headers=_auth(request))
+
+    @app.post("/v1/habit/stream")
+    async def stream_habit(request: Request, body: dict = Body(...)):
+        worker = cluster.worker_for(_user_id(body))
+        try:
+            resp = await cluster.session.post(f"{worker.url}/v1/habit/stream", json=body, headers=_auth(request))
+        except aiohttp.ClientError as e:
+            raise HTTPException(status_code=502, detail=f"{worker.name} unavailable: {e}")
+        if resp.status != 200:
+            content = await resp.read()
+            resp.release()
+            return Response(content, status_code=resp.status, media_type=resp.headers.get("Content-Type"))
+
+        async def relay():
+            try:
+                async for chunk in resp.content.iter_any():
+                    yield chunk
+            finally:
+                resp.release()
+
+        return StreamingResponse(relay(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    @app.post("/v1/habit/batch")
+    async def submit_habit_batch(request: Request, body: dict = Body(...)):
+        """
+        Split by owning worker, run the sub-batches in parallel, then put the
+        replies back in the original item order.
+        """
+        items = body.get("items")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=422, detail="items must be a list")
+        if len(items) > BATCH_MAX_ITEMS:
+            raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_ITEMS} items per batch")
+        groups = {}
+        for index, item in enumerate(items):
+            groups.setdefault(cluster.worker_for(_user_id(item)).name, []).append(index)
+
+        async def run(indexes):
+            resp = await cluster.forward(items[indexes[0]]["user_id"], "/v1/habit/batch",
+                                         {"items": [items[i] for i in indexes]}, headers=_auth(request))
+            return indexes, resp
+
+        replies = [None] * len(items)
+        for indexes, resp in await asyncio.gather(*(run(indexes) for indexes in groups.values())):
+            if resp.status_code != 200:
+                return resp
+            for index, reply in zip(indexes, json.loads(resp.body)["replies"]):
+                replies[index] = reply
+        return {"replies": replies}
+
+    @app.post("/submit")
+    async def submit(request: Request, payload: dict = Body(...)):
+        return await cluster.forward(_user_id(payload.get("body") or {}), "/submit", payload,
+                                     headers=_auth(request))
+
+    return app
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run N coach workers behind a user_id-affinity router")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=3000, help="router port; workers use the next N ports")
+    parser.add_argument("--app", default="main:app", help="ASGI app each worker runs")
+    parser.add_argument("--bureau", action="store_true", help="run the uAgents Bureau in worker 0")
+    parser.add_argument("--no-bureau", dest="bureau", action="store_false", help="don't run the uAgents Bureau (default)")
+    return parser.parse_args(argv)
+
+
+def main_cli(argv=None) -> None:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    cluster = Cluster(args.workers, args.port, app=args.app, bureau=args.bureau)
+    uvicorn.run(create_app(cluster), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main_cli()
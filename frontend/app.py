@@ -1,6 +1,14 @@
+import logging
+import os
+from collections import deque
+
 import streamlit as st
 import requests
-import json
+
+from backend_client import BackendClient, BackendUnavailable
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("frontend.app")
 
 # --- Configuration & Setup ---
 st.set_page_config(page_title="Sustainability Coach", page_icon="🌱", layout="wide")
@@ -137,30 +145,160 @@ st.markdown(
 st.title("🌿 Sustainability Coach AI")
 
 # --- Session State Management ---
+# The chat is a ring buffer: only the last CHAT_WINDOW messages are kept (and
+# rendered), older ones are paged in from the backend's history on demand.
+CHAT_WINDOW = 40
+HISTORY_PAGE = 20
+
 if "goal" not in st.session_state:
     st.session_state["goal"] = ""
 if "chat_messages" not in st.session_state:
-    st.session_state["chat_messages"] = [("coach", "Hello! I'm your Sustainability Coach. Tell me one habit you'd like to improve.")]
+    st.session_state["chat_messages"] = deque(
+        [("coach", "Hello! I'm your Sustainability Coach. Tell me one habit you'd like to improve.")], maxlen=CHAT_WINDOW
+    )
+if "history_page" not in st.session_state:
+    st.session_state["history_page"] = None  # None = live chat, else a page from GET /v1/history
 if "current_habit_tracked" not in st.session_state:
     st.session_state["current_habit_tracked"] = ""
 if "current_streak" not in st.session_state:
     st.session_state["current_streak"] = 0
+if "error" not in st.session_state:
+    st.session_state["error"] = ""  # shown once with st.error on the next run
+if "history_error" not in st.session_state:
+    st.session_state["history_error"] = ""  # the same, for the chat panel's own reruns
+if "notice" not in st.session_state:
+    st.session_state["notice"] = None  # ("success" | "warning", text) after a report, shown once like "error"
+if "pending_habit" not in st.session_state:
+    st.session_state["pending_habit"] = ""  # submitted habit whose goal the chat panel streams in
+
+# --- Backend Configuration ---
+BACKEND_URL = "http://localhost:3000"
+USER_ID = "user123"
 
-# --- Agent Configuration ---
-COACH_AGENT_ADDRESS = "agent1qdqyks7u4uxlwcutsk5fgfhs2p432dcp4v2cvwqe0l5n234k7pvm7u0q0qf"
-AGENT_URL = "http://localhost:3000/submit"
+@st.cache_resource
+def get_backend() -> BackendClient:
+    # One pooled client for the whole Streamlit server, reused across reruns and sessions
+    return BackendClient(BACKEND_URL, user_secret=os.getenv("COACH_USER_SECRET", ""))
+
+backend = get_backend()
+
+def backend_failed(message: str, e: Exception, key: str = "error") -> None:
+    # The handlers st.rerun() right after, so the message waits in the session for the next run
+    if isinstance(e, (BackendUnavailable, requests.exceptions.RequestException, ValueError)):
+        logger.warning(f"{message}: {e!r}")
+    else:
+        logger.exception(message)
+    if isinstance(e, BackendUnavailable):
+        st.session_state[key] = f"{message}: the AI Coach is temporarily unavailable. Please try again in a moment."
+    elif isinstance(e, requests.exceptions.ConnectionError):
+        st.session_state[key] = f"{message}: could not connect to the AI Coach. Is the backend running?"
+    else:
+        st.session_state[key] = f"{message}: {e}"
 
 # --- Display Chat Messages ---
-chat_container = st.container(height=250, border=True) # Reduced height
-with chat_container:
-    for msg_type, msg_content in st.session_state.chat_messages:
-        # Only display messages that are not of type 'error'
-        if msg_type == "user":
-            st.markdown(f'<div class="user-message">**You:** {msg_content}</div>', unsafe_allow_html=True)
-        elif msg_type == "coach":
-            st.markdown(f'<div class="coach-message">**Coach:** {msg_content}</div>', unsafe_allow_html=True)
-        elif msg_type == "system":
-            st.markdown(f'<div class="system-message">*{msg_content}*</div>', unsafe_allow_html=True)
+def render_message(msg_type: str, msg_content: str) -> str:
+    # Only display messages that are not of type 'error'
+    if msg_type == "user":
+        return f'<div class="user-message">**You:** {msg_content}</div>'
+    if msg_type == "coach":
+        return f'<div class="coach-message">**Coach:** {msg_content}</div>'
+    if msg_type == "system":
+        return f'<div class="system-message">*{msg_content}*</div>'
+    return ""
+
+def history_messages(entries):
+    """Backend history entries (goals/reports/reminders) as chat messages."""
+    for entry in entries:
+        if entry["kind"] == "goal":
+            yield "user", f"My habit: {entry['habit']}"
+            yield "coach", entry["goal"]
+        elif entry["kind"] == "reminder":
+            yield "coach", entry["text"]
+        elif entry.get("expired"):
+            yield "system", "⌛ A day went by without a report, so your streak was reset."
+        else:
+            yield "user", "Yes, I completed my goal." if entry["completed"] else "No, I missed my goal."
+            if entry["streak"] > 0:
+                yield "system", f"🔥 You're on a **{entry['streak']}-day green streak**!"
+
+def load_history_page(before=None):
+    try:
+        st.session_state["history_page"] = backend.history(USER_ID, before, HISTORY_PAGE)
+    except Exception as e:
+        backend_failed("Couldn't load earlier messages", e, key="history_error")
+
+def stream_goal(habit: str) -> None:
+    """Streams the goal for habit into a placeholder at the current position (Server-Sent Events)."""
+    # Direct prompts ("eco tip", "inspire me", ...) are answered by the backend fast path
+    try:
+        live_reply = st.empty()
+        streamed_text = ""
+        for event, data in backend.stream_habit(USER_ID, habit):
+            if event == "chunk":
+                streamed_text += data["text"]
+                live_reply.markdown(f'<div class="coach-message">**Coach:** {streamed_text}▌</div>', unsafe_allow_html=True)
+            elif event == "reply":
+                st.session_state["goal"] = data["text"]
+                st.session_state["current_streak"] = data.get("streak", 0)
+                st.session_state.chat_messages.append(("coach", data["text"]))
+            elif event == "error":
+                logger.warning(f"AI Coach stream failed: {data.get('detail')}")
+                st.session_state["error"] = f"The AI Coach couldn't finish your goal: {data.get('detail') or 'unknown error'}"
+    except Exception as e:
+        backend_failed("Couldn't get a goal", e)
+
+@st.fragment
+def chat_panel():
+    # A fragment: paging through history reruns only this panel, and it
+    # renders one bounded window of messages as a single element.
+    page = st.session_state["history_page"]
+    messages = st.session_state.chat_messages if page is None else list(history_messages(page["messages"]))
+    with st.container(height=250, border=True): # Reduced height
+        if page is not None and not messages:
+            st.markdown('<div class="system-message">*No earlier messages yet.*</div>', unsafe_allow_html=True)
+        st.markdown("\n\n".join(render_message(t, c) for t, c in messages), unsafe_allow_html=True)
+        if st.session_state["pending_habit"]:
+            # Submitted by the habit form on the previous run: stream the goal in below the chat
+            habit = st.session_state["pending_habit"]
+            st.session_state["pending_habit"] = ""
+            stream_goal(habit)
+            st.rerun()
+    if st.session_state["history_error"]:
+        st.error(st.session_state["history_error"])
+        st.session_state["history_error"] = ""
+
+    earlier, later, latest = st.columns(3)
+    if page is None:
+        if earlier.button("🕘 Earlier messages"):
+            load_history_page()
+            st.rerun(scope="fragment")
+        return
+    ids = [entry["id"] for entry in page["messages"]]
+    if earlier.button("⬆️ Earlier", disabled=not page["has_more"]):
+        load_history_page(before=ids[0])
+        st.rerun(scope="fragment")
+    # Ids are consecutive, so the next page ends HISTORY_PAGE ids after this one
+    if later.button("⬇️ Later", disabled=not ids):
+        load_history_page(before=ids[-1] + 1 + HISTORY_PAGE)
+        st.rerun(scope="fragment")
+    if latest.button("💬 Back to chat"):
+        st.session_state["history_page"] = None
+        st.rerun(scope="fragment")
+
+chat_panel()
+
+if st.session_state["error"]:
+    st.error(st.session_state["error"])
+    st.session_state["error"] = ""
+if st.session_state["notice"]:
+    # Set by the report buttons, which st.rerun() right away
+    kind, text = st.session_state["notice"]
+    if kind == "success":
+        st.balloons()
+        st.success(text)
+    else:
+        st.warning(text)
+    st.session_state["notice"] = None
 
 # --- User Input Forms & Suggestions ---
 st.subheader("👋 Start by telling me one habit you'd like to improve")
@@ -195,64 +333,13 @@ with st.form("habit_form"):
             st.session_state.chat_messages.append(("system", "Please enter or select a habit first."))
             st.rerun()
         else:
+            st.session_state["history_page"] = None # Back to the live chat to show the reply
             st.session_state.chat_messages.append(("user", f"My habit: {habit}"))
             st.session_state.chat_messages.append(("system", "Sending request to AI Coach..."))
             st.session_state["current_habit_tracked"] = habit
-            
-            # --- DIRECT PROMPT FEATURES ---
-            lower_habit = habit.lower().strip()
-            direct_response_text = ""
-
-            if lower_habit == "tell me a green fact":
-                direct_response_text = "Did you know that recycling one aluminum can saves enough energy to power a TV for three hours? Every little bit helps! 🌱"
-            elif lower_habit == "what can i recycle today?":
-                direct_response_text = "For today, focus on recycling all clean paper, cardboard, plastic bottles (with caps), and aluminum cans. Check local guidelines for more specifics! ♻️"
-            elif lower_habit == "eco tip":
-                direct_response_text = "Here's a quick eco tip: Unplug electronics when not in use. They can still draw 'phantom' power even when turned off! 💡"
-            elif lower_habit == "why is climate change bad?":
-                direct_response_text = "Climate change is leading to more extreme weather, rising sea levels, and impacts on ecosystems, threatening human health and natural habitats globally. 🌍"
-            elif lower_habit == "inspire me":
-                direct_response_text = "Remember, every small action you take for sustainability creates a ripple effect. Your effort matters, and together, we can build a greener future! ✨"
-            # --- END OF DIRECT PROMPT FEATURES ---
-
-            if direct_response_text: # If a direct prompt was matched
-                st.session_state["goal"] = direct_response_text
-                st.session_state.chat_messages.append(("coach", direct_response_text))
-                st.rerun() 
-            else: # If it's not a direct prompt, proceed with backend call
-                try:
-                    payload = {
-                        "to": COACH_AGENT_ADDRESS,
-                        "body": {
-                            "type": "HabitInput", # This must match the class name in schemas.py
-                            "user_id": "user123", 
-                            "habit": habit 
-                        }
-                    }
-                    
-                    response = requests.post(AGENT_URL, json=payload)
-                    
-                    if response.status_code == 200:
-                        try:
-                            data = response.json()
-                            if "text" in data:
-                                st.session_state["goal"] = data["text"]
-                                st.session_state["current_streak"] = data.get("streak", 0)
-                                st.session_state.chat_messages.append(("coach", data["text"]))
-                            else:
-                                print(f"DEBUG: Unexpected agent response format. Data: {data}")
-                            
-                        except json.JSONDecodeError:
-                            print(f"DEBUG: Backend returned non-JSON response for goal: {response.text}")
-                        except KeyError as ke:
-                            print(f"DEBUG: Agent response missing expected key: {ke}, Full response: {response.text}")
-                    else:
-                        print(f"DEBUG: Failed to get a response from AI Coach. Status: {response.status_code}, Response: {response.text}")
-                except requests.exceptions.ConnectionError:
-                    print("DEBUG: Could not connect to the backend AgentOS. Is it running?")
-                except Exception as e:
-                    print(f"DEBUG: An unexpected error occurred: {e}")
-                st.rerun()
+            # The chat panel streams the goal into the chat on the next run
+            st.session_state["pending_habit"] = habit
+            st.rerun()
 
 # --- Goal Completion and Reporting ---
 if st.session_state.goal:
@@ -265,78 +352,35 @@ if st.session_state.goal:
     with col1:
         # Reverted to standard Streamlit button
         if st.button("✅ Yes, I completed it!"):
+            st.session_state["history_page"] = None
             st.session_state.chat_messages.append(("user", f"Yes, I completed my goal: {st.session_state.goal}"))
             st.session_state.chat_messages.append(("system", "Reporting completion to AI Coach..."))
             try:
-                payload = {
-                    "to": COACH_AGENT_ADDRESS,
-                    "body": {
-                        "type": "UserReport", 
-                        "user_id": "user123", 
-                        "completed": True, 
-                        "habit": st.session_state["current_habit_tracked"],
-                        "goal_id": st.session_state["goal"] 
-                    }
-                }
-                response = requests.post(AGENT_URL, json=payload)
-                
-                if response.status_code == 200:
-                    try:
-                        data = response.json()
-                        st.session_state.current_streak = data.get("streak", 0)
-                        st.balloons()
-                        # Python logic for success message (replaces JS alert)
-                        st.success(data.get("text", f"🎉 YOHOO! You are on a great streak of Day {st.session_state.current_streak}! Keep going!"))
-                        st.session_state.chat_messages.append(("coach", data.get("text", "Great job! Progress logged.")))
-                        if st.session_state.current_streak > 0:
-                            st.session_state.chat_messages.append(("system", f"🔥 You're on a **{st.session_state.current_streak}-day green streak**!"))
-                    except json.JSONDecodeError:
-                        print(f"DEBUG: Backend returned non-JSON on completion: {response.text}")
-                    except KeyError as ke:
-                        print(f"DEBUG: Agent response missing key on completion: {ke}, Full response: {response.text}")
-                else:
-                    print(f"DEBUG: Couldn't log progress. Status: {response.status_code}, Response: {response.text}")
-            except requests.exceptions.ConnectionError:
-                print("DEBUG: Could not connect to the backend AgentOS for completion report.")
+                data = backend.report(USER_ID, True, st.session_state["current_habit_tracked"], st.session_state["goal"])
+                st.session_state.current_streak = data.get("streak", 0)
+                # Python logic for success message (replaces JS alert); shown with balloons after the rerun
+                st.session_state["notice"] = ("success", data.get("text", f"🎉 YOHOO! You are on a great streak of Day {st.session_state.current_streak}! Keep going!"))
+                st.session_state.chat_messages.append(("coach", data.get("text", "Great job! Progress logged.")))
+                if st.session_state.current_streak > 0:
+                    st.session_state.chat_messages.append(("system", f"🔥 You're on a **{st.session_state.current_streak}-day green streak**!"))
             except Exception as e:
-                print(f"DEBUG: An unexpected error occurred on completion: {e}")
+                backend_failed("Couldn't log your completion", e)
             st.rerun()
 
     with col2:
         # Reverted to standard Streamlit button
         if st.button("❌ No, I missed it"):
+            st.session_state["history_page"] = None
             st.session_state.chat_messages.append(("user", f"No, I missed my goal: {st.session_state.goal}"))
             st.session_state.chat_messages.append(("system", "Reporting miss to AI Coach..."))
             try:
-                payload = {
-                    "to": COACH_AGENT_ADDRESS,
-                    "body": {
-                        "type": "UserReport", 
-                        "user_id": "user123", 
-                        "completed": False, 
-                        "habit": st.session_state["current_habit_tracked"],
-                        "goal_id": st.session_state["goal"] 
-                    }
-                }
-                response = requests.post(AGENT_URL, json=payload)
-                
-                if response.status_code == 200:
-                    try:
-                        data = response.json()
-                        st.session_state.current_streak = data.get("streak", 0)
-                        # Python logic for warning message (replaces JS alert)
-                        st.warning(data.get("text", 'Keep your head up! "Success is not final, failure is not fatal: it is the courage to continue that counts."'))
-                        st.session_state.chat_messages.append(("coach", data.get("text", "It's okay, keep trying!")))
-                        if st.session_state.current_streak > 0:
-                            st.session_state.chat_messages.append(("system", f"🔥 You're on a **{st.session_state.current_streak}-day green streak**!"))
-                    except json.JSONDecodeError:
-                        print(f"DEBUG: Backend returned non-JSON on miss: {response.text}")
-                    except KeyError as ke:
-                        print(f"DEBUG: Agent response missing key on miss: {ke}, Full response: {response.text}")
-                else:
-                    print(f"DEBUG: Couldn't log progress. Status: {response.status_code}, Response: {response.text}")
-            except requests.exceptions.ConnectionError:
-                print("DEBUG: Could not connect to the backend AgentOS for miss report.")
+                data = backend.report(USER_ID, False, st.session_state["current_habit_tracked"], st.session_state["goal"])
+                st.session_state.current_streak = data.get("streak", 0)
+                # Python logic for warning message (replaces JS alert); shown after the rerun
+                st.session_state["notice"] = ("warning", data.get("text", 'Keep your head up! "Success is not final, failure is not fatal: it is the courage to continue that counts."'))
+                st.session_state.chat_messages.append(("coach", data.get("text", "It's okay, keep trying!")))
+                if st.session_state.current_streak > 0:
+                    st.session_state.chat_messages.append(("system", f"🔥 You're on a **{st.session_state.current_streak}-day green streak**!"))
             except Exception as e:
-                print(f"DEBUG: An unexpected error occurred on miss: {e}")
+                backend_failed("Couldn't log your miss", e)
             st.rerun()
\ No newline at end of file
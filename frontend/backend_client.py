@@ -0,0 +1,171 @@
+import hashlib
+import hmac
+import json
+import logging
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# --- Shared HTTP client for talking to the coach backend ---
+# One instance per Streamlit server (app.py caches it with st.cache_resource),
+# so every rerun and every session reuses the same keep-alive connections.
+# - timeouts on every call: (connect, read)
+# - retries with jittered exponential backoff, only for idempotent calls
+#   (asking for a goal can safely be repeated; reporting a completion can't)
+# - a circuit breaker: after several failures in a row we fail fast for a
+#   while instead of making every user wait for the full timeout
+# - per-call latency logged under "frontend.backend"
+# - with a user secret (the backend's COACH_USER_SECRET), each call carries
+#   the user's X-User-Token
+
+logger = logging.getLogger("frontend.backend")
+
+RETRY_STATUS = {502, 503, 504}
+
+
+class BackendUnavailable(Exception):
+    """Raised instead of calling the backend while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_after: float = 15.0):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            # Half-open: after the cool-down, let a trial call through
+            return time.monotonic() - self._opened_at >= self.reset_after
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class BackendClient:
+    def __init__(
+        self,
+        base_url: str,
+        connect_timeout: float = 3.05,
+        read_timeout: float = 30.0,
+        retries: int = 2,
+        backoff: float = 0.3,
+        pool_size: int = 16,
+        user_secret: str = "",
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.user_secret = user_secret
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = CircuitBreaker()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    # --- coach API ---
+
+    def submit_habit(self, user_id: str, habit: str) -> dict:
+        return self._post("/v1/habit", {"user_id": user_id, "habit": habit}, idempotent=True).json()
+
+    def stream_habit(self, user_id: str, habit: str):
+        """
+        Yields (event, data) pairs from the backend's SSE stream:
+        ("chunk", {"text"}) pieces, then ("reply", CoachReply) or ("error", {"detail"}).
+        """
+        started = time.perf_counter()
+        response = self._post("/v1/habit/stream", {"user_id": user_id, "habit": habit}, idempotent=True, stream=True)
+        with response:
+            first = True
+            for event, data in iter_sse(response):
+                if first:
+                    logger.info(f"POST /v1/habit/stream first event after {1000 * (time.perf_counter() - started):.0f}ms")
+                    first = False
+                yield event, data
+        logger.info(f"POST /v1/habit/stream finished in {1000 * (time.perf_counter() - started):.0f}ms")
+
+    def history(self, user_id: str, before: int = None, limit: int = 20) -> dict:
+        """A page of the user's persisted goals/reports: {"messages": [...], "has_more": bool}."""
+        params = {"user_id": user_id, "limit": limit}
+        if before is not None:
+            params["before"] = before
+        return self._request("GET", "/v1/history", idempotent=True, params=params, headers=self._auth(user_id)).json()
+
+    def report(self, user_id: str, completed: bool, habit: str, goal_id: str) -> dict:
+        payload = {"user_id": user_id, "completed": completed, "habit": habit, "goal_id": goal_id}
+        # Not idempotent: a retried completion would count twice
+        return self._post("/v1/report", payload, idempotent=False).json()
+
+    # --- internals ---
+
+    def _post(self, path: str, payload: dict, idempotent: bool, stream: bool = False) -> requests.Response:
+        return self._request("POST", path, idempotent, stream=stream, json=payload,
+                             headers=self._auth(payload["user_id"]))
+
+    def _auth(self, user_id: str) -> dict:
+        if not self.user_secret:
+            return {}
+        token = hmac.new(self.user_secret.encode(), user_id.encode(), hashlib.sha256).hexdigest()
+        return {"X-User-Token": token}
+
+    def _request(self, method: str, path: str, idempotent: bool, stream: bool = False, **kwargs) -> requests.Response:
+        if not self.breaker.allow():
+            raise BackendUnavailable(f"Backend marked down, not calling {path}")
+
+        attempts = 1 + (self.retries if idempotent else 0)
+        for attempt in range(attempts):
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, self.base_url + path, timeout=self.timeout, stream=stream, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self.breaker.record_failure()
+                logger.warning(f"{method} {path} failed after {1000 * (time.perf_counter() - started):.0f}ms: {e}")
+                if attempt + 1 == attempts:
+                    raise
+            else:
+                logger.info(f"{method} {path} -> {response.status_code} in {1000 * (time.perf_counter() - started):.0f}ms")
+                if response.status_code not in RETRY_STATUS:
+                    self.breaker.record_success()
+                    response.raise_for_status()
+                    return response
+                self.breaker.record_failure()
+                if attempt + 1 == attempts:
+                    response.raise_for_status()
+                response.close()
+            # Full jitter: spread retries out so a recovering backend isn't hit all at once
+            time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+
+
+def iter_sse(response):
+    """
+    Yields (event, data) pairs from a streaming Server-Sent Events response.
+    """
+    event, data_lines = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].strip())
+        elif not line and data_lines:
+            try:
+                yield event, json.loads("\n".join(data_lines))
+            except json.JSONDecodeError:
+                logger.warning(f"Backend sent non-JSON stream data: {data_lines}")
+            event, data_lines = "message", []
@@ -2,35 +2,351 @@
 
 import threading
 import asyncio
-from fastapi import FastAPI
-from uagents import Bureau
-# Make sure this import path is correct for your AgentOS agent
-# It should point to the file that defines and exposes your agent for the Bureau
-from agents.coach_agent_os import agent # Assuming 'agent' is the instance you want to add
+import hashlib
+import hmac
+import json
+import logging
+import os
+import time
+from datetime import date
+from utils.startup import StartupProfile
+
+# Cold-start timings (imports, recovery, client warm-up, first request), served on /ready
+startup_profile = StartupProfile()
+
+with startup_profile.step("import fastapi"):
+    from fastapi import FastAPI, Body, Header, HTTPException, Request
+    from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
+    from pydantic.v1 import ValidationError
+with startup_profile.step("import uagents"):
+    from uagents import Bureau
+with startup_profile.step("import coach agent"):
+    # Make sure this import path is correct for your AgentOS agent
+    # It should point to the file that defines and exposes your agent for the Bureau
+    from agents.coach_agent_os import get_agent, get_model # The agent/Gemini client are built on first use
+    from agents.coach_agent_os import state_store, journal, planner, analytics, chat_history, deadlines
+    from agents.bulk import BulkError, BulkImporter, export_records, import_stream
+    from agents.coach_agent_os import handle_habit_input, handle_user_report, handle_habit_input_batch
+    from agents.coach_agent_os import handle_streak_expiry_batch, handle_reminder_batch
+    from agents.schemas import HabitInput, UserReport, HabitInputBatch, StreakExpiryBatch
+    import agents.tracker_agent as tracker
+    from agents.gateway import Gateway, GatewayTimeout
+    from utils.metrics import REGISTRY, CallbackMetric, Gauge, Histogram, watch_loop_lag
+    from utils.hash_ring import HashRing
+
+logger = logging.getLogger("coach.main")
 
 app = FastAPI()
 
-# Instantiate the Bureau
-bureau = Bureau()
+# Under cluster.py every worker process runs this app; only one of them
+# (COACH_RUN_BUREAU=1) hosts the uAgents Bureau, the rest serve HTTP only.
+WORKER_ID = os.getenv("COACH_WORKER_ID", "0")
+WORKER_COUNT = int(os.getenv("COACH_WORKER_COUNT", "1"))
+RUN_BUREAU = os.getenv("COACH_RUN_BUREAU", "1") != "0"
+# The Bureau's own envelope endpoint (POST /submit), separate from this app's port
+BUREAU_PORT = int(os.getenv("COACH_BUREAU_PORT", "8000"))
+
+# /admin/* requires this in an X-Admin-Token header (unset = no check, local dev only)
+ADMIN_TOKEN = os.getenv("COACH_ADMIN_TOKEN", "")
+# /v1/* requires user_token(user_id) in an X-User-Token header, so a client can
+# only act on (and read) its own user's data (unset = no check, local dev only)
+USER_SECRET = os.getenv("COACH_USER_SECRET", "")
+
+# /v1/habit/batch: larger batches get 413, and a batch may take longer than one request
+BATCH_MAX_ITEMS = int(os.getenv("COACH_BATCH_MAX_ITEMS", "500"))
+BATCH_TIMEOUT = float(os.getenv("COACH_BATCH_TIMEOUT", "120"))
+
+def owned_by_this_worker():
+    """user_id -> bool for background jobs that must touch only this worker's users (None = all)."""
+    if WORKER_COUNT <= 1:
+        return None
+    # Same ring as cluster.py's router
+    ring = HashRing([f"worker-{i}" for i in range(WORKER_COUNT)])
+    me = f"worker-{WORKER_ID}"
+    return lambda user_id: ring.node_for(user_id) == me
+
+# Instantiate the Bureau (the agent is added on startup, only if this process runs it)
+bureau = Bureau(port=BUREAU_PORT)
+
+# HTTP -> coach protocol, in-process: each request awaits its own reply future
+gateway = Gateway()
 
-# Add your AgentOS agent instance to the Bureau
-bureau.add(agent)
+# Event-loop health: how late the loop wakes up a sleeping task
+LOOP_LAG_SECONDS = Histogram("event_loop_lag_seconds", "Event-loop scheduling delay",
+                             buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+LOOP_LAG_LAST = Gauge("event_loop_lag_last_seconds", "Most recent event-loop scheduling delay")
+CallbackMetric("gateway_pending_requests", "HTTP requests waiting for a coach reply", lambda: gateway.pending)
+
+# Which handler serves which single-user message type (also used by the legacy /submit route)
+HANDLERS = {
+    "HabitInput": (HabitInput, handle_habit_input),
+    "UserReport": (UserReport, handle_user_report),
+}
+
+async def deliver_timer_batch(batch):
+    # Fired reminders/streak expiries go into the coach protocol like any other message
+    handler = handle_streak_expiry_batch if isinstance(batch, StreakExpiryBatch) else handle_reminder_batch
+    await gateway.request(handler, batch)
+
+# --- Running the Bureau inside FastAPI's event loop ---
+# uagents 0.14.0 only has the blocking Bureau.run(), and Agent.setup() calls
+# loop.run_until_complete(), which can't be used on the loop uvicorn is
+# already running. run_bureau() does the same steps as awaitables instead.
+async def run_bureau():
+    loop = asyncio.get_running_loop()
+    try:
+        bureau._loop = loop
+        with startup_profile.step("build agent"):
+            agent = get_agent()
+        bureau.add(agent)  # Add your AgentOS agent instance to the Bureau
+        # Agent.setup(), minus the blocking run_until_complete()
+        agent.include(agent._protocol)
+        agent.start_message_dispenser()
+        await agent._startup()
+        agent.start_message_receivers()
+        agent.start_interval_tasks()
+        bureau._server._loop = loop
+        await bureau._server.serve()
+    except (Exception, SystemExit) as e:
+        # uvicorn exits the process when it can't bind; keep the HTTP API up instead
+        logger.error(f"uAgents Bureau stopped: {e!r} (is port {BUREAU_PORT} free? see COACH_BUREAU_PORT)")
 
-# --- CORRECTED WAY to integrate Bureau with FastAPI's event loop ---
-# We use FastAPI's @app.on_event("startup") to ensure the Bureau starts
-# within the existing event loop managed by FastAPI/Uvicorn.
 @app.on_event("startup")
 async def startup_event():
-    # Start the bureau in the background using asyncio.create_task
-    # This ensures it runs concurrently without blocking the FastAPI startup
-    asyncio.create_task(bureau.run_async()) # ✅ Corrected: Call run_async and create a task
+    # Reload everyone's streaks/goals from the last snapshot + event log
+    # before the agent starts handling messages.
+    with startup_profile.step("recover state"):
+        journal.recover()
+    asyncio.create_task(journal.run_snapshots())
+    with startup_profile.step("load analytics"):
+        analytics.load()
+    asyncio.create_task(analytics.run_flusher())
+    asyncio.create_task(watch_loop_lag(LOOP_LAG_SECONDS, LOOP_LAG_LAST))
+
+    # Streak expiry + reminders for the users this worker serves
+    with startup_profile.step("arm timers"):
+        deadlines.load(tracker.histories, owned_by_this_worker())
+    asyncio.create_task(deadlines.run(deliver_timer_batch))
+
+    # Pre-generate returning users' next goals during quiet periods
+    asyncio.create_task(planner.run(owned_by_this_worker()))
+
+    # HTTP is served from here on; /ready flips once the Gemini client is loaded
+    asyncio.create_task(warm_up())
+
+    # The Bureau goes last, in the background: nothing above waits on it, and
+    # if it can't start the HTTP API keeps working
+    if RUN_BUREAU:
+        asyncio.create_task(run_bureau())
+
+async def warm_up():
+    try:
+        with startup_profile.step("load gemini client"):
+            await asyncio.to_thread(get_model)
+    except Exception as e:
+        # Fast-path and cached answers still work; LLM calls will report the error
+        logger.error(f"Could not load the Gemini client: {e}")
+    startup_profile.mark_ready()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Leave a fresh snapshot behind so the next start replays almost nothing
+    await journal.snapshot()
+    journal.close()
+    await asyncio.to_thread(analytics.persist, True)
 
 @app.get("/health")
 async def health():
     """
     Simple health check endpoint for the FastAPI application.
     """
-    return {"status": "ok"}
+    return {"status": "ok", "worker": WORKER_ID}
+
+@app.get("/ready")
+async def ready():
+    """
+    Readiness, separate from liveness (/health): 503 until state is recovered and
+    the Gemini client is loaded. Either way the body carries the startup profile.
+    """
+    body = {"ready": startup_profile.ready, "worker": WORKER_ID, **startup_profile.report()}
+    return JSONResponse(body, status_code=200 if startup_profile.ready else 503)
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus text format: handler timings, LLM latency/tokens, cache, queue depth, loop lag, store size.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+def _check_admin(token: str) -> None:
+    if ADMIN_TOKEN and not hmac.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+def user_token(user_id: str) -> str:
+    """The X-User-Token for user_id: HMAC-SHA256 of it under COACH_USER_SECRET."""
+    return hmac.new(USER_SECRET.encode(), user_id.encode(), hashlib.sha256).hexdigest()
+
+def _check_user(user_id: str, token: str) -> None:
+    if USER_SECRET and not hmac.compare_digest(token, user_token(user_id)):
+        raise HTTPException(status_code=403, detail="Invalid user token")
+
+# Admin analytics: query name -> (ReportAnalytics method, allowed query parameters)
+ANALYTICS_QUERIES = {
+    "completion": (analytics.completion_by_category, ("start_day", "end_day")),
+    "streaks": (analytics.streak_distribution, ()),
+    "dau": (analytics.daily_active_users, ("days",)),
+    "missed_goals": (analytics.missed_goals, ("top", "min_reports")),
+    "retention": (analytics.cohort_retention, ("weeks",)),
+}
+
+@app.get("/admin/analytics/{query}")
+async def admin_analytics(query: str, request: Request, x_admin_token: str = Header("")):
+    """
+    Aggregations over this worker's report history:
+      completion (?start_day=&end_day= as ISO dates), streaks, dau (?days=30),
+      missed_goals (?top=10&min_reports=1), retention (?weeks=8)
+    """
+    _check_admin(x_admin_token)
+    if query not in ANALYTICS_QUERIES:
+        raise HTTPException(status_code=404, detail=f"Unknown analytics query '{query}'")
+    method, allowed = ANALYTICS_QUERIES[query]
+    kwargs = {}
+    for name, value in request.query_params.items():
+        if name not in allowed:
+            raise HTTPException(status_code=400, detail=f"'{query}' takes {list(allowed) or 'no parameters'}")
+        try:
+            kwargs[name] = date.fromisoformat(value).toordinal() if name.endswith("_day") else int(value)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Bad value for {name}: '{value}'")
+    started = time.perf_counter()
+    # Scans run in a thread so the event loop keeps serving coach traffic
+    try:
+        result = await asyncio.to_thread(method, **kwargs)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"query": query, "worker": WORKER_ID, "rows": len(analytics),
+            "ms": round((time.perf_counter() - started) * 1000, 1), "result": result}
+
+@app.get("/admin/bulk/export")
+async def bulk_export(x_admin_token: str = Header("")):
+    """
+    Every user's record and report days on this worker, as NDJSON (format in agents/bulk.py).
+    """
+    _check_admin(x_admin_token)
+    lines = (json.dumps(record, ensure_ascii=False) + "\n" for record in export_records(state_store))
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+@app.post("/admin/bulk/import")
+async def bulk_import(request: Request, mode: str = "import", x_admin_token: str = Header("")):
+    """
+    Streams an NDJSON body (format in agents/bulk.py) into this worker's state,
+    in batched transactions. mode=replay recomputes streaks from the reports.
+    A bad record fails with 400 and `committed`: the bytes already imported,
+    so the client can fix the line and send the rest.
+    """
+    _check_admin(x_admin_token)
+    try:
+        importer = BulkImporter(state_store, journal, mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        return await import_stream(request.stream(), importer)
+    except BulkError as e:
+        return JSONResponse({"detail": str(e), "committed": e.committed, **importer.stats()}, status_code=400)
+    finally:
+        # Imported report days move users' streak-expiry and reminder deadlines too
+        deadlines.load(tracker.histories, owned_by_this_worker())
+
+def _parse(model, body: dict):
+    try:
+        return model.parse_obj(body)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors())
+
+async def _dispatch(message_type: str, body: dict, user_token: str) -> dict:
+    if message_type not in HANDLERS:
+        raise HTTPException(status_code=400, detail=f"Unknown message type '{message_type}'")
+    model, handler = HANDLERS[message_type]
+    msg = _parse(model, body)
+    _check_user(msg.user_id, user_token)
+    return await _request(message_type, handler, msg)
+
+async def _request(message_type: str, handler, msg, timeout: float = None) -> dict:
+    started = time.perf_counter()
+    try:
+        reply = await gateway.request(handler, msg, timeout)
+    except GatewayTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    if startup_profile.first_request is None:
+        startup_profile.mark_first_request(message_type, time.perf_counter() - started)
+    return reply.dict()
+
+@app.post("/v1/habit")
+async def submit_habit(body: dict = Body(...), x_user_token: str = Header("")):
+    """
+    HabitInput in, CoachReply out: {"user_id": ..., "habit": ...} -> {"text": ..., "streak": ...}
+    """
+    return await _dispatch("HabitInput", body, x_user_token)
+
+@app.post("/v1/report")
+async def submit_report(body: dict = Body(...), x_user_token: str = Header("")):
+    """
+    UserReport in, CoachReply out.
+    """
+    return await _dispatch("UserReport", body, x_user_token)
+
+@app.post("/v1/habit/stream")
+async def stream_habit(body: dict = Body(...), x_user_token: str = Header("")):
+    """
+    HabitInput in, Server-Sent Events out:
+      event: chunk  data: {"text": "<next piece of the goal>"}   (zero or more)
+      event: reply  data: {"text": <full goal>, "streak": <n>}    (final CoachReply)
+      event: error  data: {"detail": "..."}                       (instead of reply)
+    """
+    msg = _parse(HabitInput, body)
+    _check_user(msg.user_id, x_user_token)
+
+    async def events():
+        try:
+            async for kind, payload in gateway.stream(handle_habit_input, msg):
+                data = {"text": payload} if kind == "chunk" else payload.dict()
+                yield f"event: {kind}\ndata: {json.dumps(data)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/v1/history")
+async def history(user_id: str, before: int = None, limit: int = 20, x_user_token: str = Header("")):
+    """
+    A page of the user's recent goals/reports, oldest first:
+    {"messages": [{"id", "kind": "goal"|"report", ...}], "has_more": bool}.
+    Pass the first message's id as `before` to get the page before it.
+    """
+    _check_user(user_id, x_user_token)
+    return chat_history.page(user_id, before, max(1, min(limit, 100)))
+
+@app.post("/v1/habit/batch")
+async def submit_habit_batch(body: dict = Body(...), x_admin_token: str = Header("")):
+    """
+    HabitInputBatch in, CoachReplyBatch out. It acts for many users at once,
+    so it takes the admin token rather than a user's, and at most
+    BATCH_MAX_ITEMS items (413 beyond that).
+    """
+    _check_admin(x_admin_token)
+    msg = _parse(HabitInputBatch, body)
+    if len(msg.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_ITEMS} items per batch")
+    return await _request("HabitInputBatch", handle_habit_input_batch, msg, BATCH_TIMEOUT)
+
+@app.post("/submit")
+async def submit(payload: dict = Body(...), x_user_token: str = Header("")):
+    """
+    Legacy envelope used by the Streamlit frontend:
+    {"to": <agent address>, "body": {"type": "HabitInput" | "UserReport", ...fields}}
+    """
+    body = dict(payload.get("body") or {})
+    return await _dispatch(body.pop("type", ""), body, x_user_token)
 
 # To run this file:
 # Make sure your virtual environment is activated: venv\Scripts\activate
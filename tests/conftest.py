@@ -0,0 +1,66 @@
+# tests/conftest.py
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Importing agents.coach_agent_os builds its module-level journal and analytics:
+# keep them off disk. Tests that need them build their own.
+os.environ.setdefault("COACH_EVENT_LOG", "0")
+os.environ.setdefault("COACH_ANALYTICS", "0")
+
+import agents.tracker_agent as tracker
+from agents.chat_history import ChatHistory
+from agents.persistence import Journal
+from agents.state_store import StateStore
+from utils.db import MemoryBackend
+
+
+@pytest.fixture(autouse=True)
+def histories():
+    # The tracker keeps every user's calendar in one module-level dict
+    tracker.histories.clear()
+    yield tracker.histories
+    tracker.histories.clear()
+
+
+@pytest.fixture
+def store():
+    return StateStore(MemoryBackend())
+
+
+class Journals:
+    """Journals on one test's data dir: `open(store)`, and `restart()` to recover from it."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.opened = []
+
+    def open(self, state_store: StateStore) -> Journal:
+        journal = Journal(state_store, self.directory, enabled=True, history=ChatHistory())
+        self.opened.append(journal)
+        return journal
+
+    def restart(self):
+        """Closes every journal, forgets what's in memory and recovers a fresh store from disk."""
+        self.close()
+        tracker.histories.clear()
+        state_store = StateStore(MemoryBackend())
+        journal = self.open(state_store)
+        journal.recover()
+        return state_store, journal
+
+    def close(self) -> None:
+        for journal in self.opened:
+            journal.close()
+        self.opened.clear()
+
+
+@pytest.fixture
+def journals(tmp_path):
+    journals = Journals(str(tmp_path / "journal"))
+    yield journals
+    journals.close()
@@ -0,0 +1,108 @@
+# tests/test_backend_client.py
+
+import hashlib
+import hmac
+import json
+import os
+import sys
+
+import pytest
+import requests
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "frontend"))
+
+import backend_client
+from backend_client import BackendClient, BackendUnavailable, CircuitBreaker, iter_sse
+
+
+def response(status, body=b"{}"):
+    resp = requests.Response()
+    resp.status_code = status
+    resp._content = body if isinstance(body, bytes) else json.dumps(body).encode()
+    resp._content_consumed = True
+    return resp
+
+
+class Session:
+    """Stands in for requests.Session: hands out queued responses (or raises queued errors)."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, url, kwargs))
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(backend_client.time, "sleep", lambda seconds: None)
+    return BackendClient("http://backend/", retries=2)
+
+
+def test_idempotent_calls_retry_on_5xx_and_connection_errors(client):
+    client.session = Session(response(503), requests.exceptions.ConnectionError("reset"),
+                             response(200, {"text": "Walk", "streak": 0}))
+    assert client.submit_habit("alice", "I drive") == {"text": "Walk", "streak": 0}
+    assert len(client.session.calls) == 3
+    assert client.session.calls[0][1] == "http://backend/v1/habit"
+
+
+def test_reports_are_never_retried(client):
+    client.session = Session(response(503), response(200))
+    with pytest.raises(requests.exceptions.HTTPError):
+        client.report("alice", True, "I drive", "g1")
+    assert len(client.session.calls) == 1
+
+
+def test_client_errors_are_not_retried(client):
+    client.session = Session(response(422), response(200))
+    with pytest.raises(requests.exceptions.HTTPError):
+        client.submit_habit("alice", "")
+    assert len(client.session.calls) == 1
+
+
+def test_breaker_opens_after_repeated_failures(client):
+    client.breaker = CircuitBreaker(failure_threshold=3, reset_after=60)
+    client.session = Session(*[response(503)] * 3)
+    with pytest.raises(requests.exceptions.HTTPError):
+        client.submit_habit("alice", "I drive")
+    with pytest.raises(BackendUnavailable):
+        client.submit_habit("alice", "I drive")
+    assert len(client.session.calls) == 3
+
+
+def test_breaker_lets_a_trial_call_through_after_the_cool_down(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(backend_client.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(failure_threshold=1, reset_after=15)
+    breaker.record_failure()
+    assert not breaker.allow()
+    now[0] += 15
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.allow()
+
+
+def test_history_sends_paging_params_and_the_user_token(client):
+    client.user_secret = "s3cret"
+    client.session = Session(response(200, {"messages": [], "has_more": False}))
+    client.history("alice", before=7, limit=5)
+    method, url, kwargs = client.session.calls[0]
+    assert (method, url, kwargs["params"]) == ("GET", "http://backend/v1/history",
+                                               {"user_id": "alice", "limit": 5, "before": 7})
+    expected = hmac.new(b"s3cret", b"alice", hashlib.sha256).hexdigest()
+    assert kwargs["headers"] == {"X-User-Token": expected}
+
+
+def test_iter_sse_parses_events_and_skips_bad_data():
+    class Stream:
+        def iter_lines(self, decode_unicode):
+            yield from ["event: chunk", 'data: {"text": "Wal"}', "", "event: chunk", "data: nope", "",
+                        "event: reply", 'data: {"text": "Walk", "streak": 1}', ""]
+
+    assert list(iter_sse(Stream())) == [("chunk", {"text": "Wal"}), ("reply", {"text": "Walk", "streak": 1})]
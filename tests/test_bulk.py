@@ -0,0 +1,133 @@
+# tests/test_bulk.py
+
+import asyncio
+from datetime import date
+
+import pytest
+
+import agents.tracker_agent as tracker
+from agents.bulk import BulkError, BulkImporter, export_file, export_records, import_file, import_stream
+from agents.engine import CoachEngine, TemplateGoals
+from agents.state_store import UserState
+
+DAY = date(2026, 10, 1).toordinal()
+
+
+def user_records(user_id, streak, days, carry=0):
+    """A user record followed by their report days (True = completed); carry=None leaves it out."""
+    record = {"type": "user", "user_id": user_id, "streak": streak, "current_goal": "Walk to work",
+              "habit": "I drive to work", "planned_goal": ""}
+    if carry is not None:
+        record["carry"] = carry
+    yield record
+    for offset, completed in enumerate(days):
+        yield {"type": "report", "user_id": user_id,
+               "day": date.fromordinal(DAY + offset).isoformat(), "completed": completed}
+
+
+def write(tmp_path, name, records):
+    return export_file(records, str(tmp_path / name))[0]
+
+
+@pytest.mark.parametrize("mode", ["import", "replay"])
+def test_streaks_survive_recovery(tmp_path, store, journals, mode):
+    path = write(tmp_path, "users.ndjson", [
+        *user_records("alice", 3, [True, True, True]),
+        *user_records("bob", 7, [True, False, True, True]),
+    ])
+    journal = journals.open(store)
+    import_file(path, BulkImporter(store, journal, mode))
+    before = {user_id: (history.streak, history.best_streak) for user_id, history in tracker.histories.items()}
+    records = dict(store.items())
+
+    recovered, _ = journals.restart()
+
+    assert before == {"alice": (3, 3), "bob": (2, 2)}
+    assert {user_id: (history.streak, history.best_streak)
+            for user_id, history in tracker.histories.items()} == before
+    assert dict(recovered.items()) == records
+
+
+def test_import_keeps_stored_streak_and_replay_recomputes_it(tmp_path, store, journals):
+    path = write(tmp_path, "users.ndjson", user_records("alice", 9, [True, True]))
+    import_file(path, BulkImporter(store, journals.open(store), "import"), resume=False)
+    assert store.get("alice").streak == 9
+
+    tracker.histories.clear()
+    import_file(path, BulkImporter(store, journals.open(store), "replay"), resume=False)
+    assert store.get("alice").streak == 2
+
+
+def test_export_import_round_trip(tmp_path, store, journals):
+    journal = journals.open(store)
+    store.save("alice", UserState(0, "Bike today", "I drive", ""))
+    for offset, completed in enumerate([True, True, False, True, True]):
+        tracker.log_habit(completed, "alice", DAY + offset)
+    tracker.log_habit(False, "carol", DAY)  # reports without a stored record
+    exported = list(export_records(store))
+    original = {user_id: (h.first_day, h.last_day, h.streak, h.completions_between(DAY, DAY + 10))
+                for user_id, h in tracker.histories.items()}
+
+    tracker.histories.clear()
+    other = type(store)(type(store.backend)())
+    import_file(write(tmp_path, "export.ndjson.gz", exported), BulkImporter(other, journal, "replay"))
+
+    assert {user_id: (h.streak, h.completions_between(DAY, DAY + 10))
+            for user_id, h in tracker.histories.items()} == \
+           {user_id: values[2:] for user_id, values in original.items()}
+    assert other.get("alice").current_goal == "Bike today"
+    assert other.get("alice").streak == 2
+
+
+@pytest.mark.parametrize("mode", ["import", "replay"])
+def test_round_trip_keeps_carried_streak(tmp_path, store, journals, mode):
+    engine = CoachEngine(store, TemplateGoals(), fast_path=False)
+    store.save("alice", UserState(10, "Bike today", "I drive", ""))  # migrated, no calendar yet
+    today = tracker.today()
+    asyncio.run(engine.report("alice", True, day=today - 1))
+    asyncio.run(engine.report("alice", True, day=today))
+    assert engine.streak("alice") == 12
+    exported = list(export_records(store))
+
+    tracker.histories.clear()
+    other = type(store)(type(store.backend)())
+    import_file(write(tmp_path, "export.ndjson", exported), BulkImporter(other, journals.open(other), mode))
+
+    assert CoachEngine(other, TemplateGoals(), fast_path=False).streak("alice") == 12
+    assert other.get("alice").streak == 12
+
+
+def test_import_carries_stored_streak_into_reports(tmp_path, store, journals):
+    path = write(tmp_path, "users.ndjson", user_records("alice", 5, [True, True], carry=None))
+    import_file(path, BulkImporter(store, journals.open(store), "import"))
+    assert tracker.histories["alice"].streak == 7
+
+    recovered, _ = journals.restart()
+    assert tracker.histories["alice"].streak == 7
+
+
+def test_resume_after_bad_record(tmp_path, store, journals):
+    path = tmp_path / "users.ndjson"
+    path.write_text('{"type":"user","user_id":"alice","streak":1}\n{"type":"nope","user_id":"bob"}\n')
+    importer = BulkImporter(store, journals.open(store), batch_size=1)
+    with pytest.raises(BulkError) as raised:
+        import_file(str(path), importer)
+    assert store.get("alice").streak == 1
+    assert raised.value.committed == len(path.read_text().splitlines()[0]) + 1
+
+    path.write_text(path.read_text().replace('"nope"', '"user"'))
+    checkpoint = import_file(str(path), BulkImporter(store, journals.open(store)))
+    assert checkpoint["done"] and checkpoint["users"] == 2
+
+
+def test_import_stream_splits_chunks(store, journals):
+    body = b'{"type":"user","user_id":"alice","streak":4}\n{"type":"report","user_id":"al'
+    rest = b'ice","day":"2026-10-01","completed":true}\n'
+
+    async def chunks():
+        yield body
+        yield rest
+
+    stats = asyncio.run(import_stream(chunks(), BulkImporter(store, journals.open(store))))
+    assert (stats["users"], stats["reports"]) == (1, 1)
+    assert tracker.histories["alice"].last_day == DAY
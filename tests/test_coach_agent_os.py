@@ -0,0 +1,85 @@
+# tests/test_coach_agent_os.py
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import agents.coach_agent_os as coach
+from agents.gateway import Gateway
+from agents.llm_pool import LLMPool
+from agents.providers import ProviderRouter
+from agents.response_cache import ResponseCache
+from agents.schemas import HabitInput, HabitInputBatch
+from agents.scheduler import Scheduler
+from agents.single_flight import SingleFlight
+from test_providers import FakeProvider
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    """A slow fake model behind fresh cache / single-flight / scheduler state."""
+    model = FakeProvider("fake", delay=0.2)
+    monkeypatch.setattr(coach, "providers", ProviderRouter([model], budget=5, hedge=False))
+    monkeypatch.setattr(coach, "goal_cache", ResponseCache(variant_fill_rate=0))
+    monkeypatch.setattr(coach, "llm_flight", SingleFlight())
+    monkeypatch.setattr(coach, "scheduler", Scheduler(slots=2, max_pending=4, max_pending_per_user=1))
+    return model
+
+
+def test_a_burst_on_one_habit_shares_one_call_without_taking_slots(llm):
+    async def burst():
+        goals = coach.LLMGoals()
+        return await asyncio.gather(*(goals.generate(f"user-{i}", "I compost my kitchen scraps", 0)
+                                      for i in range(300)))
+
+    replies = asyncio.run(burst())
+
+    assert replies == ["fake goal"] * 300
+    assert llm.calls == 1
+    assert (coach.llm_flight.issued, coach.llm_flight.coalesced) == (1, 299)
+    assert (coach.scheduler.admitted, coach.scheduler.shed) == (1, 0)
+
+
+def test_a_caller_that_waited_for_a_slot_rechecks_the_cache(llm):
+    async def run():
+        goals = coach.LLMGoals()
+        for _ in range(coach.scheduler.slots):
+            await coach.scheduler.acquire("hog")
+        waiting = asyncio.create_task(goals.generate("alice", "I leave the heating on", 0))
+        await asyncio.sleep(0)
+        coach.goal_cache.put("I leave the heating on", 0, "Turn it down one degree")
+        coach.scheduler.release()
+        return await waiting
+
+    assert asyncio.run(run()) == "Turn it down one degree"
+    assert llm.calls == 0
+
+
+class UnparseableModel:
+    """Answers every prompt with plain text: batch replies never parse as JSON."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate_content(self, prompt, **kwargs):
+        self.calls += 1
+        time.sleep(0.005)
+        return SimpleNamespace(text="Walk one short trip today.", usage_metadata=None)
+
+
+def test_batch_fallback_stays_within_the_llm_pool(monkeypatch):
+    model = UnparseableModel()
+    pool = LLMPool(max_concurrency=2, max_queue=2)
+    monkeypatch.setattr(coach, "get_model", lambda name=None: model)
+    monkeypatch.setattr(coach, "llm_pool", pool)
+    monkeypatch.setattr(coach, "goal_cache", ResponseCache(variant_fill_rate=0))
+    monkeypatch.setattr(coach.engine, "fast_path", False)
+    batch = HabitInputBatch(items=[HabitInput(user_id=f"batch-{i}", habit=f"habit number {i}") for i in range(100)])
+
+    reply = asyncio.run(Gateway().request(coach.handle_habit_input_batch, batch))
+
+    assert [item.text for item in reply.replies] == ["Walk one short trip today."] * 100
+    assert pool.rejected == 0
+    assert model.calls == 5 + 100                 # one prompt per chunk of 20, then one per item
@@ -0,0 +1,31 @@
+# tests/test_engine.py
+
+import asyncio
+from datetime import date
+
+from agents.analytics import ReportAnalytics
+from agents.engine import CoachEngine, TemplateGoals
+
+DAY = date(2026, 10, 1).toordinal()
+
+
+def test_expired_days_stay_out_of_analytics(store, tmp_path):
+    analytics = ReportAnalytics(str(tmp_path / "analytics"), enabled=True)
+    engine = CoachEngine(store, TemplateGoals(), analytics=analytics, fast_path=False)
+    asyncio.run(engine.report("alice", True, "I drive to work", day=DAY))
+
+    reply = asyncio.run(engine.expire("alice", DAY + 1))
+
+    assert (reply.source, reply.streak) == ("expired", 0)
+    assert len(analytics) == 1
+    assert analytics.daily_active_users(days=2, end_day=DAY + 1) == {"2026-10-01": 1, "2026-10-02": 0}
+    assert analytics.completion_by_category()["transport"]["reports"] == 1
+
+
+def test_expiry_is_skipped_once_the_day_was_reported(store):
+    engine = CoachEngine(store, TemplateGoals(), fast_path=False)
+    asyncio.run(engine.report("alice", True, day=DAY))
+    asyncio.run(engine.report("alice", True, day=DAY + 1))
+
+    assert asyncio.run(engine.expire("alice", DAY + 1)) is None
+    assert engine.state_store.get("alice").streak == 2
@@ -0,0 +1,50 @@
+# tests/test_gateway.py
+
+import asyncio
+
+import pytest
+
+from agents.gateway import Gateway, GatewayTimeout
+
+
+async def echo(ctx, sender, msg):
+    await ctx.send(sender, f"re: {msg}")
+
+
+def test_request_returns_the_handlers_reply():
+    async def main():
+        gateway = Gateway(timeout=1)
+        replies = await asyncio.gather(*(gateway.request(echo, n) for n in range(3)))
+        return replies, gateway.pending
+
+    assert asyncio.run(main()) == (["re: 0", "re: 1", "re: 2"], 0)
+
+
+def test_request_times_out_and_reraises_handler_errors():
+    async def silent(ctx, sender, msg):
+        await asyncio.sleep(1)
+
+    async def broken(ctx, sender, msg):
+        raise ValueError(msg)
+
+    async def main():
+        gateway = Gateway(timeout=1)
+        with pytest.raises(GatewayTimeout):
+            await gateway.request(silent, None, timeout=0.01)
+        with pytest.raises(ValueError):
+            await gateway.request(broken, "bad")
+
+    asyncio.run(main())
+
+
+def test_stream_yields_chunks_before_the_reply():
+    async def chatty(ctx, sender, msg):
+        assert ctx.wants_chunks(sender)
+        for word in msg.split():
+            await ctx.send_chunk(sender, word)
+        await ctx.send(sender, msg)
+
+    async def main():
+        return [item async for item in Gateway(timeout=1).stream(chatty, "walk to work")]
+
+    assert asyncio.run(main()) == [("chunk", "walk"), ("chunk", "to"), ("chunk", "work"), ("reply", "walk to work")]
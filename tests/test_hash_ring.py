@@ -0,0 +1,77 @@
+# tests/test_hash_ring.py
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from cluster import Cluster
+from utils.hash_ring import HashRing
+
+KEYS = [f"user-{i}" for i in range(20000)]
+
+
+def owners(ring):
+    return {key: ring.node_for(key) for key in KEYS}
+
+
+def test_keys_spread_evenly():
+    counts = {}
+    for node in owners(HashRing(["a", "b", "c", "d"])).values():
+        counts[node] = counts.get(node, 0) + 1
+    assert set(counts) == {"a", "b", "c", "d"}
+    assert all(0.15 < count / len(KEYS) < 0.35 for count in counts.values())
+
+
+def test_mapping_ignores_insertion_order_and_hash_seed():
+    ring = HashRing(["a", "b", "c"])
+    assert owners(HashRing(["c", "a", "b"])) == owners(ring)
+
+    # Another interpreter with a different PYTHONHASHSEED must agree
+    code = "from utils.hash_ring import HashRing; print(HashRing(['a', 'b', 'c']).node_for('user-42'))"
+    other = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                           env={"PYTHONHASHSEED": "12345"}, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert other.stdout.strip() == ring.node_for("user-42")
+
+
+def test_adding_a_node_only_moves_keys_to_it():
+    ring = HashRing(["a", "b", "c"])
+    before = owners(ring)
+    ring.add("d")
+    after = owners(ring)
+
+    moved = [key for key in KEYS if before[key] != after[key]]
+    assert all(after[key] == "d" for key in moved)
+    assert 0.15 < len(moved) / len(KEYS) < 0.35
+
+
+def test_removing_a_node_only_moves_its_keys():
+    ring = HashRing(["a", "b", "c", "d"])
+    before = owners(ring)
+    ring.remove("b")
+    after = owners(ring)
+
+    assert all(before[key] == "b" for key in KEYS if before[key] != after[key])
+    assert "b" not in after.values()
+    ring.remove("b")                      # unknown nodes are ignored
+    assert len(ring) == 3
+
+
+def test_adding_twice_is_a_no_op_and_an_empty_ring_has_no_owner():
+    ring = HashRing(["a"])
+    ring.add("a")
+    assert len(ring) == 1 and len(ring._points) == ring.replicas
+    ring.remove("a")
+    with pytest.raises(LookupError):
+        ring.node_for("user-1")
+
+
+def test_cluster_routes_by_the_ring_and_keeps_the_bureau_off_by_default():
+    cluster = Cluster(3, 4000)
+    assert [w.port for w in cluster.workers.values()] == [4001, 4002, 4003]
+    assert {w.env["COACH_RUN_BUREAU"] for w in cluster.workers.values()} == {"0"}
+    assert all(cluster.worker_for(key).name == cluster.ring.node_for(key) for key in KEYS[:100])
+
+    with_bureau = Cluster(3, 4000, bureau=True)
+    assert [w.env["COACH_RUN_BUREAU"] for w in with_bureau.workers.values()] == ["1", "0", "0"]
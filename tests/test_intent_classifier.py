@@ -0,0 +1,73 @@
+# tests/test_intent_classifier.py
+
+import pytest
+
+from agents.intent_classifier import (
+    DIRECT_PROMPTS, ONBOARDING_MESSAGE, SUGGESTED_HABITS, TAXONOMY, KeywordMatcher, classify, templated_reply,
+)
+
+
+@pytest.mark.parametrize("text, category", [
+    ("I drive to nearby places", "transport"),
+    ("Driving my car everywhere", "transport"),
+    ("I use plastic bags regularly", "plastics"),
+    ("I leave lights on unnecessarily", "energy"),
+    ("I keep the AC on all night", "energy"),
+    ("I buy bottled water daily", "water"),
+    ("I take long showers", "water"),
+])
+def test_known_habits_get_their_category(text, category):
+    intent = classify(text)
+    assert (intent.kind, intent.category) == ("habit", category)
+    assert templated_reply(intent) in TAXONOMY[category][1]
+
+
+def test_suggested_habits_are_all_known():
+    assert all(classify(habit).kind == "habit" for habit in SUGGESTED_HABITS)
+
+
+def test_direct_prompts_ignore_case_and_punctuation():
+    intent = classify("  Eco tip!! ")
+    assert intent.kind == "direct"
+    assert templated_reply(intent) == DIRECT_PROMPTS["eco tip"]
+
+
+@pytest.mark.parametrize("text", ["", "hi", "Hello there", "start my journey", "ok"])
+def test_greetings_and_short_input_get_onboarding(text):
+    intent = classify(text)
+    assert intent.kind == "greeting"
+    assert templated_reply(intent) == ONBOARDING_MESSAGE
+
+
+@pytest.mark.parametrize("text", ["I eat a lot of red meat every week", "I hike on weekends with friends"])
+def test_anything_else_is_novel(text):
+    intent = classify(text)
+    assert intent.kind == "novel"
+    assert templated_reply(intent) is None
+
+
+def test_matcher_counts_hits_at_word_starts_only():
+    matcher = KeywordMatcher([("driv", "transport"), ("car ", "transport"), ("shower", "water")])
+    assert matcher.labels("driving my car then a shower ") == {"transport": 2, "water": 1}
+    assert matcher.labels("scar overdriven ") == {}
+
+
+@pytest.mark.parametrize("text", [
+    "I eat a bagel every morning",
+    "We order tapas most evenings",
+    "I bought waterproof boots for hiking",
+    "I love strawberry smoothies at breakfast",
+    "Lightweight running shoes are my thing",
+])
+def test_words_that_only_start_like_a_keyword_are_not_habits(text):
+    assert classify(text).kind == "novel"
+
+
+@pytest.mark.parametrize("text, category", [
+    ("I carry my groceries in a bag", "plastics"),
+    ("I leave the tap running", "water"),
+    ("Watering the garden every day", "water"),
+    ("I fly to meetings", "transport"),
+])
+def test_whole_word_stems_still_match(text, category):
+    assert classify(text).category == category
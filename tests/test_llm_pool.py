@@ -0,0 +1,99 @@
+# tests/test_llm_pool.py
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from agents.llm_pool import LLMPool, PoolBusy
+
+
+def test_run_returns_the_result_off_the_event_loop():
+    pool = LLMPool(2, 2, timeout=5)
+
+    async def main():
+        return await pool.run(lambda a, b: (a + b, threading.current_thread().name), 1, b=2)
+
+    result, thread = asyncio.run(main())
+    assert result == 3 and thread.startswith("llm")
+    assert pool.stats()["completed"] == 1
+    pool.shutdown()
+
+
+def test_full_queue_rejects_with_pool_busy():
+    pool = LLMPool(1, 1, timeout=5)
+    release = threading.Event()
+
+    async def main():
+        running = asyncio.ensure_future(pool.run(release.wait))
+        queued = asyncio.ensure_future(pool.run(lambda: "queued"))
+        await asyncio.sleep(0.01)
+        with pytest.raises(PoolBusy):
+            await pool.run(lambda: "rejected")
+        release.set()
+        return await asyncio.gather(running, queued)
+
+    assert asyncio.run(main()) == [True, "queued"]
+    assert pool.rejected == 1 and pool.completed == 2
+    pool.shutdown()
+
+
+def test_timeout_keeps_the_slot_until_the_call_finishes():
+    pool = LLMPool(1, 4, timeout=5)
+    release = threading.Event()
+
+    async def main():
+        with pytest.raises(asyncio.TimeoutError):
+            await pool.run(release.wait, timeout=0.02)
+        # The thread is still busy, so the slot isn't back yet and a queued call times out too
+        assert pool.in_flight == 1
+        with pytest.raises(asyncio.TimeoutError):
+            await pool.run(lambda: "late", timeout=0.02)
+        release.set()
+        await asyncio.sleep(0.01)
+        return await pool.run(lambda: "after")
+
+    assert asyncio.run(main()) == "after"
+    assert pool.timed_out == 2 and pool.in_flight == 0
+    pool.shutdown()
+
+
+def test_errors_reach_the_caller():
+    pool = LLMPool(1, 0, timeout=5)
+
+    def fail():
+        raise RuntimeError("quota")
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            await pool.run(fail)
+        return await pool.run(lambda: "next")
+
+    assert asyncio.run(main()) == "next"
+    pool.shutdown()
+
+
+def test_stream_yields_chunks_and_stops_early():
+    pool = LLMPool(1, 0, timeout=5)
+    pulled = []
+
+    def chunks():
+        for n in range(100):
+            pulled.append(n)
+            time.sleep(0.001)
+            yield n
+
+    async def main():
+        received = []
+        async for chunk in pool.stream(chunks):
+            received.append(chunk)
+            if len(received) == 3:
+                break
+        await asyncio.sleep(0.05)
+        return received
+
+    assert asyncio.run(main()) == [0, 1, 2]
+    assert len(pulled) < 100
+    assert pool.in_flight == 0
+    pool.shutdown()
@@ -0,0 +1,107 @@
+# tests/test_main.py
+
+import asyncio
+import os
+
+import pytest
+
+os.environ.setdefault("COACH_RUN_BUREAU", "0")
+os.environ.setdefault("COACH_PLANNER", "0")
+
+import google.generativeai as genai
+from benchmarks.fake_gemini import FakeGenerativeModel
+
+genai.GenerativeModel = FakeGenerativeModel
+
+from fastapi.testclient import TestClient
+
+import main
+
+
+@pytest.fixture
+def client():
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def secret(monkeypatch):
+    monkeypatch.setattr(main, "USER_SECRET", "s3cret")
+    return "s3cret"
+
+
+def test_habit_and_report_reply_with_the_streak(client):
+    goal = client.post("/v1/habit", json={"user_id": "alice", "habit": "I drive to work"})
+    assert goal.status_code == 200 and goal.json()["text"]
+
+    report = client.post("/v1/report", json={"user_id": "alice", "completed": True,
+                                             "habit": "I drive to work", "goal_id": "g1"})
+    assert report.status_code == 200 and report.json()["streak"] == 1
+
+    page = client.get("/v1/history", params={"user_id": "alice"})
+    assert [message["kind"] for message in page.json()["messages"]][-2:] == ["goal", "report"]
+
+
+def test_bad_bodies_are_rejected(client):
+    assert client.post("/v1/habit", json={"user_id": "alice"}).status_code == 422
+    assert client.post("/submit", json={"body": {"type": "Nope"}}).status_code == 400
+
+
+def test_user_routes_require_the_users_token(client, secret):
+    body = {"user_id": "alice", "habit": "I drive to work"}
+    assert client.post("/v1/habit", json=body).status_code == 403
+    assert client.get("/v1/history", params={"user_id": "alice"}).status_code == 403
+    # Another user's token doesn't open alice's history
+    headers = {"X-User-Token": main.user_token("bob")}
+    assert client.get("/v1/history", params={"user_id": "alice"}, headers=headers).status_code == 403
+
+    headers = {"X-User-Token": main.user_token("alice")}
+    assert client.post("/v1/habit", json=body, headers=headers).status_code == 200
+    assert client.get("/v1/history", params={"user_id": "alice"}, headers=headers).status_code == 200
+    assert client.post("/submit", json={"body": {"type": "HabitInput", **body}}, headers=headers).status_code == 200
+
+
+def test_batch_is_size_limited_and_admin_only(client, monkeypatch):
+    items = [{"user_id": f"user-{n}", "habit": "I drive to work"} for n in range(3)]
+    monkeypatch.setattr(main, "BATCH_MAX_ITEMS", 2)
+    assert client.post("/v1/habit/batch", json={"items": items}).status_code == 413
+
+    monkeypatch.setattr(main, "BATCH_MAX_ITEMS", 3)
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "admin")
+    assert client.post("/v1/habit/batch", json={"items": items}).status_code == 403
+    reply = client.post("/v1/habit/batch", json={"items": items}, headers={"X-Admin-Token": "admin"})
+    assert [item["user_id"] for item in reply.json()["replies"]] == ["user-0", "user-1", "user-2"]
+
+
+def test_stream_sends_chunks_then_the_reply(client):
+    with client.stream("POST", "/v1/habit/stream", json={"user_id": "alice", "habit": "I drive to work"}) as response:
+        body = "".join(response.iter_text())
+    events = [block.split("\n")[0] for block in body.strip().split("\n\n")]
+    assert events[-1] == "event: reply"
+    assert set(events[:-1]) <= {"event: chunk"}
+
+
+def test_history_pages_backwards(client):
+    for n in range(5):
+        client.post("/v1/report", json={"user_id": "carol", "completed": True, "habit": "h", "goal_id": f"g{n}"})
+    first = client.get("/v1/history", params={"user_id": "carol", "limit": 3}).json()
+    older = client.get("/v1/history", params={"user_id": "carol", "limit": 3,
+                                              "before": first["messages"][0]["id"]}).json()
+    assert len(first["messages"]) == 3 and first["has_more"]
+    assert len(older["messages"]) == 2 and not older["has_more"]
+    assert older["messages"][-1]["id"] < first["messages"][0]["id"]
+
+
+def test_a_handler_that_never_replies_gets_504(client, monkeypatch):
+    async def silent(ctx, sender, msg):
+        await asyncio.sleep(1)
+
+    monkeypatch.setitem(main.HANDLERS, "HabitInput", (main.HabitInput, silent))
+    monkeypatch.setattr(main.gateway, "timeout", 0.05)
+    assert client.post("/v1/habit", json={"user_id": "alice", "habit": "x"}).status_code == 504
+
+
+def test_analytics_rejects_non_positive_arguments(client):
+    assert client.get("/admin/analytics/dau", params={"days": 0}).status_code == 400
+    assert client.get("/admin/analytics/retention", params={"weeks": -2}).status_code == 400
+    assert client.get("/admin/analytics/dau", params={"days": 7}).status_code == 200
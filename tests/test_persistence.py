@@ -0,0 +1,167 @@
+# tests/test_persistence.py
+
+import asyncio
+
+import agents.tracker_agent as tracker
+from agents.engine import CoachEngine, TemplateGoals
+from agents.state_store import StateStore, UserState
+from utils.db import EventLog, SQLiteBackend
+
+DAY = 740000
+
+
+def engine_for(store, journal):
+    return CoachEngine(store, TemplateGoals(), journal=journal, fast_path=False)
+
+
+def streaks():
+    return {user_id: (h.streak, h.best_streak, h.last_day) for user_id, h in tracker.histories.items()}
+
+
+def test_carried_streak_survives_a_same_day_correction(store, journals):
+    # An imported user with a stored streak but no calendar misses, then corrects the same day
+    store.save("alice", UserState(5))
+    engine = engine_for(store, journals.open(store))
+    asyncio.run(engine.report("alice", False, day=DAY))
+    reply = asyncio.run(engine.report("alice", True, day=DAY))
+    assert reply.streak == 6
+    before = streaks()
+
+    recovered, _ = journals.restart()
+
+    assert streaks() == before
+    assert recovered.get("alice").streak == 6
+
+
+def test_carry_is_only_journaled_for_a_first_tracked_day(store, journals):
+    store.save("alice", UserState(3))
+    journal = journals.open(store)
+    engine = engine_for(store, journal)
+    asyncio.run(engine.report("alice", True, day=DAY))
+    asyncio.run(engine.report("alice", True, day=DAY + 1))
+    journal.flush()
+    events = [event for event in journal.log.replay() if event["t"] == "r"]
+    assert [event.get("p") for event in events] == [3, None]
+
+
+def test_old_events_without_carry_still_replay(store, journals):
+    journal = journals.open(store)
+    journal.log.append({"t": "r", "u": "bob", "c": 1, "s": 4, "d": DAY})
+    journal.log.append({"t": "r", "u": "bob", "c": 1, "s": 5, "d": DAY + 1})
+
+    journals.restart()
+
+    assert streaks() == {"bob": (5, 5, DAY + 1)}
+
+
+# --- EventLog ---
+
+def test_event_log_replays_in_order_and_continues_its_seq(tmp_path):
+    log = EventLog(str(tmp_path))
+    assert [log.append({"t": "m", "u": "a", "m": str(i)}) for i in range(3)] == [1, 2, 3]
+    log.close()
+
+    log = EventLog(str(tmp_path))
+    assert log.append({"t": "m", "u": "a", "m": "3"}) == 4
+    log.close()
+    assert [event["m"] for event in EventLog(str(tmp_path)).replay()] == ["0", "1", "2", "3"]
+    assert [event["n"] for event in EventLog(str(tmp_path)).replay(after_seq=2)] == [3, 4]
+
+
+def test_event_log_drops_a_torn_tail(tmp_path):
+    log = EventLog(str(tmp_path))
+    log.append({"t": "m", "u": "a", "m": "kept"})
+    log.close()
+    segment = next(tmp_path.glob("events-*.log"))
+    with open(segment, "a", encoding="utf-8") as f:
+        f.write('{"t":"m","u":"a","m":"torn","n":2')   # crash mid-write
+
+    log = EventLog(str(tmp_path))
+    assert log.append({"t": "m", "u": "a", "m": "next"}) == 2
+    log.close()
+    assert [event["m"] for event in EventLog(str(tmp_path)).replay()] == ["kept", "next"]
+
+
+def test_snapshot_drops_the_segments_it_covers(tmp_path):
+    log = EventLog(str(tmp_path))
+    log.append({"t": "m", "u": "a", "m": "old"})
+    covered = log.start_snapshot()
+    log.append({"t": "m", "u": "a", "m": "new"})
+    log.write_snapshot(covered, {"marker": 1})
+    log.close()
+
+    log = EventLog(str(tmp_path))
+    assert log.load_snapshot() == (1, {"marker": 1})
+    assert [event["m"] for event in log.replay(after_seq=1)] == ["new"]
+    assert not (tmp_path / "events-000000000001.log").exists()
+    log.close()
+
+
+def test_a_corrupt_snapshot_falls_back_to_an_older_one(tmp_path):
+    log = EventLog(str(tmp_path))
+    log.append({"t": "m", "u": "a", "m": "x"})
+    log.write_snapshot(log.start_snapshot(), {"marker": 1})
+    log.close()
+    (tmp_path / "snapshot-000000000009.json").write_text('{"seq": 9, "sta')
+
+    assert EventLog(str(tmp_path)).load_snapshot() == (1, {"marker": 1})
+
+
+# --- Journal recovery ---
+
+def record_everything(store, journal):
+    engine = engine_for(store, journal)
+    asyncio.run(engine.store_goal("alice", "Walk to work", "I drive to work"))
+    asyncio.run(engine.report("alice", True, "I drive to work", day=DAY))
+    asyncio.run(engine.report("alice", True, "I drive to work", day=DAY + 1))
+    asyncio.run(engine.expire("bob", DAY))
+    journal.record_reminder("alice", "Check in!")
+    store.save("carol", UserState(7, "Bike", "I drive", "Bus"))
+    journal.record_user("carol", store.get("carol"))
+
+
+def recovered_view(store, journal):
+    return (streaks(), sorted(store.items()),
+            {user_id: journal.history.page(user_id)["messages"] for user_id in ("alice", "bob", "carol")})
+
+
+def test_recovery_from_the_log_alone(store, journals):
+    journal = journals.open(store)
+    record_everything(store, journal)
+    before = recovered_view(store, journal)
+
+    recovered, journal = journals.restart()
+
+    assert recovered_view(recovered, journal) == before
+    assert recovered.get("alice").to_record() == (2, "Walk to work", "I drive to work", "")
+    assert journal.history.page("bob")["messages"][0]["expired"] is True
+
+
+def test_recovery_from_a_snapshot_plus_the_log_tail(store, journals):
+    journal = journals.open(store)
+    engine = engine_for(store, journal)
+    asyncio.run(engine.report("alice", True, day=DAY))
+    asyncio.run(journal.snapshot())
+    record_everything(store, journal)
+    before = recovered_view(store, journal)
+
+    recovered, journal = journals.restart()
+
+    assert journal.log.load_snapshot()[0] == 1
+    assert recovered_view(recovered, journal) == before
+    assert tracker.histories["alice"].first_day == DAY
+
+
+def test_a_persistent_backend_keeps_its_own_records(tmp_path, journals):
+    store = StateStore(SQLiteBackend(str(tmp_path / "state.db")))
+    journal = journals.open(store)
+    engine = engine_for(store, journal)
+    asyncio.run(engine.report("alice", True, day=DAY))
+    store.save("alice", UserState(42, "edited elsewhere"))  # e.g. another worker
+    journals.close()
+
+    tracker.histories.clear()
+    journals.open(store).recover()
+
+    assert store.get("alice").streak == 42
+    assert tracker.histories["alice"].streak == 1
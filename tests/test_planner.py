@@ -0,0 +1,106 @@
+# tests/test_planner.py
+
+import asyncio
+
+import agents.tracker_agent as tracker
+from agents.planner import GoalPlanner, same_habit
+from agents.state_store import UserState
+
+NOVEL = "I eat a lot of red meat every week"
+
+
+class Generator:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    async def __call__(self, habit, streak):
+        self.calls.append((habit, streak))
+        await asyncio.sleep(0)
+        if self.fail:
+            raise RuntimeError("model down")
+        return f"goal for {habit}"
+
+
+def test_plans_only_novel_habits_of_active_users(store):
+    store.save("novel", UserState(2, habit=NOVEL))
+    store.save("template", UserState(1, habit="I drive to work"))
+    store.save("planned", UserState(1, habit=NOVEL, planned_goal="already"))
+    store.save("lapsed", UserState(1, habit=NOVEL))
+    store.save("no_habit", UserState(1))
+    tracker.log_habit(True, "lapsed", tracker.today() - 30)
+    generate = Generator()
+    planner = GoalPlanner(store, generate, enabled=True)
+
+    assert asyncio.run(planner.plan_all()) == 1
+    assert generate.calls == [(NOVEL, 2)]
+    assert store.get("novel").planned_goal == f"goal for {NOVEL}"
+    assert store.get("planned").planned_goal == "already"
+
+
+def test_owns_limits_the_pass_to_this_workers_users(store):
+    store.save("alice", UserState(habit=NOVEL))
+    store.save("bob", UserState(habit=NOVEL))
+    planner = GoalPlanner(store, Generator(), enabled=True)
+    asyncio.run(planner.plan_all(owns=lambda user_id: user_id == "bob"))
+    assert (store.get("alice").planned_goal, bool(store.get("bob").planned_goal)) == ("", True)
+
+
+def test_pass_stops_when_traffic_picks_up(store):
+    for n in range(5):
+        store.save(f"user-{n}", UserState(habit=NOVEL))
+    load = iter([0, 0, 5, 5, 5, 5])
+    planner = GoalPlanner(store, Generator(), load=lambda: next(load), enabled=True)
+    planner.max_load = 2
+    assert asyncio.run(planner.plan_all()) == 2
+
+
+def test_habit_change_during_generation_drops_the_plan(store):
+    store.save("alice", UserState(habit=NOVEL))
+
+    async def generate(habit, streak):
+        store.save("alice", UserState(habit="I fly every month to visit friends"))
+        return "stale goal"
+
+    planner = GoalPlanner(store, generate, enabled=True)
+    asyncio.run(planner.plan_user("alice"))
+    assert store.get("alice").planned_goal == "" and planner.planned == 0
+
+
+def test_failures_are_counted_and_leave_no_plan(store):
+    store.save("alice", UserState(habit=NOVEL))
+    planner = GoalPlanner(store, Generator(fail=True), enabled=True)
+    asyncio.run(planner.plan_user("alice"))
+    assert planner.failed == 1 and store.get("alice").planned_goal == ""
+
+
+def test_off_peak_hours_and_load():
+    planner = GoalPlanner(None, Generator(), load=lambda: 0, enabled=True)
+    assert planner.off_peak()
+    planner.load = lambda: planner.max_load
+    assert not planner.off_peak()
+    assert GoalPlanner._parse_hours("") is None
+    assert GoalPlanner._parse_hours("22-6") == (22, 6)
+
+
+def test_refresh_is_skipped_when_busy_or_disabled(store):
+    store.save("alice", UserState(habit=NOVEL))
+    generate = Generator()
+
+    async def main():
+        GoalPlanner(store, generate, enabled=False).refresh("alice")
+        busy = GoalPlanner(store, generate, load=lambda: 10, enabled=True)
+        busy.refresh("alice")
+        await asyncio.sleep(0.01)
+        assert generate.calls == []
+        idle = GoalPlanner(store, generate, enabled=True)
+        idle.refresh("alice")
+        await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    assert store.get("alice").planned_goal == f"goal for {NOVEL}"
+
+
+def test_same_habit_ignores_case_and_spacing():
+    assert same_habit("I  Drive to work", "i drive to work")
+    assert not same_habit("", "")
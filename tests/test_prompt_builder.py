@@ -0,0 +1,35 @@
+# tests/test_prompt_builder.py
+
+from agents.prompt_builder import (
+    CHARS_PER_TOKEN, HABIT_MAX_TOKENS, MAX_OUTPUT_TOKENS, compact_habit, generation_config, goal_prompt,
+)
+
+
+def test_short_habits_are_only_tidied():
+    assert compact_habit('  I  drive\tto "work"\x00 daily\n') == "I drive to 'work' daily"
+
+
+def test_long_habits_are_cut_at_a_word_to_the_budget():
+    habit = "I drive my car to the shops every single day, " * 40
+    compact = compact_habit(habit, max_tokens=10)
+    assert compact.endswith("…") and not compact.endswith(",…")
+    assert len(compact) <= 10 * CHARS_PER_TOKEN + 1
+    assert habit.startswith(compact[:-1])
+    assert habit[len(compact) - 1] in " ,"  # cut between words
+
+
+def test_a_single_long_word_is_cut_mid_word():
+    compact = compact_habit("x" * 1000, max_tokens=5)
+    assert compact == "x" * (5 * CHARS_PER_TOKEN) + "…"
+
+
+def test_goal_prompt_stays_within_the_default_budget():
+    prompt = goal_prompt("blah " * 10_000, "3 days")
+    habit_line = prompt.split("\n")[0]
+    assert len(habit_line) <= len('Habit: ""') + HABIT_MAX_TOKENS * CHARS_PER_TOKEN + 1
+    assert prompt.endswith("Green streak: 3 days\nGive today's micro-goal.")
+
+
+def test_output_cap_grows_per_batch_item():
+    assert generation_config() == {"max_output_tokens": MAX_OUTPUT_TOKENS}
+    assert generation_config(5)["max_output_tokens"] > 5 * MAX_OUTPUT_TOKENS
@@ -0,0 +1,144 @@
+# tests/test_providers.py
+
+import asyncio
+
+import pytest
+
+import agents.providers as providers_module
+from agents.llm_pool import PoolBusy
+from agents.providers import LocalProvider, Provider, ProviderRouter, make_providers
+
+
+class FakeProvider(Provider):
+    def __init__(self, name, delay=0.0, error=None, **kwargs):
+        kwargs.setdefault("failures", 3)
+        kwargs.setdefault("cooldown", 30)
+        super().__init__(name, **kwargs)
+        self.delay = delay
+        self.error = error
+        self.cancelled = 0
+
+    async def generate(self, habit, streak, prompt):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error is not None:
+            raise self.error
+        return f"{self.name} goal", None
+
+
+def router(*providers, **kwargs):
+    kwargs.setdefault("budget", 1.0)
+    kwargs.setdefault("hedge_min", 0.05)
+    kwargs.setdefault("hedge_max", 0.05)
+    return ProviderRouter(list(providers), **kwargs)
+
+
+def generate(router_, **kwargs):
+    return asyncio.run(router_.generate("I drive to work", 0, "prompt", **kwargs))
+
+
+def test_a_fast_primary_answers_alone():
+    primary, backup = FakeProvider("primary"), FakeProvider("backup")
+    text, provider, _ = generate(router(primary, backup))
+    assert (text, provider) == ("primary goal", primary)
+    assert backup.calls == 0 and primary.latencies
+
+
+def test_errors_fail_over_at_once():
+    primary, backup = FakeProvider("primary", error=RuntimeError("boom")), FakeProvider("backup")
+    routing = router(primary, backup)
+    assert generate(routing)[1] is backup
+    assert (routing.failovers, routing.hedged, primary.errors) == (1, 0, 1)
+
+
+def test_a_slow_primary_is_hedged_and_cancelled():
+    primary, backup = FakeProvider("primary", delay=1.0), FakeProvider("backup")
+    routing = router(primary, backup, budget=5)
+    assert generate(routing)[1] is backup
+    assert (routing.hedged, routing.hedge_wins, primary.cancelled) == (1, 1, 1)
+    assert router(primary, backup, hedge=False).hedge is False
+
+
+def test_the_budget_falls_back_to_local_templates():
+    slow, local = FakeProvider("slow", delay=1.0), LocalProvider("local")
+    routing = router(slow, local, budget=0.05, hedge=False)
+    text, provider, response = generate(routing)
+    assert provider is local and text and response is None
+    assert (routing.fallbacks, slow.errors) == (1, 1)
+
+
+def test_without_a_local_provider_the_last_error_is_raised():
+    with pytest.raises(RuntimeError, match="second"):
+        generate(router(FakeProvider("a", error=RuntimeError("first")),
+                        FakeProvider("b", error=RuntimeError("second"))))
+
+
+def test_pool_busy_is_not_held_against_the_provider():
+    busy = FakeProvider("busy", error=PoolBusy("full"))
+    generate(router(busy, LocalProvider("local")))
+    assert busy.errors == 0 and busy.available()
+
+
+def test_repeated_failures_skip_a_provider_until_the_cooldown(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(providers_module.time, "monotonic", lambda: now[0])
+    flaky, backup = FakeProvider("flaky", error=RuntimeError("down")), FakeProvider("backup")
+    routing = router(flaky, backup)
+    for _ in range(3):
+        generate(routing)
+    assert not flaky.available()
+    generate(routing)
+    assert flaky.calls == 3                         # skipped
+
+    now[0] += 30                                    # half-open: one trial call
+    flaky.error = None
+    assert generate(routing)[1] is flaky
+    assert flaky.available() and flaky.stats()["errors"] == 3
+
+
+def test_p95_needs_enough_samples():
+    provider = FakeProvider("p")
+    for i in range(19):
+        provider.record_success(i / 100)
+    assert provider.p95() is None
+    provider.record_success(0.19)
+    assert provider.p95() == 0.19
+    assert router(provider, hedge_min=0.5, hedge_max=4).hedge_delay(provider) == 0.5
+
+
+def test_a_stream_that_fails_before_its_first_chunk_falls_back():
+    class BrokenStream(FakeProvider):
+        async def stream(self, prompt):
+            raise RuntimeError("no stream")
+            yield
+
+    broken, backup = BrokenStream("broken"), FakeProvider("backup")
+    sent = []
+
+    async def send(text):
+        sent.append(text)
+
+    text, provider, _ = asyncio.run(router(broken, backup).stream("I drive", 0, "prompt", send))
+    assert (text, provider, sent) == ("backup goal", backup, ["backup goal"])
+    assert broken.errors == 1
+
+
+def test_providers_are_built_from_the_spec():
+    built = make_providers("gemini, gemini:flash-8b ,local", lambda name: name, pool=None)
+    assert [(p.name, p.remote) for p in built] == [("gemini", True), ("gemini:flash-8b", True), ("local", False)]
+    assert built[1].model() == "flash-8b" and built[0].model() is None
+    with pytest.raises(ValueError):
+        make_providers("gpt", lambda name: name, pool=None)
+    with pytest.raises(ValueError):
+        make_providers(" , ", lambda name: name, pool=None)
+
+
+def test_a_provider_without_generate_cannot_be_built():
+    class Incomplete(Provider):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete("incomplete")
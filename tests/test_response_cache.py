@@ -0,0 +1,78 @@
+# tests/test_response_cache.py
+
+import agents.response_cache as response_cache
+from agents.response_cache import ResponseCache, normalize_habit, streak_bucket
+
+
+def cache(**kwargs):
+    kwargs.setdefault("variant_fill_rate", 0)
+    return ResponseCache(**kwargs)
+
+
+def test_keys_are_normalized_and_bucketed():
+    assert normalize_habit("  I DRIVE, to work!! ") == "i drive to work"
+    assert [streak_bucket(s) for s in (0, 1, 2, 3, 7, 30, 365)] == [
+        "0 days (just starting)", "1-2 days", "1-2 days", "3-6 days", "7-29 days", "30+ days", "30+ days",
+    ]
+
+
+def test_hit_within_the_bucket_only():
+    goals = cache()
+    goals.put("I drive to work", 1, "Walk today")
+
+    assert goals.get("i drive to work!", 2) == "Walk today"
+    assert goals.get("I drive to work", 5) is None
+    assert goals.stats()["hits"] == 1 and goals.stats()["misses"] == 1
+
+
+def test_near_duplicates_match_above_the_threshold():
+    goals = cache(similarity=0.8)
+    goals.put("I drive to nearby places", 0, "Bike there")
+
+    assert goals.get("i drive to nearby place", 0) == "Bike there"
+    assert goals.get("I take long showers", 0) is None
+    assert goals.near_hits == 1
+    assert cache(similarity=0).get("i drive to nearby place", 0) is None
+
+
+def test_variants_are_collected_up_to_the_limit():
+    goals = cache(max_variants=2)
+    for text in ("A", "B", "C", "A"):
+        goals.put("I drive", 0, text)
+
+    assert {goals.get("I drive", 0) for _ in range(50)} == {"A", "B"}
+
+
+def test_incomplete_keys_let_some_requests_through(monkeypatch):
+    goals = ResponseCache(max_variants=3, variant_fill_rate=0.25)
+    goals.put("I drive", 0, "A")
+    monkeypatch.setattr(response_cache.random, "random", lambda: 0.1)
+    assert goals.get("I drive", 0) is None
+    monkeypatch.setattr(response_cache.random, "random", lambda: 0.9)
+    assert goals.get("I drive", 0) == "A"
+
+
+def test_lru_eviction_cleans_the_index():
+    goals = cache(max_entries=2)
+    goals.put("I drive", 0, "A")
+    goals.put("I shower", 0, "B")
+    goals.get("I drive", 0)            # now most recently used
+    goals.put("I fly", 0, "C")
+
+    assert len(goals) == 2
+    assert goals.get("I shower", 0) is None
+    assert goals.get("I drive", 0) == "A"
+    assert all("i shower" not in holders for holders in goals._index.values())
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "monotonic", lambda: now[0])
+    goals = cache(ttl=60)
+    goals.put("I drive", 0, "A")
+
+    now[0] += 59
+    assert goals.get("I drive", 0) == "A"
+    now[0] += 1
+    assert goals.get("I drive", 0) is None
+    assert len(goals) == 0 and not goals._index
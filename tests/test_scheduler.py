@@ -0,0 +1,98 @@
+# tests/test_scheduler.py
+
+import asyncio
+
+import pytest
+
+import agents.scheduler as scheduler_module
+from agents.scheduler import Scheduler, Shed
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(scheduler_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def scheduler(**kwargs):
+    kwargs.setdefault("limits", {"generate": (1.0, 2.0), "report": (2.0, 3.0)})
+    return Scheduler(**kwargs)
+
+
+def test_buckets_allow_a_burst_then_refill(clock):
+    sched = scheduler()
+    assert [sched.allow("generate", "alice") for _ in range(3)] == [True, True, False]
+    assert sched.allow("generate", "bob")            # buckets are per user...
+    assert sched.allow("report", "alice")            # ...and per lane
+    clock[0] += 1
+    assert sched.allow("generate", "alice")
+    assert not sched.allow("generate", "alice")
+    assert sched.rate_limited == {"report": 0, "generate": 2}
+
+
+def test_full_buckets_are_pruned(clock):
+    sched = scheduler(max_buckets=2)
+    sched.allow("generate", "alice")
+    sched.allow("generate", "bob")
+    clock[0] += 10                                   # both refilled
+    sched.allow("generate", "carol")
+    assert set(sched._buckets["generate"]) == {"carol"}
+
+
+def test_freed_slots_go_round_robin_across_users():
+    async def run():
+        sched = scheduler(slots=1)
+        order = []
+
+        async def job(user_id, tag):
+            async with sched.generation(user_id):
+                order.append(tag)
+                await asyncio.sleep(0)
+
+        await sched.acquire("hog")                   # hold the only slot
+        tasks = [asyncio.create_task(job(user, tag))
+                 for user, tag in (("alice", "a1"), ("alice", "a2"), ("bob", "b1"))]
+        await asyncio.sleep(0)
+        assert sched.stats()["pending"] == 3 and sched.stats()["waiting_users"] == 2
+        sched.release()
+        await asyncio.gather(*tasks)
+        return order, sched.stats()
+
+    order, stats = asyncio.run(run())
+    assert order == ["a1", "b1", "a2"]
+    assert (stats["running"], stats["pending"], stats["admitted"]) == (0, 0, 4)
+
+
+def test_full_queues_shed_right_away():
+    async def run():
+        sched = scheduler(slots=1, max_pending=2, max_pending_per_user=1)
+        await sched.acquire("hog")
+        waiting = [asyncio.create_task(sched.acquire(user)) for user in ("alice", "bob")]
+        await asyncio.sleep(0)
+        with pytest.raises(Shed):
+            await sched.acquire("alice")             # alice already has one waiting
+        with pytest.raises(Shed):
+            await sched.acquire("carol")             # two waiting in total
+        for task in waiting:
+            task.cancel()
+        await asyncio.gather(*waiting, return_exceptions=True)
+        return sched
+
+    sched = asyncio.run(run())
+    assert sched.shed == 2
+    assert (sched.pending, sched._queues) == (0, {})
+
+
+def test_a_waiter_that_times_out_leaves_the_queue():
+    async def run():
+        sched = scheduler(slots=1)
+        await sched.acquire("hog")
+        with pytest.raises(asyncio.TimeoutError):
+            await sched.acquire("alice", timeout=0.01)
+        assert (sched.pending, sched._queues) == (0, {})
+        sched.release()
+        await sched.acquire("bob")                    # the slot is free again
+        return sched
+
+    assert asyncio.run(run()).running == 1
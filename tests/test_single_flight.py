@@ -0,0 +1,80 @@
+# tests/test_single_flight.py
+
+import asyncio
+
+import pytest
+
+from agents.single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "goal"
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", fetch) for _ in range(50)))
+
+    assert asyncio.run(main()) == ["goal"] * 50
+    assert len(calls) == 1
+    assert flight.stats() == {"in_flight": 0, "issued": 1, "coalesced": 49}
+
+
+def test_exception_reaches_every_waiter():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("model down")
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", fail) for _ in range(5)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert len(results) == 5
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_key_is_released_after_the_call():
+    flight = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return len(calls)
+
+    async def main():
+        first = await flight.do("key", fetch)
+        assert flight.join("key") is None
+        second = await flight.do("key", fetch)
+        with pytest.raises(ValueError):
+            await flight.do("key", fail)
+        third = await flight.do("key", fetch)
+        return first, second, third
+
+    async def fail():
+        raise ValueError("bad prompt")
+
+    assert asyncio.run(main()) == (1, 2, 3)
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_cancelled_waiter_does_not_cancel_the_call():
+    flight = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        return "goal"
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("key", fetch))
+        second = asyncio.ensure_future(flight.do("key", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == "goal"
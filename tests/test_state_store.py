@@ -0,0 +1,97 @@
+# tests/test_state_store.py
+
+import asyncio
+import sqlite3
+
+import pytest
+
+from agents.state_store import StateStore, UserState
+from utils.db import MemoryBackend, SQLiteBackend, make_backend
+
+
+def test_unseen_users_get_a_default_that_is_not_stored(store):
+    state = store.get("alice")
+    assert state.to_record() == (0, "", "", "")
+    assert len(store) == 0
+
+
+def test_memory_backend_hands_back_the_stored_object(store):
+    store.save("alice", UserState(3, "Walk"))
+    store.get("alice").streak += 1
+    assert store.get("alice").streak == 4
+
+
+def test_same_user_always_gets_the_same_stripe():
+    store = StateStore(MemoryBackend(), stripes=4)
+    assert store.lock_for("alice") is store.lock_for("alice")
+    assert len({id(store.lock_for(f"user-{n}")) for n in range(100)}) <= 4
+
+
+def test_stripes_serialize_one_user_and_not_others():
+    store = StateStore(MemoryBackend(), stripes=64)
+    others = [f"user-{n}" for n in range(200) if store.lock_for(f"user-{n}") is not store.lock_for("alice")]
+    order = []
+
+    async def update(user_id, delay):
+        async with store.lock_for(user_id):
+            state = store.get(user_id)
+            order.append(("start", user_id))
+            await asyncio.sleep(delay)
+            state.streak += 1
+            store.save(user_id, state)
+            order.append(("end", user_id))
+
+    async def main():
+        await asyncio.gather(update("alice", 0.02), update("alice", 0), update(others[0], 0))
+
+    asyncio.run(main())
+    assert store.get("alice").streak == 2
+    # The other user ran while alice's first update was still sleeping
+    assert order.index(("end", others[0])) < order.index(("end", "alice"))
+    # alice's second update waited for the first to finish
+    starts = [i for i, event in enumerate(order) if event == ("start", "alice")]
+    assert order.index(("end", "alice")) < starts[1]
+
+
+def test_sqlite_backend_persists_across_connections(tmp_path):
+    path = str(tmp_path / "state.db")
+    store = StateStore(SQLiteBackend(path))
+    store.save("alice", UserState(2, "Bike", "I drive", "Walk"))
+    store.save_many([("bob", UserState(1)), ("carol", UserState(5, "Train"))])
+    store.save("alice", UserState(3, "Bike", "I drive", ""))
+    store.backend.close()
+
+    reopened = StateStore(SQLiteBackend(path))
+    assert reopened.get("alice").to_record() == (3, "Bike", "I drive", "")
+    assert dict(reopened.items()) == {
+        "alice": (3, "Bike", "I drive", ""),
+        "bob": (1, "", "", ""),
+        "carol": (5, "Train", "", ""),
+    }
+    assert len(reopened) == 3
+
+
+def test_sqlite_save_many_is_one_transaction(tmp_path):
+    store = StateStore(SQLiteBackend(str(tmp_path / "state.db")))
+    store.save("alice", UserState(1))
+    with pytest.raises(sqlite3.Error):
+        store.backend.put_many([("alice", (9, "", "", "")), ("bob", (None, "", "", ""))])  # NOT NULL
+    assert dict(store.items()) == {"alice": (1, "", "", "")}
+
+
+def test_sqlite_backend_adds_columns_to_old_databases(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE user_state (user_id TEXT PRIMARY KEY, streak INTEGER NOT NULL DEFAULT 0, "
+                 "current_goal TEXT NOT NULL DEFAULT '') WITHOUT ROWID")
+    conn.execute("INSERT INTO user_state VALUES ('alice', 4, 'Walk')")
+    conn.commit()
+    conn.close()
+
+    assert StateStore(SQLiteBackend(path)).get("alice").to_record() == (4, "Walk", "", "")
+
+
+def test_make_backend_rejects_unknown_kinds():
+    assert isinstance(make_backend("memory"), MemoryBackend)
+    with pytest.raises(ValueError):
+        make_backend("redis")
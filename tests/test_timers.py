@@ -0,0 +1,108 @@
+# tests/test_timers.py
+
+import random
+from datetime import date, datetime, time as day_time
+
+import agents.tracker_agent as tracker
+from agents.schemas import ReminderBatch, StreakExpiryBatch
+from agents.timers import Deadlines, TimerWheel
+
+
+def test_timers_fire_on_their_tick_across_every_level():
+    rng = random.Random(3)
+    wheel = TimerWheel(now=12345, slot_bits=4, levels=3)   # 16 slots a level, span 4096 ticks
+    due = {f"t{i}": 12345 + rng.randrange(1, 4000) for i in range(500)}
+    for key, tick in due.items():
+        wheel.schedule(key, tick, tick)
+
+    fired = {}
+    while wheel.now < 12345 + 4000:
+        step = rng.randrange(1, 40)
+        for key, value in wheel.advance(wheel.now + step):
+            fired[key] = (value, wheel.now)
+            assert wheel.now - step < value <= wheel.now
+    assert set(fired) == set(due) and len(wheel) == 0
+
+
+def test_rearm_cancel_and_overdue():
+    wheel = TimerWheel(now=100)
+    wheel.schedule("a", 105, "first")
+    wheel.schedule("a", 110, "second")               # re-arm replaces
+    wheel.schedule("b", 50)                          # overdue: next tick
+    wheel.schedule("c", 107)
+    assert wheel.cancel("c") and not wheel.cancel("c")
+    assert ("a" in wheel, len(wheel)) == (True, 2)
+
+    assert wheel.advance(101) == [("b", None)]
+    assert wheel.advance(109) == []
+    assert wheel.advance(110) == [("a", "second")]
+
+
+def test_timers_beyond_the_span_are_parked_and_still_fire():
+    wheel = TimerWheel(now=0, slot_bits=2, levels=2)  # span 16 ticks
+    wheel.schedule("far", 40, "x")
+    assert wheel.advance(39) == []
+    assert wheel.advance(40) == [("far", "x")]
+
+
+# --- Deadlines ---
+
+DAY = date(2026, 10, 1).toordinal()
+
+
+def at(day, hour=0.0):
+    return datetime.combine(date.fromordinal(day), day_time()).timestamp() + hour * 3600
+
+
+def deadlines(**kwargs):
+    kwargs.setdefault("reminder_hour", "18")
+    timers = Deadlines(tick=60, enabled=True, **kwargs)
+    timers.wheel = TimerWheel(timers._tick_at(at(DAY, 12)))   # noon on DAY
+    return timers
+
+
+def test_a_streak_expires_after_a_whole_day_without_a_report(monkeypatch):
+    monkeypatch.setattr(tracker, "today", lambda: DAY)
+    timers = deadlines(reminder_hour="")
+    timers.on_report("alice", DAY, 3)
+    timers.on_report("bob", DAY, 0)                   # nothing to expire
+
+    assert timers.due_batches(at(DAY + 2) - 60) == []
+    batches = timers.due_batches(at(DAY + 2))
+    assert [type(b) for b in batches] == [StreakExpiryBatch]
+    assert (batches[0].day, [item.user_id for item in batches[0].items]) == (DAY + 1, ["alice"])
+    assert not batches[0].items[0].completed
+
+
+def test_reminders_repeat_daily_while_the_user_is_active(monkeypatch):
+    monkeypatch.setattr(tracker, "today", lambda: DAY)
+    tracker.log_habit(True, "alice", DAY)
+    timers = deadlines(active_days=2)
+    timers.on_report("alice", DAY, 1)
+
+    reminded = []
+    for day in range(DAY + 1, DAY + 5):
+        for batch in timers.due_batches(at(day, 18)):
+            if isinstance(batch, ReminderBatch):
+                reminded.append((day, batch.user_ids))
+    assert reminded == [(DAY + 1, ["alice"]), (DAY + 2, ["alice"])]
+
+
+def test_fired_timers_are_batched(monkeypatch):
+    monkeypatch.setattr(tracker, "today", lambda: DAY)
+    timers = deadlines(batch_size=2, reminder_hour="")
+    for i in range(5):
+        timers.on_report(f"user-{i}", DAY, 1)
+    batches = timers.due_batches(at(DAY + 2))
+    assert [len(batch.items) for batch in batches] == [2, 2, 1]
+
+
+def test_load_arms_every_tracked_user_it_owns(monkeypatch):
+    monkeypatch.setattr(tracker, "today", lambda: DAY)
+    tracker.log_habit(True, "alice", DAY)
+    tracker.log_habit(True, "bob", DAY)
+    timers = deadlines()
+
+    assert timers.load(tracker.histories, owns=lambda user_id: user_id != "bob") == 1
+    assert ("expire", "alice") in timers.wheel and ("remind", "alice") in timers.wheel
+    assert ("expire", "bob") not in timers.wheel
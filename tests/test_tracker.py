@@ -0,0 +1,97 @@
+# tests/test_tracker.py
+
+import random
+
+import agents.tracker_agent as tracker
+from agents.tracker_agent import BLOCK_DAYS, HabitHistory
+
+DAY = 740000
+
+
+def test_consecutive_days_build_a_streak_and_gaps_break_it():
+    history = HabitHistory(DAY)
+    for offset in range(3):
+        history.log(True, DAY + offset)
+    assert (history.streak, history.best_streak) == (3, 3)
+
+    history.log(True, DAY + 5)          # days 3 and 4 never reported
+    assert (history.streak, history.best_streak) == (1, 3)
+    history.log(False, DAY + 6)
+    assert (history.streak, history.best_streak) == (0, 3)
+
+
+def test_a_second_report_the_same_day_replaces_the_first():
+    history = HabitHistory(DAY)
+    history.log(True, DAY)
+    history.log(True, DAY + 1)
+    history.log(False, DAY + 1)
+    assert (history.streak, history.best_streak) == (0, 1)
+    history.log(True, DAY + 1)
+    assert (history.streak, history.best_streak) == (2, 2)
+    assert history.completions_between(DAY, DAY + 1) == 2
+
+
+def test_reports_for_earlier_days_are_ignored():
+    history = HabitHistory(DAY)
+    history.log(True, DAY + 2)
+    assert history.log(True, DAY + 1) is False
+    assert history.completions_between(DAY, DAY + 2) == 1
+
+
+def test_current_streak_lapses_after_a_missed_day():
+    history = HabitHistory(DAY)
+    history.log(True, DAY)
+    assert history.current_streak(DAY) == 1
+    assert history.current_streak(DAY + 1) == 1
+    assert history.current_streak(DAY + 2) == 0
+
+
+def test_carried_streak_continues_on_the_first_day():
+    history = HabitHistory(DAY, streak=4)
+    history.log(True, DAY)
+    assert (history.streak, history.best_streak) == (5, 5)
+
+    history = HabitHistory(DAY, streak=4)
+    history.log(False, DAY)
+    history.log(True, DAY)             # corrected the same day: the carry still counts
+    assert history.streak == 5
+
+
+def test_completion_counts_match_a_plain_scan():
+    rng = random.Random(7)
+    history, done = HabitHistory(DAY), {}
+    day = DAY
+    for _ in range(300):
+        day += rng.choice((1, 1, 1, 2, 40))  # mostly daily, some gaps across blocks
+        done[day] = rng.random() < 0.7
+        history.log(done[day], day)
+    for _ in range(200):
+        start = rng.randrange(DAY - 5, day + 5)
+        end = rng.randrange(start, day + 2 * BLOCK_DAYS)
+        expected = sum(1 for d, ok in done.items() if ok and start <= d <= end)
+        assert history.completions_between(start, end) == expected
+
+
+def test_dump_and_load_round_trip():
+    history = HabitHistory(DAY, streak=2)
+    for offset, completed in enumerate([True, True, False, True] * 20):
+        history.log(completed, DAY + offset)
+    history.log(True, history.last_day)   # leave a same-day correction pending
+
+    loaded = HabitHistory.load(history.dump())
+    assert loaded.dump() == history.dump()
+    loaded.log(False, loaded.last_day)
+    history.log(False, history.last_day)
+    assert loaded.dump() == history.dump()
+
+
+def test_module_helpers_are_per_user():
+    tracker.log_habit(True, "alice", DAY)
+    tracker.log_habit(True, "alice", DAY + 1)
+    tracker.log_habit(False, "bob", DAY + 1)
+
+    assert tracker.get_streak("alice", DAY + 1) == 2
+    assert tracker.get_streak("bob", DAY + 1) == 0
+    assert tracker.get_streak("carol", DAY + 1) == 0
+    assert tracker.get_best_streak("alice") == 2
+    assert tracker.completions_in_last(7, "alice", DAY + 3) == 2
@@ -0,0 +1,321 @@
+# utils/db.py
+
+import json
+import os
+import sqlite3
+import threading
+
+# --- Storage backends for per-user coach state ---
+# A backend only knows how to load/store one compact record per user:
+#   (streak, current_goal, habit, planned_goal)
+# The StateStore in agents/state_store.py sits on top and handles locking.
+# Pick a backend with COACH_STATE_BACKEND=memory|sqlite (default: memory).
+
+DEFAULT_DB_PATH = os.getenv("COACH_DB_PATH", "greenpulse.db")
+
+
+class MemoryBackend:
+    """
+    Plain dict keyed by user_id. Fast O(1) lookups, nothing survives a restart.
+    Records are stored as-is (the StateStore hands us UserState objects),
+    so a get() followed by mutation needs no extra put().
+    """
+
+    persistent = False
+
+    def __init__(self):
+        self._records = {}
+
+    def get(self, user_id: str):
+        return self._records.get(user_id)
+
+    def put(self, user_id: str, record) -> None:
+        self._records[user_id] = record
+
+    def put_many(self, items) -> None:
+        self._records.update(items)
+
+    def items(self):
+        # A point-in-time copy, safe to walk from another thread
+        return list(self._records.items())
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteBackend:
+    """
+    One row per user in a WITHOUT ROWID table, so the primary key *is* the
+    storage order and a lookup is a single B-tree probe.
+    Records go in and come out as (streak, current_goal, habit, planned_goal) tuples.
+    """
+
+    persistent = True
+
+    def __init__(self, path: str = DEFAULT_DB_PATH):
+        self.path = path
+        # check_same_thread=False: uvicorn may touch the store from the
+        # event loop thread and from worker threads; we serialize with a lock.
+        # Other processes (cluster.py workers) may share the file: WAL lets
+        # them read while one writes, and timeout makes a writer wait for
+        # the write lock instead of failing with "database is locked".
+        self._conn = sqlite3.connect(path, timeout=10.0, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS user_state (
+                user_id TEXT PRIMARY KEY,
+                streak INTEGER NOT NULL DEFAULT 0,
+                current_goal TEXT NOT NULL DEFAULT '',
+                habit TEXT NOT NULL DEFAULT '',
+                planned_goal TEXT NOT NULL DEFAULT ''
+            ) WITHOUT ROWID
+            """
+        )
+        # Databases created before habit/planned_goal existed
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(user_state)")}
+        for column in ("habit", "planned_goal"):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE user_state ADD COLUMN {column} TEXT NOT NULL DEFAULT ''")
+
+    def get(self, user_id: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT streak, current_goal, habit, planned_goal FROM user_state WHERE user_id = ?",
+                (user_id,),
+            ).fetchone()
+        return row
+
+    def put(self, user_id: str, record) -> None:
+        streak, current_goal, habit, planned_goal = record
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO user_state (user_id, streak, current_goal, habit, planned_goal) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET streak = excluded.streak, current_goal = excluded.current_goal, "
+                "habit = excluded.habit, planned_goal = excluded.planned_goal",
+                (user_id, streak, current_goal, habit, planned_goal),
+            )
+
+    def put_many(self, items) -> None:
+        """(user_id, record) pairs, written in one transaction."""
+        rows = [(user_id, *record) for user_id, record in items]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO user_state (user_id, streak, current_goal, habit, planned_goal) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET streak = excluded.streak, current_goal = excluded.current_goal, "
+                    "habit = excluded.habit, planned_goal = excluded.planned_goal",
+                    rows,
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def items(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT user_id, streak, current_goal, habit, planned_goal FROM user_state").fetchall()
+        return [(row[0], row[1:]) for row in rows]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM user_state").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def make_backend(kind: str = None, path: str = None):
+    """
+    Build a state backend from an explicit kind or the COACH_STATE_BACKEND env var.
+    """
+    kind = (kind or os.getenv("COACH_STATE_BACKEND", "memory")).lower()
+    if kind == "memory":
+        return MemoryBackend()
+    if kind == "sqlite":
+        return SQLiteBackend(path or DEFAULT_DB_PATH)
+    raise ValueError(f"Unknown state backend '{kind}' (expected 'memory' or 'sqlite')")
+
+
+# --- Durable append-only event log with snapshots ---
+# Events are appended as compact JSON lines to numbered log segments
+# (events-<first seq>.log). Appends only hit an in-process buffer; a background
+# thread flushes and fsyncs every COACH_FSYNC_INTERVAL seconds (group commit),
+# so many reports share one fsync and persistence never caps report throughput.
+#
+# A snapshot (snapshot-<seq>.json) captures the full state as of some seq.
+# Taking one starts a new segment first, then the snapshot is written off the
+# event loop, and only after it's safely renamed into place are older
+# segments/snapshots deleted. Recovery = newest snapshot + replay of every
+# later event. Events are expected to carry absolute values (e.g. the new
+# streak, not "+1"), so replaying an event the snapshot already saw is harmless.
+
+class EventLog:
+    def __init__(self, directory: str, fsync_interval: float = None):
+        self.directory = directory
+        self.fsync_interval = fsync_interval or float(os.getenv("COACH_FSYNC_INTERVAL", "0.05"))
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._file = None
+        self._dirty = False
+        self._closed = threading.Event()
+        self.seq = self._last_seq_on_disk()
+        self.appended_since_snapshot = 0
+        self._open_segment(self.seq + 1)
+
+        self._flusher = threading.Thread(target=self._flush_loop, name="event-log-fsync", daemon=True)
+        self._flusher.start()
+
+    # --- writing ---
+
+    def append(self, event: dict) -> int:
+        with self._lock:
+            self.seq += 1
+            event["n"] = self.seq
+            self._file.write(json.dumps(event, separators=(",", ":"), ensure_ascii=False) + "\n")
+            self._dirty = True
+            self.appended_since_snapshot += 1
+            return self.seq
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            self._file.flush()
+            fd = self._file.fileno()
+            self._dirty = False
+        os.fsync(fd)
+
+    def _flush_loop(self) -> None:
+        while not self._closed.wait(self.fsync_interval):
+            try:
+                self.flush()
+            except (OSError, ValueError):
+                # Segment was swapped/closed under us; next round picks up the new one
+                pass
+
+    def close(self) -> None:
+        self._closed.set()
+        self.flush()
+        with self._lock:
+            self._file.close()
+
+    # --- snapshots ---
+
+    def start_snapshot(self) -> int:
+        """
+        Seals the current segment and starts a new one. Returns the seq the
+        snapshot must cover; call this on the thread that appends, right
+        before capturing state.
+        """
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._dirty = False
+            covered = self.seq
+            self._open_segment(covered + 1)
+            self.appended_since_snapshot = 0
+            return covered
+
+    def write_snapshot(self, covered_seq: int, state) -> str:
+        """
+        Atomically writes `state` (anything JSON-serializable) as the snapshot
+        for covered_seq, then drops segments/snapshots it makes obsolete.
+        Safe to call from a worker thread.
+        """
+        path = os.path.join(self.directory, f"snapshot-{covered_seq:012d}.json")
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"seq": covered_seq, "state": state}, f, separators=(",", ":"), ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+        for name, start in self._files("events-"):
+            if start <= covered_seq:
+                os.remove(os.path.join(self.directory, name))
+        for name, seq in self._files("snapshot-"):
+            if seq < covered_seq:
+                os.remove(os.path.join(self.directory, name))
+        return path
+
+    # --- recovery ---
+
+    def load_snapshot(self):
+        """Returns (seq, state) of the newest snapshot, or (0, None)."""
+        for name, seq in reversed(self._files("snapshot-")):
+            try:
+                with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                    data = json.load(f)
+                return data["seq"], data["state"]
+            except (OSError, ValueError, KeyError):
+                continue  # half-written or corrupt, try an older one
+        return 0, None
+
+    def replay(self, after_seq: int = 0):
+        """Yields every logged event with seq > after_seq, in order."""
+        for name, _ in self._files("events-"):
+            for event in self._read_segment(name):
+                if event.get("n", 0) > after_seq:
+                    yield event
+
+    # --- internals ---
+
+    def _files(self, prefix: str):
+        found = []
+        for name in os.listdir(self.directory):
+            if name.startswith(prefix) and not name.endswith(".tmp"):
+                try:
+                    found.append((name, int(name[len(prefix):].split(".")[0])))
+                except ValueError:
+                    continue
+        return sorted(found, key=lambda item: item[1])
+
+    def _last_seq_on_disk(self) -> int:
+        last, _ = self.load_snapshot()
+        segments = self._files("events-")
+        if segments:
+            name, start = segments[-1]
+            self._repair_tail(name)
+            for event in self._read_segment(name):
+                last = max(last, event.get("n", 0))
+            last = max(last, start - 1)
+        return last
+
+    def _read_segment(self, name: str):
+        with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    return  # torn write at the tail of a segment after a crash
+
+    def _repair_tail(self, name: str) -> None:
+        # Cut a half-written last line so new appends don't land behind it
+        path = os.path.join(self.directory, name)
+        good = 0
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    json.loads(line)
+                except ValueError:
+                    break
+                good += len(line)
+        if good != os.path.getsize(path):
+            with open(path, "r+b") as f:
+                f.truncate(good)
+
+    def _open_segment(self, first_seq: int) -> None:
+        path = os.path.join(self.directory, f"events-{first_seq:012d}.log")
+        self._file = open(path, "a", encoding="utf-8", buffering=1 << 16)
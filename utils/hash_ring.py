@@ -0,0 +1,54 @@
+# utils/hash_ring.py
+
+import hashlib
+from bisect import bisect
+
+# --- Consistent hashing ---
+# Maps a key (a user_id) to one of N nodes. Each node is placed on the ring
+# at many points ("virtual nodes") so keys spread evenly, and adding or
+# removing a node only moves the keys that node owned (about 1/N of them)
+# instead of reshuffling everyone like hash(key) % N would.
+# Uses md5 rather than hash(): the mapping must be identical in every
+# process and across restarts (PYTHONHASHSEED randomizes hash()).
+
+
+def _point(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    def __init__(self, nodes=(), replicas: int = 128):
+        self.replicas = replicas
+        self._points = []   # sorted ring positions
+        self._owners = []   # node at the same index as _points
+        self.nodes = []
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node: str) -> None:
+        if node in self.nodes:
+            return
+        self.nodes.append(node)
+        ring = list(zip(self._points, self._owners))
+        ring.extend((_point(f"{node}#{i}"), node) for i in range(self.replicas))
+        ring.sort()
+        self._points = [point for point, _ in ring]
+        self._owners = [owner for _, owner in ring]
+
+    def remove(self, node: str) -> None:
+        if node not in self.nodes:
+            return
+        self.nodes.remove(node)
+        ring = [(point, owner) for point, owner in zip(self._points, self._owners) if owner != node]
+        self._points = [point for point, _ in ring]
+        self._owners = [owner for _, owner in ring]
+
+    def node_for(self, key: str) -> str:
+        """The node owning key: the first ring point clockwise from hash(key)."""
+        if not self._points:
+            raise LookupError("HashRing has no nodes")
+        index = bisect(self._points, _point(key)) % len(self._points)
+        return self._owners[index]
+
+    def __len__(self) -> int:
+        return len(self.nodes)
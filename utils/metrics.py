@@ -0,0 +1,190 @@
+# utils/metrics.py
+
+import asyncio
+import functools
+import time
+from bisect import bisect_left
+
+# --- Minimal Prometheus-style metrics ---
+# No client library needed: counters and histograms are plain Python numbers
+# updated in place (one dict lookup + an add on the hot path), and gauges
+# are callbacks that only run when /metrics is scraped.
+# REGISTRY.render() produces the Prometheus text exposition format.
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_text(names, values) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{str(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _Child:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames=(), registry: Registry = REGISTRY):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._children = {}
+        if not self.labelnames:
+            self._children[()] = _Child()
+        registry.register(self)
+
+    def labels(self, *values) -> _Child:
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = _Child()
+        return child
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._children[()].value += amount
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            yield f"{self.name}{_label_text(self.labelnames, values)} {child.value}"
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS, registry: Registry = REGISTRY):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._children = {}
+        if not self.labelnames:
+            self._children[()] = _HistogramChild(self.buckets)
+        registry.register(self)
+
+    def labels(self, *values) -> _HistogramChild:
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = _HistogramChild(self.buckets)
+        return child
+
+    def observe(self, value: float) -> None:
+        self._children[()].observe(value)
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = _label_text(self.labelnames + ("le",), values + (le,))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _label_text(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {child.sum}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class CallbackMetric:
+    """
+    Value(s) computed at scrape time. fn() returns a number, or a dict of
+    {label value tuple: number} when labelnames are given.
+    Use type="counter" for totals that something else already counts.
+    """
+
+    def __init__(self, name: str, help: str, fn, labelnames=(), type: str = "gauge", registry: Registry = REGISTRY):
+        self.name, self.help, self.fn, self.labelnames, self.type = name, help, fn, tuple(labelnames), type
+        registry.register(self)
+
+    def samples(self):
+        value = self.fn()
+        if not self.labelnames:
+            yield f"{self.name} {value}"
+            return
+        for values, number in value.items():
+            yield f"{self.name}{_label_text(self.labelnames, values)} {number}"
+
+
+class Gauge:
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, registry: Registry = REGISTRY):
+        self.name, self.help = name, help
+        self.value = 0.0
+        registry.register(self)
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def samples(self):
+        yield f"{self.name} {self.value}"
+
+
+def timed(histogram: Histogram, *label_values):
+    """
+    Decorator for async handlers: records how long each call takes.
+    Put it *below* @protocol.on_message so the timed function is what gets registered.
+    """
+    child = histogram.labels(*label_values) if label_values else histogram._children[()]
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - started)
+        return wrapper
+
+    return decorator
+
+
+async def watch_loop_lag(histogram: Histogram, gauge: Gauge, interval: float = 0.25) -> None:
+    """
+    Background task: how late does a sleep(interval) wake up? That delay is
+    time the event loop spent busy with something else.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - started - interval)
+        histogram.observe(lag)
+        gauge.set(lag)
@@ -0,0 +1,51 @@
+# utils/startup.py
+
+import contextlib
+import logging
+import time
+
+# --- Startup profile ---
+# Times the expensive parts of a cold start (imports, state recovery, client
+# warm-up) plus the first request served, so a slow restart shows *where*
+# the time went. main.py logs the report once ready and serves it on /ready.
+
+logger = logging.getLogger("coach.startup")
+
+
+class StartupProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.steps = {}
+        self.ready_after = None
+        self.first_request = None
+
+    @contextlib.contextmanager
+    def step(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps[name] = time.perf_counter() - started
+
+    def mark_ready(self) -> None:
+        self.ready_after = time.perf_counter() - self.started
+        logger.info(f"Startup profile: {self.report()}")
+
+    def mark_first_request(self, label: str, seconds: float) -> None:
+        if self.first_request is None:
+            self.first_request = (label, seconds)
+            logger.info(f"First request ({label}) took {seconds * 1000:.1f} ms")
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_after is not None
+
+    def report(self) -> dict:
+        return {
+            "steps_ms": {name: round(seconds * 1000, 1) for name, seconds in self.steps.items()},
+            "ready_after_ms": round(self.ready_after * 1000, 1) if self.ready_after is not None else None,
+            "first_request": {
+                "request": self.first_request[0],
+                "ms": round(self.first_request[1] * 1000, 1),
+            } if self.first_request else None,
+        }